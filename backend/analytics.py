@@ -0,0 +1,251 @@
+"""
+Utilization analytics.
+
+`booking_stats` holds pre-aggregated counts per (resource, requester
+department, month, weekday, hour, status): how many bookings start in
+that hour and how many booked minutes fall in it. Triggers on `bookings`
+keep it current on every insert, status/time change and delete, in the
+same transaction as the write, so the HOD dashboard reads a few hundred
+summary rows instead of grouping years of bookings.
+
+Bookings are counted under the requester's current department: when a
+user moves department, or is deleted (department 0), triggers on `users`
+move the counts of all their bookings, archived ones included. Bookings
+moved to `bookings_archive` (see booking_jobs.py) stay counted.
+`python analytics.py rebuild` recomputes the table from scratch (after
+a bulk load with triggers off, say).
+"""
+import os
+import sys
+
+STATUSES = ("pending", "approved", "rejected", "cancelled", "conducted", "expired")
+# Statuses whose time counts as booked
+BOOKED_STATUSES = ("approved", "conducted")
+
+
+def _contribution(row, sign):
+    """INSERT .. SELECT adding (sign=1) or removing (sign=-1) one booking."""
+    minus = "-" if sign < 0 else ""
+    return f"""
+        INSERT INTO booking_stats (resource_id, department_id, month, weekday, hour, status, bookings, minutes)
+        SELECT {row}.resource_id,
+               COALESCE((SELECT department_id FROM users WHERE id = {row}.user_id), 0),
+               substr({row}.date, 1, 7),
+               CAST(strftime('%w', {row}.date) AS INTEGER),
+               h.hour,
+               {row}.status,
+               {minus}(h.hour = {row}.start_min / 60),
+               {minus}(MIN({row}.end_min, (h.hour + 1) * 60) - MAX({row}.start_min, h.hour * 60))
+        FROM analytics_hours h
+        WHERE h.hour * 60 < {row}.end_min AND (h.hour + 1) * 60 > {row}.start_min
+        ON CONFLICT(month, resource_id, department_id, weekday, hour, status) DO UPDATE SET
+            bookings = bookings + excluded.bookings,
+            minutes = minutes + excluded.minutes;
+    """
+
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS analytics_hours (hour INTEGER PRIMARY KEY)
+    """,
+    """
+    INSERT OR IGNORE INTO analytics_hours (hour)
+    VALUES (0), (1), (2), (3), (4), (5), (6), (7), (8), (9), (10), (11),
+           (12), (13), (14), (15), (16), (17), (18), (19), (20), (21), (22), (23)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS booking_stats (
+        resource_id INTEGER NOT NULL,
+        department_id INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        weekday INTEGER NOT NULL,
+        hour INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        bookings INTEGER NOT NULL DEFAULT 0,
+        minutes INTEGER NOT NULL DEFAULT 0,
+        -- month first: a dashboard range is one contiguous slice of the table
+        PRIMARY KEY (month, resource_id, department_id, weekday, hour, status)
+    ) WITHOUT ROWID
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_bookings_stats_insert
+    AFTER INSERT ON bookings
+    BEGIN
+        {_contribution("NEW", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_bookings_stats_update
+    AFTER UPDATE OF resource_id, user_id, date, start_time, end_time, status ON bookings
+    BEGIN
+        {_contribution("OLD", -1)}
+        {_contribution("NEW", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_bookings_stats_delete
+    AFTER DELETE ON bookings
+    BEGIN
+        {_contribution("OLD", -1)}
+    END
+    """,
+]
+
+# Replaces trg_bookings_stats_delete once bookings_archive exists: a booking
+# deleted because it was archived is moved, not gone
+ARCHIVE_AWARE_DELETE_TRIGGER = f"""
+    CREATE TRIGGER IF NOT EXISTS trg_bookings_stats_delete
+    AFTER DELETE ON bookings
+    WHEN NOT EXISTS (SELECT 1 FROM bookings_archive WHERE id = OLD.id)
+    BEGIN
+        {_contribution("OLD", -1)}
+    END
+    """
+
+
+def _move_user(old_department, new_department):
+    """INSERT .. SELECT moving the counts of OLD's bookings, live and
+    archived, from one department to another."""
+    return f"""
+        INSERT INTO booking_stats (resource_id, department_id, month, weekday, hour, status, bookings, minutes)
+        SELECT b.resource_id,
+               d.department_id,
+               substr(b.date, 1, 7),
+               CAST(strftime('%w', b.date) AS INTEGER),
+               h.hour,
+               b.status,
+               d.sign * SUM(h.hour = b.start_min / 60),
+               d.sign * SUM(MIN(b.end_min, (h.hour + 1) * 60) - MAX(b.start_min, h.hour * 60))
+        FROM (SELECT resource_id, date, status, start_min, end_min FROM bookings WHERE user_id = OLD.id
+              UNION ALL
+              SELECT resource_id, date, status, start_min, end_min FROM bookings_archive WHERE user_id = OLD.id) b
+        JOIN analytics_hours h ON h.hour * 60 < b.end_min AND (h.hour + 1) * 60 > b.start_min
+        JOIN (SELECT {old_department} AS department_id, -1 AS sign
+              UNION ALL
+              SELECT {new_department}, 1) d
+        WHERE b.resource_id IS NOT NULL AND b.status IS NOT NULL
+        GROUP BY 1, 2, 3, 4, 5, 6
+        ON CONFLICT(month, resource_id, department_id, weekday, hour, status) DO UPDATE SET
+            bookings = bookings + excluded.bookings,
+            minutes = minutes + excluded.minutes;
+    """
+
+
+# Need bookings_archive (booking_jobs.py)
+USER_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_users_stats_department
+    AFTER UPDATE OF department_id ON users
+    WHEN COALESCE(OLD.department_id, 0) != COALESCE(NEW.department_id, 0)
+    BEGIN
+        {_move_user("COALESCE(OLD.department_id, 0)", "COALESCE(NEW.department_id, 0)")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_users_stats_delete
+    AFTER DELETE ON users
+    WHEN COALESCE(OLD.department_id, 0) != 0
+    BEGIN
+        {_move_user("COALESCE(OLD.department_id, 0)", "0")}
+    END
+    """,
+]
+
+
+def ensure_user_triggers(cur):
+    for stmt in USER_TRIGGERS:
+        cur.execute(stmt)
+
+
+def ensure_schema(cur):
+    for stmt in SCHEMA:
+        cur.execute(stmt)
+    rebuild(cur)
+
+
+def rebuild(cur):
+    """Recompute booking_stats from bookings and bookings_archive (run inside a transaction)."""
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='bookings_archive'")
+    source = "bookings"
+    if cur.fetchone():
+        source = ("(SELECT user_id, resource_id, date, status, start_min, end_min FROM bookings UNION ALL "
+                  "SELECT user_id, resource_id, date, status, start_min, end_min FROM bookings_archive)")
+    cur.execute("DELETE FROM booking_stats")
+    cur.execute(f"""
+        INSERT INTO booking_stats (resource_id, department_id, month, weekday, hour, status, bookings, minutes)
+        SELECT b.resource_id,
+               COALESCE(u.department_id, 0),
+               substr(b.date, 1, 7),
+               CAST(strftime('%w', b.date) AS INTEGER),
+               h.hour,
+               b.status,
+               SUM(h.hour = b.start_min / 60),
+               SUM(MIN(b.end_min, (h.hour + 1) * 60) - MAX(b.start_min, h.hour * 60))
+        FROM {source} b
+        JOIN analytics_hours h ON h.hour * 60 < b.end_min AND (h.hour + 1) * 60 > b.start_min
+        LEFT JOIN users u ON u.id = b.user_id
+        WHERE b.resource_id IS NOT NULL AND b.status IS NOT NULL
+        GROUP BY 1, 2, 3, 4, 5, 6
+    """)
+
+
+def rate(approved, rejected):
+    decided = approved + rejected
+    return round(approved / decided, 4) if decided else None
+
+
+def utilization(cur, month_from, month_to, resource_id=None, department_id=None):
+    """Summaries for months month_from..month_to (YYYY-MM, inclusive).
+
+    Returns (per_resource, per_department, by_weekday_hour) where the first
+    two map id -> {status: (bookings, minutes)} and the last maps
+    (weekday, hour) -> (bookings, booked minutes).
+    """
+    where = ["month BETWEEN ? AND ?"]
+    params = [month_from, month_to]
+    if resource_id:
+        where.append("resource_id = ?")
+        params.append(resource_id)
+    if department_id:
+        where.append("department_id = ?")
+        params.append(department_id)
+    where = " AND ".join(where)
+
+    per_resource, per_department = {}, {}
+    cur.execute(f"""
+        SELECT resource_id, department_id, status, SUM(bookings), SUM(minutes) FROM booking_stats
+        WHERE {where} GROUP BY resource_id, department_id, status
+    """, params)
+    for resource, department, status, bookings, minutes in cur.fetchall():
+        for counts, key in ((per_resource, resource), (per_department, department)):
+            before = counts.setdefault(key, {}).get(status, (0, 0))
+            counts[key][status] = (before[0] + bookings, before[1] + minutes)
+
+    booked = ",".join("?" * len(BOOKED_STATUSES))
+    cur.execute(f"""
+        SELECT weekday, hour, SUM(bookings), SUM(minutes) FROM booking_stats
+        WHERE {where} AND status IN ({booked}) GROUP BY weekday, hour
+    """, params + list(BOOKED_STATUSES))
+    peaks = {(weekday, hour): (bookings, minutes) for weekday, hour, bookings, minutes in cur.fetchall()}
+    return per_resource, per_department, peaks
+
+
+def main(argv):
+    import sqlite3
+
+    if argv[1:2] != ["rebuild"]:
+        print("usage: python analytics.py rebuild")
+        return 2
+    path = os.environ.get("DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "college_booking.db"))
+    conn = sqlite3.connect(path, timeout=60)
+    conn.execute("BEGIN IMMEDIATE")
+    rebuild(conn.cursor())
+    conn.commit()
+    count = conn.execute("SELECT COUNT(*) FROM booking_stats").fetchone()[0]
+    conn.close()
+    print(f"{path}: rebuilt booking_stats ({count} rows)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
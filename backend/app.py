@@ -1,23 +1,75 @@
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, has_request_context, request, jsonify, stream_with_context
 from flask_cors import CORS
-import sqlite3
 import os
 from datetime import datetime, timedelta
 import logging
+import base64
+import json
 import hashlib
+import hmac
+import ipaddress
 import secrets
-import bcrypt
+import time
 import jwt
 
+import analytics
+import booking_events
+import booking_jobs
+import booking_search
+import booking_times
+import compression
+import conflicts
+import data_versions
+import db_pool
+import json_stream
+import metrics
+import migrations
+import passwords
+import principal_cache
+import rate_limit
+import slow_queries
+import write_queue
+
 # ---------------- Configuration ----------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_NAME = "college_booking.db"
-DB_PATH = os.path.join(BASE_DIR, DB_NAME)
+DB_PATH = os.environ.get('DB_PATH', os.path.join(BASE_DIR, DB_NAME))
+# Demo accounts and bookings are only written when asked for (dev scripts set this)
+SEED_DEMO_DATA = os.environ.get('SEED_DEMO_DATA', '').lower() in ('1', 'true', 'yes')
+# Per-worker metric snapshots, summed by /metrics
+METRICS_DIR = os.environ.get('METRICS_DIR', DB_PATH + '-metrics')
+# Bearer token a scraper must send to /metrics; without one only localhost may read it
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Statements slower than this are logged with their query plan; empty log path disables
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', DB_PATH + '-slow-queries.jsonl')
+# Booking and signup writes go through one writer per host and are group-committed
+WRITE_QUEUE = os.environ.get('WRITE_QUEUE', '1').lower() in ('1', 'true', 'yes')
+WRITE_QUEUE_SOCKET = os.environ.get('WRITE_QUEUE_SOCKET', DB_PATH + '-writer.sock')
+# Token-bucket budgets ("<count>/<second|minute|hour>", "0" disables one), shared by all workers
+RATE_LIMIT = os.environ.get('RATE_LIMIT', '1').lower() in ('1', 'true', 'yes')
+RATE_LIMIT_FILE = os.environ.get('RATE_LIMIT_FILE', DB_PATH + '-ratelimit')
+RATE_LIMIT_IP = os.environ.get('RATE_LIMIT_IP', '1200/minute')          # any /api route, per client IP
+RATE_LIMIT_USER = os.environ.get('RATE_LIMIT_USER', '600/minute')       # any /api route, per signed-in user
+RATE_LIMIT_LOGIN = os.environ.get('RATE_LIMIT_LOGIN', '20/minute')      # login and signup, per client IP
+RATE_LIMIT_CALENDAR = os.environ.get('RATE_LIMIT_CALENDAR', '60/minute')  # calendar events, per user
+RATE_LIMIT_CALENDAR_ANON = os.environ.get('RATE_LIMIT_CALENDAR_ANON', RATE_LIMIT_CALENDAR)  # same, per IP when signed out
+# Proxies in front of gunicorn that append to X-Forwarded-For (1 on Render/Heroku)
+PROXY_HOPS = int(os.environ.get('PROXY_HOPS', 0))
+# Load shedding: how many of these may run at once across all workers before the rest get a 503
+SHED_LOGIN_INFLIGHT = int(os.environ.get('SHED_LOGIN_INFLIGHT', 2 * (os.cpu_count() or 1)))
+SHED_CALENDAR_INFLIGHT = int(os.environ.get('SHED_CALENDAR_INFLIGHT', os.cpu_count() or 1))
+# Each open /api/stream holds a sync worker for up to STREAM_MAX_SECONDS; keep workers free for the rest
+SHED_STREAM_INFLIGHT = int(os.environ.get('SHED_STREAM_INFLIGHT', os.cpu_count() or 1))
+# bcrypt limits shared by all workers (BCRYPT_SLOTS, BCRYPT_MAX_QUEUE: see passwords.py)
+BCRYPT_LOCK = os.environ.get('BCRYPT_LOCK', DB_PATH + '-bcrypt')
+# Status and archival jobs (BOOKING_JOBS_INTERVAL, ARCHIVE_AFTER_DAYS: see booking_jobs.py); one worker runs them
+BOOKING_JOBS_LOCK = os.environ.get('BOOKING_JOBS_LOCK', DB_PATH + '-jobs.lock')
 
 app = Flask(__name__)
 # CORS configuration for deployment - allow all origins
-CORS(app, resources={r"/api/*": {"origins": "*"}})
+CORS(app, resources={r"/api/*": {"origins": "*", "expose_headers": ["X-Next-Cursor", "X-Search-Truncated"]}})
 logging.basicConfig(level=logging.INFO)
 
 # JWT Configuration
@@ -25,17 +77,66 @@ JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-change-in-pro
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 24 * 7  # 7 days
 
+# Calendar pagination
+CALENDAR_MAX_LIMIT = 1000
+
+# Booking search page size
+SEARCH_DEFAULT_LIMIT = 50
+SEARCH_MAX_LIMIT = 200
+
+# Availability: daily window searched for free time (not enforced on bookings)
+AVAILABILITY_OPEN = os.environ.get('AVAILABILITY_OPEN', '08:00')
+AVAILABILITY_CLOSE = os.environ.get('AVAILABILITY_CLOSE', '20:00')
+AVAILABILITY_MAX_DAYS = 62
+
+# Bulk booking import / batch approval
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 5000))
+BATCH_MAX_IDS = 1000
+# Statuses a booking can no longer be approved or rejected from
+FINAL_STATUSES = ("approved", "rejected", "cancelled", "conducted", "expired")
+
+# Server-sent events (/api/stream). Streams end before gunicorn's worker
+# timeout and the browser reconnects with Last-Event-ID.
+STREAM_POLL_SECONDS = float(os.environ.get('STREAM_POLL_SECONDS', 1.0))
+STREAM_MAX_SECONDS = float(os.environ.get('STREAM_MAX_SECONDS', 25))
+STREAM_HEARTBEAT_SECONDS = 10
+STREAM_RETRY_MS = 1000
+STREAM_BATCH = 500
+
 @app.route("/", methods=["GET"])
 def index():
     return jsonify({"app": "college-booking", "version": "dev", "status": "running"})
 
 @app.route("/health", methods=["GET"])
 def health():
-    return jsonify({"ok": True})
+    return jsonify({
+        "ok": True,
+        "db_pool": pool.stats(),
+        "principal_cache": principals.stats(),
+        "password_hasher": hasher.stats(),
+    })
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus text format, summed over all gunicorn workers"""
+    if METRICS_TOKEN:
+        allowed = hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                      f"Bearer {METRICS_TOKEN}".encode())
+    else:
+        try:
+            allowed = ipaddress.ip_address(client_ip()).is_loopback
+        except ValueError:
+            allowed = False
+    if not allowed:
+        return jsonify({"message": "Forbidden"}), 403
+    return Response(request_metrics.render(), mimetype="text/plain; version=0.0.4")
 
 # ---------------- Helpers ----------------
+pool = db_pool.ConnectionPool(DB_PATH)
+
 def db_conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+    """Get a pooled connection; conn.close() returns it to the pool."""
+    return pool.acquire()
 
 def time_ok(t):
     try:
@@ -51,6 +152,47 @@ def date_ok(d):
     except:
         return False
 
+def encode_cursor(*values):
+    """Opaque keyset cursor for paginated listings"""
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor, size):
+    """Inverse of encode_cursor; returns None if the cursor is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except Exception:
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
+
+def minute_to_time(minute):
+    """minute of day -> 'HH:MM'"""
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+def parse_day_window(args, default_days=7):
+    """Read from/to (YYYY-MM-DD, inclusive) and open/close (HH:MM) query args.
+
+    Returns ((from_date, to_date, open_minute, close_minute), None) or (None, message).
+    """
+    date_from = args.get("from") or datetime.now().date().isoformat()
+    date_to = args.get("to")
+    if not date_ok(date_from) or (date_to and not date_ok(date_to)):
+        return None, "from/to must be YYYY-MM-DD"
+    start = datetime.strptime(date_from, "%Y-%m-%d").date()
+    end = datetime.strptime(date_to, "%Y-%m-%d").date() if date_to else start + timedelta(days=default_days - 1)
+    open_time = args.get("open") or AVAILABILITY_OPEN
+    close_time = args.get("close") or AVAILABILITY_CLOSE
+    if not time_ok(open_time) or not time_ok(close_time) or open_time >= close_time:
+        return None, "open/close must be HH:MM with open before close"
+    if end < start:
+        return None, "to must not be before from"
+    if (end - start).days >= AVAILABILITY_MAX_DAYS:
+        return None, f"At most {AVAILABILITY_MAX_DAYS} days per request"
+    return (start, end, conflicts.to_minutes(open_time), conflicts.to_minutes(close_time)), None
+
 def generate_token(user_id):
     """Generate JWT token for user"""
     payload = {
@@ -64,28 +206,73 @@ def generate_token(user_id):
         token = token.decode('utf-8')
     return token
 
-def get_user_from_token():
-    """Extract user from Authorization header using JWT"""
-    auth_header = request.headers.get('Authorization', '')
-    if not auth_header.startswith('Bearer '):
-        return None
-    token = auth_header.replace('Bearer ', '').strip()
-    
+principals = principal_cache.PrincipalCache()
+
+def principals_version():
+    conn = db_conn()
     try:
-        # Decode JWT token
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        user_id = payload.get('user_id')
-        
-        if not user_id:
+        return principal_cache.version(conn.cursor())
+    finally:
+        conn.close()
+
+def decode_token(token):
+    """JWT payload of token; raises jwt.InvalidTokenError.
+
+    The result is kept for the rest of the request, so admission (which
+    needs the user id for rate limits) and authentication decode it once.
+    """
+    decoded = g.get("decoded_token")
+    if decoded is None or decoded[0] != token:
+        try:
+            result = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        except jwt.InvalidTokenError as e:
+            result = e
+        decoded = g.decoded_token = (token, result)
+    if isinstance(decoded[1], Exception):
+        raise decoded[1]
+    return decoded[1]
+
+def get_user_row_from_token(token=None):
+    """Resolve the bearer token to its (id, username, role, name, department, department_id) row.
+
+    Rows are served from the principal cache for hot sessions without
+    touching the database; only a miss decodes the JWT and reads the
+    user. The token is taken from the Authorization header unless passed
+    explicitly.
+    """
+    if token is None:
+        auth_header = request.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
             return None
-        
-        # Get user from database
-        conn = db_conn()
+        token = auth_header.replace('Bearer ', '').strip()
+
+    principals.check(principals_version)
+    row = principals.get(token)
+    if row is not None:
+        return row
+
+    generation = principals.generation()
+    payload = decode_token(token)
+    user_id = payload.get('user_id')
+    if not user_id:
+        return None
+
+    conn = db_conn()
+    try:
         cur = conn.cursor()
         cur.execute("SELECT id, username, role, name, department, department_id FROM users WHERE id=?", (user_id,))
         row = cur.fetchone()
+    finally:
         conn.close()
-        
+
+    if row:
+        principals.put(token, row, generation, payload.get('exp'))
+    return row
+
+def get_user_from_token(token=None):
+    """Extract user from Authorization header using JWT"""
+    try:
+        row = get_user_row_from_token(token)
         if row:
             return {
                 "id": row[0],
@@ -106,6 +293,235 @@ def get_user_from_token():
         logging.error(f"Error decoding token: {str(e)}")
         return None
 
+def conditional_get(tables, *extra, private=False):
+    """ETag check for read endpoints.
+
+    Returns (etag, response); response is a ready 304 when the client's
+    If-None-Match still matches, otherwise None and the caller builds the
+    body and passes it through with_etag().
+    """
+    conn = db_conn()
+    cur = conn.cursor()
+    versions = data_versions.current(cur, tables)
+    conn.close()
+    etag = data_versions.etag_for(versions, request.path, request.query_string.decode(), *extra)
+    # The client may hold the variant compressed for this Accept-Encoding ("<etag>-gzip"); echo it
+    for candidate in compression.etag_variants(etag, request.headers.get("Accept-Encoding")):
+        if request.if_none_match.contains_weak(candidate):
+            return etag, with_etag(app.response_class(status=304), candidate, private)
+    return etag, None
+
+def with_etag(response, etag, private=False):
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache" if private else "no-cache"
+    return response
+
+def json_response(data, status=200):
+    """Like jsonify, but with the faster json_stream encoder"""
+    return Response(json_stream.dumps(data), status=status, mimetype="application/json")
+
+def stream_json_array(items, conn=None):
+    """Stream an iterable of dicts as a JSON array.
+
+    Pass the connection the items are read from; it goes back to the pool
+    when the response is closed, whether or not the body was sent in full.
+    """
+    response = Response(stream_with_context(json_stream.array_chunks(items)), mimetype="application/json")
+    if conn is not None:
+        response.call_on_close(conn.close)
+    return response
+
+hasher = passwords.PasswordHasher(lock_path=BCRYPT_LOCK)
+
+# ---------------- Metrics ----------------
+request_metrics = metrics.Metrics(METRICS_DIR)
+pool.add_statement_observer(request_metrics.observe_statement)
+hasher.add_observer(request_metrics.observe_bcrypt)
+
+def process_stats():
+    pool_stats, cache_stats, hasher_stats = pool.stats(), principals.stats(), hasher.stats()
+    return {
+        "db_connections_created_total": pool_stats["created"],
+        "db_connections_in_use": pool_stats["in_use"],
+        "principal_cache_hits_total": cache_stats["hits"],
+        "principal_cache_misses_total": cache_stats["misses"],
+        "principal_cache_checks_total": cache_stats["checks"],
+        "bcrypt_queue_depth": hasher_stats["queue_depth"],
+        "bcrypt_rejected_total": hasher_stats["rejected"],
+        "bcrypt_busy_seconds_total": hasher_stats["busy_seconds"],
+    }
+
+request_metrics.add_collector(process_stats)
+
+# ---------------- Compression ----------------
+compressor = compression.Compressor()
+
+def compression_stats():
+    stats = compressor.stats()
+    counters = {"compression_cache_hits_total": stats["cache_hits"]}
+    for encoding in compression.available_encodings():
+        encoded = stats.get(encoding, {})
+        counters[f"compression_{encoding}_responses_total"] = encoded.get("responses", 0)
+        counters[f"compression_{encoding}_bytes_in_total"] = encoded.get("bytes_in", 0)
+        counters[f"compression_{encoding}_bytes_out_total"] = encoded.get("bytes_out", 0)
+        counters[f"compression_{encoding}_seconds_total"] = encoded.get("seconds", 0.0)
+    return counters
+
+request_metrics.add_collector(compression_stats)
+
+def current_route():
+    """URL rule of the request being handled (None outside a request)"""
+    if not has_request_context():
+        return None
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+@app.before_request
+def start_request_metrics():
+    request_metrics.start_request()
+
+@app.after_request
+def finish_request_metrics(response):
+    request_metrics.finish_request(current_route(), request.method, response.status_code)
+    return response
+
+@app.after_request
+def compress_response(response):
+    # Registered after the metrics hook, so it runs first and its time is counted
+    return compressor.apply(response, request.headers.get("Accept-Encoding"))
+
+# ---------------- Rate limiting ----------------
+limiter = rate_limit.RateLimiter(RATE_LIMIT_FILE, [
+    rate_limit.Rule("ip", RATE_LIMIT_IP, scope="ip"),
+    rate_limit.Rule("user", RATE_LIMIT_USER, scope="user"),
+    rate_limit.Rule("login", RATE_LIMIT_LOGIN, scope="ip", routes={"/api/auth/login", "/api/auth/signup"}),
+    rate_limit.Rule("calendar", RATE_LIMIT_CALENDAR, scope="user", routes={"/api/calendar/events"}),
+    rate_limit.Rule("calendar_anon", RATE_LIMIT_CALENDAR_ANON, scope="anonymous", routes={"/api/calendar/events"}),
+], inflight_limits={"login": SHED_LOGIN_INFLIGHT, "calendar": SHED_CALENDAR_INFLIGHT, "stream": SHED_STREAM_INFLIGHT},
+   enabled=RATE_LIMIT)
+
+# Requests counted against the in-flight limits while they run
+SHED_CLASSES = {
+    "/api/auth/login": "login",
+    "/api/auth/signup": "login",
+    "/api/calendar/events": "calendar",
+    "/api/stream": "stream",
+}
+# Seconds a shed client is told to wait (streams stay busy for a while)
+SHED_RETRY_AFTER = {"stream": 5}
+
+def client_ip():
+    """Address of the client, skipping PROXY_HOPS trusted proxies"""
+    if PROXY_HOPS > 0:
+        forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+        if len(forwarded) >= PROXY_HOPS:
+            return forwarded[-PROXY_HOPS]
+    return request.remote_addr or "unknown"
+
+def token_user_id():
+    """User id of a validly signed bearer token, without a database read"""
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    try:
+        payload = decode_token(auth_header.replace('Bearer ', '').strip())
+    except jwt.InvalidTokenError:
+        return None
+    return payload.get('user_id')
+
+@app.before_request
+def admit_request():
+    """Refuse over-budget clients (429) and shed expensive requests when
+    too many are already running (503), before any real work is done"""
+    route = current_route()
+    if not route.startswith("/api/") or request.method == "OPTIONS":
+        return None
+    refused = limiter.check(route, client_ip(), token_user_id())
+    if refused is not None:
+        response = jsonify({"message": "Too many requests, please slow down"})
+        response.headers["Retry-After"] = rate_limit.retry_after(refused[1])
+        return response, 429
+    shed_class = SHED_CLASSES.get(route)
+    if shed_class is not None:
+        if not limiter.admit(shed_class):
+            response = jsonify({"message": "Server busy, please retry shortly"})
+            response.headers["Retry-After"] = str(SHED_RETRY_AFTER.get(shed_class, 1))
+            return response, 503
+        g.admitted = shed_class
+    return None
+
+def release_once(shed_class):
+    """Callback releasing one admission, however often it is called"""
+    pending = [shed_class]
+    def release():
+        if pending:
+            limiter.release(pending.pop())
+    return release
+
+@app.after_request
+def release_after_body(response):
+    # A streamed body is sent after the request context is torn down, so
+    # the request counts until the server closes the response instead
+    shed_class = g.get("admitted")
+    if shed_class is not None and response.is_streamed:
+        del g.admitted
+        response.call_on_close(release_once(shed_class))
+    return response
+
+@app.teardown_request
+def release_request(exc):
+    shed_class = g.pop("admitted", None)
+    if shed_class is not None:
+        limiter.release(shed_class)
+
+def rate_limit_stats():
+    stats = limiter.stats()
+    counters = {f"rate_limited_{name}_total": count for name, count in stats["limited"].items()}
+    counters.update({f"load_shed_{name}_total": count for name, count in stats["shed"].items()})
+    counters["rate_limit_errors_total"] = stats["errors"]
+    return counters
+
+request_metrics.add_collector(rate_limit_stats)
+
+if SLOW_QUERY_LOG:
+    slow_query_log = slow_queries.SlowQueryLog(SLOW_QUERY_LOG, DB_PATH, SLOW_QUERY_MS, context=current_route)
+    pool.add_statement_observer(slow_query_log.observe)
+
+def check_password(conn, user_id, password, hashed_password):
+    """Verify a login password; plain-text and low-cost hashes are upgraded in place"""
+    if passwords.is_bcrypt_hash(hashed_password):
+        try:
+            password_valid = hasher.verify(password, hashed_password)
+        except passwords.HasherBusy:
+            raise
+        except Exception as e:
+            logging.error(f"Bcrypt check error: {str(e)}")
+            return False
+    else:
+        # Plain text password (for existing users - migrate on first login)
+        password_valid = password == hashed_password
+
+    if password_valid and hasher.needs_rehash(hashed_password):
+        try:
+            hashed = hasher.hash(password)
+        except passwords.HasherBusy:
+            # Not worth failing the login over; upgrade on a later one
+            return True
+        conn.execute("UPDATE users SET password = ? WHERE id = ?", (hashed, user_id))
+        conn.commit()
+    return password_valid
+
+def password_hasher_busy():
+    response = jsonify({"message": "Too many sign-in attempts right now, please retry shortly"})
+    response.headers["Retry-After"] = "2"
+    return response, 503
+
+def write_outcome_unknown(e):
+    """503 for a write handed to the write queue that got no answer: it may
+    still commit, so the client should check before sending it again"""
+    logging.error(f"Write outcome unknown: {str(e)}")
+    return jsonify({"message": "The server is busy and could not confirm the change; "
+                               "please check whether it was saved before retrying"}), 503
+
 def require_auth():
     """Middleware to require authentication"""
     user = get_user_from_token()
@@ -124,116 +540,60 @@ def require_hod():
 
 # ---------------- Init & Seed ----------------
 def init_db():
-    """Create tables and seed demo users/resources if missing."""
+    """Bring the schema up to date; seed demo data if SEED_DEMO_DATA is set."""
     try:
-        logging.info("Initializing DB at %s", DB_PATH)
         conn = db_conn()
-        cur = conn.cursor()
     except Exception as e:
         logging.error(f"Failed to connect to database: {str(e)}")
         raise
 
     try:
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE,
-            password TEXT,
-            role TEXT CHECK(role IN ('student','teacher','hod')),
-            name TEXT,
-            department TEXT,
-            department_id INTEGER
-        )
-        """)
-
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS resources (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            type TEXT CHECK(type IN ('seminar','auditorium','lab')),
-            capacity INTEGER
-        )
-        """)
-
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS bookings (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            resource_id INTEGER,
-            title TEXT,
-            date TEXT,
-            start_time TEXT,
-            end_time TEXT,
-            purpose TEXT,
-            status TEXT CHECK(status IN ('pending','approved','rejected','cancelled','conducted')) DEFAULT 'pending',
-            created_at TEXT DEFAULT (datetime('now')),
-            FOREIGN KEY(user_id) REFERENCES users(id),
-            FOREIGN KEY(resource_id) REFERENCES resources(id)
-        )
-        """)
+        applied = migrations.migrate(conn)
+        if applied:
+            logging.info("Migrated DB at %s to schema version %d", DB_PATH, applied[-1])
+        if SEED_DEMO_DATA:
+            seed_demo_data(conn)
+    except Exception as e:
+        logging.error(f"Error during DB initialization: {str(e)}")
+        raise
+    finally:
+        conn.close()
 
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS departments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT
+def seed_demo_data(conn):
+    """Create the demo accounts and reset their bookings to dates around today."""
+    cur = conn.cursor()
+    logging.info("Seeding demo data into %s", DB_PATH)
+    demo_users = [
+        ("student@college.edu", "student123", "student", "John Student", "Computer Science", 1),
+        ("student@gmail.com", "Student", "student", "Student User", "Computer Science", 1),
+        ("teacher@college.edu", "teacher123", "teacher", "Dr. Jane Teacher", "Computer Science", 1),
+        ("teacher@gmail.com", "Teacher", "teacher", "Teacher User", "Computer Science", 1),
+        ("hod@college.edu", "hod123", "hod", "Prof. Smith HOD", "Computer Science", 1),
+        ("hod@gmail.com", "hod", "hod", "HOD User", "Computer Science", 1),
+    ]
+
+    cur.execute(
+        f"SELECT username FROM users WHERE username IN ({','.join('?' * len(demo_users))})",
+        [u[0] for u in demo_users],
+    )
+    existing = {row[0] for row in cur.fetchall()}
+    missing_users = [u for u in demo_users if u[0] not in existing]
+
+    # Hash outside the write lock; seeding must not be turned away by the login limit
+    hashed_pwds = hasher.hash_many([u[1] for u in missing_users])
+
+    # Every worker may get here at once; serialize so they don't interleave
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.executemany(
+            "INSERT OR IGNORE INTO users (username, password, role, name, department, department_id) VALUES (?, ?, ?, ?, ?, ?)",
+            [(email, hashed_pwd, role, name, department, dept_id)
+             for (email, _, role, name, department, dept_id), hashed_pwd in zip(missing_users, hashed_pwds)],
         )
-        """)
-
-        # Seed users - check if each user exists, if not add them
-        logging.info("Seeding users...")
-        demo_users = [
-            ("student@college.edu", "student123", "student", "John Student", "Computer Science", 1),
-            ("student@gmail.com", "Student", "student", "Student User", "Computer Science", 1),
-            ("teacher@college.edu", "teacher123", "teacher", "Dr. Jane Teacher", "Computer Science", 1),
-            ("teacher@gmail.com", "Teacher", "teacher", "Teacher User", "Computer Science", 1),
-            ("hod@college.edu", "hod123", "hod", "Prof. Smith HOD", "Computer Science", 1),
-            ("hod@gmail.com", "hod", "hod", "HOD User", "Computer Science", 1),
-        ]
-        
-        for email, password, role, name, department, dept_id in demo_users:
-            # Check if user already exists
-            cur.execute("SELECT id FROM users WHERE username = ?", (email.lower(),))
-            if not cur.fetchone():
-                # User doesn't exist, create them
-                hashed_pwd = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-                try:
-                    cur.execute(
-                        "INSERT INTO users (username, password, role, name, department, department_id) VALUES (?, ?, ?, ?, ?, ?)",
-                        (email.lower(), hashed_pwd, role, name, department, dept_id)
-                    )
-                    logging.info(f"Created user: {email.lower()}")
-                except Exception as e:
-                    logging.warning(f"Failed to create user {email.lower()}: {str(e)}")
-
-        # Seed resources
-        cur.execute("SELECT COUNT(*) FROM resources")
-        if cur.fetchone()[0] == 0:
-            logging.info("Seeding resources...")
-            cur.executemany(
-                "INSERT INTO resources (name, type, capacity) VALUES (?, ?, ?)",
-                [
-                    ("Seminar Hall", "seminar", 100),
-                    ("Auditorium", "auditorium", 500),
-                    ("Lab", "lab", 30),
-                ],
-            )
+        for email, *_ in missing_users:
+            logging.info(f"Created user: {email}")
 
-        # Seed departments
-        cur.execute("SELECT COUNT(*) FROM departments")
-        if cur.fetchone()[0] == 0:
-            logging.info("Seeding departments...")
-            cur.executemany(
-                "INSERT INTO departments (name) VALUES (?)",
-                [
-                    ("Computer Science",),
-                    ("Electronics",),
-                    ("Mechanical",),
-                ],
-            )
-
-        conn.commit()
-        
-        # Seed demo bookings - always ensure demo users have bookings
+        # Always ensure demo users have bookings
         # First, delete any existing bookings for demo users to avoid duplicates
         cur.execute("""
             DELETE FROM bookings 
@@ -245,18 +605,12 @@ def init_db():
         deleted_count = cur.rowcount
         if deleted_count > 0:
             logging.info(f"Cleaned up {deleted_count} existing demo bookings")
-        
+
         # Now seed fresh demo bookings
-        logging.info("Seeding demo bookings...")
         _seed_demo_bookings(cur)
         conn.commit()
-        
-        conn.close()
-        logging.info("DB initialization complete.")
-    except Exception as e:
-        logging.error(f"Error during DB initialization: {str(e)}")
-        if 'conn' in locals():
-            conn.close()
+    except Exception:
+        conn.rollback()
         raise
 
 def _seed_demo_bookings(cur):
@@ -350,20 +704,237 @@ def _seed_demo_bookings(cur):
         logging.warning(f"Failed to seed demo bookings: {str(e)}")
 
 # ---------------- Overlap check ----------------
+conflict_index = conflicts.ConflictIndex()
+
 def has_overlap(cur, resource_id, date, start_time, end_time, ignore_booking_id=None):
     """Check for overlapping bookings"""
-    q = """
-        SELECT id FROM bookings
-        WHERE resource_id=? AND date=?
-          AND status IN ('pending','approved')
-          AND (? < end_time) AND (? > start_time)
+    return conflict_index.find_conflict(
+        cur, resource_id, date, start_time, end_time, ignore_booking_id
+    ) is not None
+
+# ---------------- Write queue ----------------
+# Writes run in the leader worker's writer thread, inside a shared
+# transaction; each returns [body, status] for the route to send back.
+writes = write_queue.WriteQueue(db_conn, WRITE_QUEUE_SOCKET, enabled=WRITE_QUEUE,
+                                on_abort=conflict_index.clear)
+
+def insert_booking(tx, user_id, resource, title, date, start_time, end_time, purpose):
+    cur = tx.cur
+    cur.execute("SELECT id FROM resources WHERE name = ?", (resource,))
+    resource_result = cur.fetchone()
+    if not resource_result:
+        return [{"message": "Invalid resource"}, 400]
+    resource_id = resource_result[0]
+
+    # Checked inside the write transaction, so no other booking can slip in
+    if has_overlap(cur, resource_id, date, start_time, end_time):
+        return [{"message": "Slot already booked or has a conflict"}, 409]
+
+    cur.execute("""
+        INSERT INTO bookings (user_id, resource_id, title, date, start_time, end_time, purpose, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
+    """, (user_id, resource_id, title, date, start_time, end_time, purpose))
+    booking_id = cur.lastrowid
+    changes = conflict_index.changes()
+    changes.added(resource_id, date, start_time, end_time, booking_id)
+    changes.stamp(cur)
+    tx.after_commit(changes.apply)
+    return [{"id": booking_id}, 201]
+
+def set_booking_status(tx, booking_id, action):
+    """cancel / approve / reject; the caller has checked who may do it"""
+    cur = tx.cur
+    cur.execute("""
+        SELECT resource_id, date, start_time, end_time, status
+        FROM bookings
+        WHERE id = ?
+    """, (booking_id,))
+    row = cur.fetchone()
+    if not row:
+        return [{"message": "Booking not found"}, 404]
+    resource_id, date, start_time, end_time, current_status = row
+
+    if action == "cancel":
+        # Only open bookings; cancelling a finished one would rewrite history
+        if current_status not in conflicts.ACTIVE_STATUSES:
+            return [{"message": f"Booking already {current_status}"}, 400]
+        new_status = "cancelled"
+    else:
+        if current_status in FINAL_STATUSES:
+            return [{"message": f"Booking already {current_status}"}, 400]
+        # Check for conflicts before approving
+        if action == "approve" and has_overlap(cur, resource_id, date, start_time, end_time,
+                                               ignore_booking_id=booking_id):
+            return [{"message": "Conflict detected; cannot approve"}, 409]
+        new_status = "approved" if action == "approve" else "rejected"
+
+    cur.execute("UPDATE bookings SET status = ? WHERE id = ?", (new_status, booking_id))
+    changes = conflict_index.changes()
+    changes.status_changed(resource_id, date, start_time, end_time, booking_id, current_status, new_status)
+    changes.stamp(cur)
+    tx.after_commit(changes.apply)
+    return [{"id": booking_id, "status": new_status, "action": action}, 200]
+
+def insert_bookings(tx, user_id, items, total, atomic):
+    """Bulk import: items are [index, booking] pairs from parse_booking(),
+    total the number of items in the request (valid or not).
+
+    Items are checked against existing bookings and against each other.
+    Returns [results, created]: a result dict per item, with its index.
+    """
+    cur = tx.cur
+    results = []
+    names = sorted({b["resource"] for _, b in items})
+    resource_ids = {}
+    if names:
+        cur.execute(f"SELECT name, id FROM resources WHERE name IN ({','.join('?' * len(names))})", names)
+        resource_ids = dict(cur.fetchall())
+
+    # Sweep per (resource, date): existing bookings plus already accepted batch items
+    accepted = []
+    batch_slots = {}
+    for index, booking in sorted(items, key=lambda p: (p[1]["date"], p[1]["start_time"], p[0])):
+        resource_id = resource_ids.get(booking["resource"])
+        if resource_id is None:
+            results.append({"index": index, "status": "invalid", "message": "Invalid resource"})
+            continue
+        key = (resource_id, booking["date"])
+        start = conflicts.to_minutes(booking["start_time"])
+        end = conflicts.to_minutes(booking["end_time"])
+        if key not in batch_slots:
+            batch_slots[key] = conflicts.IntervalSet()
+        clash = batch_slots[key].find(start, end)
+        if clash is not None:
+            results.append({"index": index, "status": "conflict",
+                            "message": f"Conflicts with item {clash} of this batch"})
+            continue
+        if has_overlap(cur, resource_id, booking["date"], booking["start_time"], booking["end_time"]):
+            results.append({"index": index, "status": "conflict",
+                            "message": "Slot already booked or has a conflict"})
+            continue
+        batch_slots[key].add(start, end, index)
+        accepted.append((index, resource_id, booking))
+
+    if atomic and len(accepted) < total:
+        # Nothing has been written yet
+        results.extend({"index": index, "status": "skipped", "message": "Not inserted because other items failed"}
+                       for index, _, _ in accepted)
+        return [results, 0]
+
+    if accepted:
+        cur.executemany("""
+            INSERT INTO bookings (user_id, resource_id, title, date, start_time, end_time, purpose, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
+        """, [(user_id, resource_id, b["title"], b["date"], b["start_time"], b["end_time"], b["purpose"])
+              for _, resource_id, b in accepted])
+        # AUTOINCREMENT ids are consecutive while we hold the write lock
+        cur.execute("SELECT last_insert_rowid()")
+        first_id = cur.fetchone()[0] - len(accepted) + 1
+
+    changes = conflict_index.changes()
+    for offset, (index, resource_id, booking) in enumerate(accepted):
+        booking_id = first_id + offset
+        changes.added(resource_id, booking["date"], booking["start_time"], booking["end_time"], booking_id)
+        results.append({"index": index, "status": "created", "id": booking_id})
+    changes.stamp(cur)
+    tx.after_commit(changes.apply)
+    return [results, len(accepted)]
+
+def set_booking_statuses(tx, ids, action):
+    """Batch approve / reject; the caller has checked the HOD role.
+
+    Returns [results, updated]: one result per id, in the order given.
     """
-    params = [resource_id, date, start_time, end_time]
-    if ignore_booking_id:
-        q += " AND id<>?"
-        params.append(ignore_booking_id)
-    cur.execute(q, params)
-    return cur.fetchone() is not None
+    cur = tx.cur
+    new_status = "approved" if action == "approve" else "rejected"
+    cur.execute(f"""
+        SELECT id, resource_id, date, start_time, end_time, status
+        FROM bookings
+        WHERE id IN ({','.join('?' * len(ids))})
+    """, ids)
+    rows = {row[0]: row for row in cur.fetchall()}
+
+    results = {}
+    candidates = []
+    for booking_id in ids:
+        row = rows.get(booking_id)
+        if row is None:
+            results[booking_id] = {"id": booking_id, "status": "error", "message": "Booking not found"}
+        elif row[5] in FINAL_STATUSES:
+            results[booking_id] = {"id": booking_id, "status": "error",
+                                   "message": f"Booking already {row[5]}"}
+        else:
+            candidates.append(row)
+
+    updated = []
+    changes = conflict_index.changes()
+    # Sorted so each (resource, date) bucket is loaded once and walked in order
+    for booking_id, resource_id, date, start_time, end_time, current_status in sorted(
+            candidates, key=lambda r: (r[1], r[2], r[3], r[0])):
+        if action == "approve" and has_overlap(cur, resource_id, date, start_time, end_time,
+                                               ignore_booking_id=booking_id):
+            results[booking_id] = {"id": booking_id, "status": "error",
+                                   "message": "Conflict detected; cannot approve"}
+            continue
+        changes.status_changed(resource_id, date, start_time, end_time, booking_id,
+                               current_status, new_status)
+        updated.append(booking_id)
+        results[booking_id] = {"id": booking_id, "status": new_status, "action": action}
+
+    cur.executemany("UPDATE bookings SET status = ? WHERE id = ?",
+                    [(new_status, booking_id) for booking_id in updated])
+    changes.stamp(cur)
+    tx.after_commit(changes.apply)
+    return [[results[booking_id] for booking_id in ids], len(updated)]
+
+def insert_user(tx, email, hashed_password, role, name, department, department_id):
+    cur = tx.cur
+    cur.execute("SELECT id FROM users WHERE username = ?", (email,))
+    if cur.fetchone():
+        return [{"message": "User with this email already exists"}, 409]
+    cur.execute("""
+        INSERT INTO users (username, password, role, name, department, department_id) 
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (email, hashed_password, role, name, department, department_id))
+    return [{"id": cur.lastrowid}, 201]
+
+writes.register("insert_booking", insert_booking)
+writes.register("set_booking_status", set_booking_status)
+writes.register("insert_bookings", insert_bookings)
+writes.register("set_booking_statuses", set_booking_statuses)
+writes.register("insert_user", insert_user)
+
+def write_queue_stats():
+    stats = writes.stats()
+    return {
+        "write_queue_leader": stats["leader"],
+        "write_queue_batches_total": stats["batches"],
+        "write_queue_batched_ops_total": stats["batched_ops"],
+        "write_queue_forwarded_total": stats["forwarded"],
+        "write_queue_direct_total": stats["direct"],
+        "write_queue_failed_total": stats["failed"],
+        "write_queue_lock_retries_total": stats["lock_retries"],
+    }
+
+request_metrics.add_collector(write_queue_stats)
+
+# ---------------- Booking jobs ----------------
+# Stored conducted/expired statuses and archival of old bookings; started once the schema is current
+jobs = booking_jobs.Scheduler(db_conn, BOOKING_JOBS_LOCK)
+
+def booking_jobs_stats():
+    stats = jobs.stats()
+    return {
+        "booking_jobs_leader": stats["leader"],
+        "booking_jobs_runs_total": stats["runs"],
+        "booking_jobs_failed_total": stats["failed"],
+        "booking_jobs_conducted_total": stats["conducted"],
+        "booking_jobs_expired_total": stats["expired"],
+        "booking_jobs_archived_total": stats["archived"],
+        "booking_jobs_seconds_total": stats["seconds"],
+    }
+
+request_metrics.add_collector(booking_jobs_stats)
 
 # ---------------- API Routes ----------------
 
@@ -395,24 +966,8 @@ def login():
         
         user_id, username, hashed_password, role, name, department, department_id = user_row
         
-        # Verify password
-        # Check if password is hashed (starts with $2b$) or plain text (for migration)
-        password_valid = False
-        if hashed_password and hashed_password.startswith('$2b$'):
-            # Password is hashed, verify using bcrypt
-            try:
-                password_valid = bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
-            except Exception as e:
-                logging.error(f"Bcrypt check error: {str(e)}")
-                password_valid = False
-        else:
-            # Plain text password (for existing users - migrate on first login)
-            if password == hashed_password:
-                password_valid = True
-                # Hash the password and update database
-                hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-                cur.execute("UPDATE users SET password = ? WHERE id = ?", (hashed, user_id))
-                conn.commit()
+        # Verify password (bcrypt hash, or plain text for migration)
+        password_valid = check_password(conn, user_id, password, hashed_password)
         
         if not password_valid:
             conn.close()
@@ -436,6 +991,9 @@ def login():
                 "department_id": department_id or 1
             }
         })
+    except passwords.HasherBusy:
+        conn.close()
+        return password_hasher_busy()
     except Exception as db_error:
         logging.error(f"Database query error: {str(db_error)}")
         logging.error(f"Error type: {type(db_error).__name__}")
@@ -455,19 +1013,7 @@ def login():
             user_id, username, hashed_password, role, name, department, department_id = user_row
             
             # Verify password
-            password_valid = False
-            if hashed_password and hashed_password.startswith('$2b$'):
-                try:
-                    password_valid = bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
-                except Exception as e:
-                    logging.error(f"Bcrypt check error: {str(e)}")
-                    password_valid = False
-            else:
-                if password == hashed_password:
-                    password_valid = True
-                    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-                    cur.execute("UPDATE users SET password = ? WHERE id = ?", (hashed, user_id))
-                    conn.commit()
+            password_valid = check_password(conn, user_id, password, hashed_password)
             
             if not password_valid:
                 conn.close()
@@ -511,13 +1057,10 @@ def get_current_user():
     user = get_user_from_token()
     if not user:
         return jsonify({"message": "Unauthorized"}), 401
-    
-    conn = db_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id, username, role, name, department, department_id FROM users WHERE id=?", (user["id"],))
-    row = cur.fetchone()
-    conn.close()
-    
+
+    # Raw row (no defaults applied), served from the principal cache
+    row = get_user_row_from_token()
+
     if row:
         return jsonify({
             "user": {
@@ -563,151 +1106,457 @@ def signup():
     conn = db_conn()
     cur = conn.cursor()
     
-    # Check if user already exists
+    # Check if user already exists (again when inserting; this saves a bcrypt round)
     cur.execute("SELECT id FROM users WHERE username = ?", (email,))
-    if cur.fetchone():
-        conn.close()
+    exists = cur.fetchone()
+    conn.close()
+    if exists:
         return jsonify({"message": "User with this email already exists"}), 409
     
     # Hash password
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    try:
+        hashed_password = hasher.hash(password)
+    except passwords.HasherBusy:
+        return password_hasher_busy()
     
     # Insert new user
     try:
-        cur.execute("""
-            INSERT INTO users (username, password, role, name, department, department_id) 
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (email, hashed_password, role, name, department, department_id))
-        conn.commit()
-        user_id = cur.lastrowid
-        conn.close()
-        
-        # Generate JWT token and return user
-        token = generate_token(user_id)
-        
-        return jsonify({
-            "token": token,
-            "user": {
-                "id": user_id,
-                "name": name,
-                "email": email,
-                "role": role,
-                "department": department,
-                "department_id": department_id
-            },
-            "message": "Account created successfully"
-        }), 201
-    except Exception as e:
-        conn.rollback()
-        conn.close()
+        result, status = writes.submit("insert_user", email=email, hashed_password=hashed_password, role=role,
+                                       name=name, department=department, department_id=department_id)
+    except write_queue.WriteUnknown as e:
+        return write_outcome_unknown(e)
+    except write_queue.WriteFailed as e:
         logging.error(f"Error creating user: {str(e)}")
         return jsonify({"message": "Failed to create account"}), 500
+    if status != 201:
+        return jsonify(result), status
+    user_id = result["id"]
+    
+    # Generate JWT token and return user
+    token = generate_token(user_id)
+    
+    return jsonify({
+        "token": token,
+        "user": {
+            "id": user_id,
+            "name": name,
+            "email": email,
+            "role": role,
+            "department": department,
+            "department_id": department_id
+        },
+        "message": "Account created successfully"
+    }), 201
 
 # Resources
 @app.route("/api/resources", methods=["GET"])
 def list_resources():
+    etag, not_modified = conditional_get(("resources",))
+    if not_modified:
+        return not_modified
+
     conn = db_conn()
     cur = conn.cursor()
     cur.execute("SELECT id, name, capacity FROM resources ORDER BY id")
     rows = cur.fetchall()
     conn.close()
     resources = [{"id": r[0], "name": r[1], "capacity": r[2]} for r in rows]
-    return jsonify(resources)
+    return with_etag(jsonify(resources), etag)
+
+@app.route("/api/resources/<int:resource_id>/availability", methods=["GET"])
+def resource_availability(resource_id):
+    """Free time of one resource per day.
+
+    Query: from, to (YYYY-MM-DD, inclusive; default the next 7 days) and
+    open/close (HH:MM; default AVAILABILITY_OPEN/CLOSE). Answered from the
+    per-day occupancy bitmaps of the conflict index, so free ranges are
+    aligned to its 5-minute slots. Weekends and past days are not bookable.
+    """
+    window, error = parse_day_window(request.args)
+    if error:
+        return jsonify({"message": error}), 400
+    start, end, open_minute, close_minute = window
+
+    conn = db_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM resources WHERE id = ?", (resource_id,))
+    if not cur.fetchone():
+        conn.close()
+        return jsonify({"message": "Resource not found"}), 404
+    occupied = conflict_index.occupancy(cur, [resource_id], start.isoformat(), end.isoformat())
+    conn.close()
+
+    today = datetime.now().date()
+    days = []
+    day = start
+    while day <= end:
+        date = day.isoformat()
+        bookable = day.weekday() < 5 and day >= today
+        free = []
+        if bookable:
+            free = [
+                {"start": f"{date}T{minute_to_time(a)}:00", "end": f"{date}T{minute_to_time(b)}:00"}
+                for a, b in conflicts.free_runs(occupied.get((resource_id, date), 0), open_minute, close_minute)
+            ]
+        days.append({"date": date, "bookable": bookable, "free": free})
+        day += timedelta(days=1)
+
+    return jsonify({"resourceId": resource_id, "slotMinutes": conflicts.SLOT_MINUTES, "days": days})
+
+@app.route("/api/resources/free-slots", methods=["GET"])
+def find_free_slots():
+    """Earliest slots across all resources that fit a request.
+
+    Query: duration (minutes, required), capacity (minimum seats), type
+    (seminar/auditorium/lab), from/to/open/close as for availability, and
+    limit (default 10). Returns up to `limit` (resource, start) pairs ordered
+    by start time, one per free gap. Weekends, past days and times already
+    gone today are skipped, matching what POST /api/bookings accepts.
+    """
+    duration = request.args.get("duration", type=int)
+    capacity = request.args.get("capacity", default=0, type=int)
+    resource_type = request.args.get("type")
+    limit = max(1, min(request.args.get("limit", default=10, type=int), 100))
+    if not duration or duration <= 0:
+        return jsonify({"message": "duration (minutes) is required"}), 400
+    window, error = parse_day_window(request.args)
+    if error:
+        return jsonify({"message": error}), 400
+    start, end, open_minute, close_minute = window
+
+    conn = db_conn()
+    cur = conn.cursor()
+    query = "SELECT id, name, type, capacity FROM resources WHERE capacity >= ?"
+    params = [capacity]
+    if resource_type:
+        query += " AND type = ?"
+        params.append(resource_type)
+    cur.execute(query + " ORDER BY id", params)
+    resources = cur.fetchall()
+    # Two queries cover every candidate resource over the whole window
+    occupied = conflict_index.occupancy(cur, [r[0] for r in resources], start.isoformat(), end.isoformat())
+    conn.close()
+
+    now = datetime.now()
+    slots = []
+    day = max(start, now.date())
+    while day <= end and len(slots) < limit:
+        if day.weekday() < 5:  # no bookings on Saturdays/Sundays
+            date = day.isoformat()
+            day_open = open_minute
+            if day == now.date():
+                day_open = max(open_minute, now.hour * 60 + now.minute)
+            found = []
+            for resource_id, name, rtype, seats in resources:
+                for a, b in conflicts.free_runs(occupied.get((resource_id, date), 0), day_open, close_minute):
+                    if b - a >= duration:
+                        found.append((a, resource_id, name, rtype, seats))
+            found.sort()
+            for a, resource_id, name, rtype, seats in found[:limit - len(slots)]:
+                slots.append({
+                    "resourceId": resource_id,
+                    "resource": name,
+                    "type": rtype,
+                    "capacity": seats,
+                    "start": f"{date}T{minute_to_time(a)}:00",
+                    "end": f"{date}T{minute_to_time(a + duration)}:00"
+                })
+        day += timedelta(days=1)
+
+    return jsonify(slots)
 
 # Departments
 @app.route("/api/departments", methods=["GET"])
 def list_departments():
+    etag, not_modified = conditional_get(("departments",))
+    if not_modified:
+        return not_modified
+
     conn = db_conn()
     cur = conn.cursor()
     cur.execute("SELECT id, name FROM departments ORDER BY id")
     rows = cur.fetchall()
     conn.close()
     departments = [{"id": r[0], "name": r[1]} for r in rows]
-    return jsonify(departments)
+    return with_etag(jsonify(departments), etag)
+
+# Analytics
+@app.route("/api/analytics/utilization", methods=["GET"])
+def get_utilization():
+    """Utilization per resource and department, plus peak hours (HOD only).
+
+    Query: from/to months (YYYY-MM, inclusive; default the last 12 months),
+    optional resource_id and department_id. Served from booking_stats,
+    which triggers keep current, so the cost does not grow with history.
+    """
+    user = require_hod()
+    if isinstance(user, tuple):  # Error response
+        return user
+
+    this_month = datetime.now().date().replace(day=1)
+    default_from = (this_month - timedelta(days=335)).replace(day=1)
+    month_from = request.args.get("from") or default_from.strftime("%Y-%m")
+    month_to = request.args.get("to") or this_month.strftime("%Y-%m")
+    try:
+        first = datetime.strptime(month_from, "%Y-%m").date()
+        last = datetime.strptime(month_to, "%Y-%m").date()
+    except ValueError:
+        return jsonify({"message": "from/to must be YYYY-MM"}), 400
+    if last < first:
+        return jsonify({"message": "to must not be before from"}), 400
+    resource_id = request.args.get("resource_id", type=int)
+    department_id = request.args.get("department_id", type=int)
+
+    etag, not_modified = conditional_get(("bookings", "resources", "departments"), private=True)
+    if not_modified:
+        return not_modified
+
+    conn = db_conn()
+    cur = conn.cursor()
+    per_resource, per_department, peaks = analytics.utilization(cur, month_from, month_to, resource_id, department_id)
+    cur.execute("SELECT id, name FROM resources")
+    resource_names = dict(cur.fetchall())
+    cur.execute("SELECT id, name FROM departments")
+    department_names = dict(cur.fetchall())
+    conn.close()
+
+    # Bookable hours per resource over the period: weekdays x daily window
+    next_month = (last.replace(day=28) + timedelta(days=4)).replace(day=1)
+    weekdays = sum(1 for d in range((next_month - first).days) if (first + timedelta(days=d)).weekday() < 5)
+    open_hours = weekdays * (conflicts.to_minutes(AVAILABILITY_CLOSE) - conflicts.to_minutes(AVAILABILITY_OPEN)) / 60
+
+    def summary(counts):
+        booked_minutes = sum(counts.get(s, (0, 0))[1] for s in analytics.BOOKED_STATUSES)
+        decided_ok = sum(counts.get(s, (0, 0))[0] for s in analytics.BOOKED_STATUSES)
+        return {
+            "bookings": sum(b for b, _ in counts.values()),
+            "bookedHours": round(booked_minutes / 60, 2),
+            "byStatus": {s: counts.get(s, (0, 0))[0] for s in analytics.STATUSES},
+            "approvalRate": analytics.rate(decided_ok, counts.get("rejected", (0, 0))[0]),
+        }
+
+    resources = []
+    for rid, counts in sorted(per_resource.items()):
+        item = {"resourceId": rid, "resource": resource_names.get(rid, "Unknown"), **summary(counts)}
+        item["utilization"] = round(item["bookedHours"] / open_hours, 4) if open_hours else None
+        resources.append(item)
+    departments = [
+        {"departmentId": did, "department": department_names.get(did, "Unknown"), **summary(counts)}
+        for did, counts in sorted(per_department.items())
+    ]
+    peak_hours = [
+        {"weekday": (weekday - 1) % 7, "hour": hour, "bookings": bookings, "bookedHours": round(minutes / 60, 2)}
+        for (weekday, hour), (bookings, minutes) in sorted(peaks.items(), key=lambda p: -p[1][1])
+        if minutes > 0
+    ]
+
+    return with_etag(json_response({
+        "from": month_from,
+        "to": month_to,
+        "openHours": open_hours,
+        "resources": resources,
+        "departments": departments,
+        "peakHours": peak_hours,  # weekday 0 = Monday, busiest first
+    }), etag, private=True)
 
 # Calendar Events
+# Statuses shown on the shared calendar
+CALENDAR_STATUSES = ("pending", "approved", "conducted")
+
+def calendar_event(row):
+    """Format a (id, title, resource, date, start_time, end_time, purpose,
+    status, requester_name, requester_id) row as a calendar event"""
+    booking_id, title, resource_name, date, start_time, end_time, purpose, status, requester_name, requester_id = row
+    # Format datetime strings
+    start_datetime = f"{date}T{start_time}:00"
+    end_datetime = f"{date}T{end_time}:00"
+
+    return {
+        "id": booking_id,
+        "title": title,
+        "resource": resource_name,
+        "start": start_datetime,
+        "end": end_datetime,
+        "purpose": purpose,
+        "status": status,  # past bookings are set to conducted/expired by booking_jobs
+        "type": "booking",
+        "requester": requester_name or "Unknown",
+        "requesterId": requester_id or 0
+    }
+
 @app.route("/api/calendar/events", methods=["GET"])
 def get_calendar_events():
-    """Get calendar events - matches frontend format"""
+    """Get calendar events - matches frontend format
+
+    Optional query parameters:
+      start, end  - date window (YYYY-MM-DD), start inclusive, end exclusive
+      limit       - page size (max CALENDAR_MAX_LIMIT)
+      cursor      - value of the X-Next-Cursor header from the previous page
+    """
     resource_id = request.args.get("resource_id", type=int)
-    
+    window_start = (request.args.get("start") or "")[:10]
+    window_end = (request.args.get("end") or "")[:10]
+    limit = request.args.get("limit", type=int)
+    cursor = request.args.get("cursor")
+
+    if window_start and not date_ok(window_start):
+        return jsonify({"message": "start must be YYYY-MM-DD"}), 400
+    if window_end and not date_ok(window_end):
+        return jsonify({"message": "end must be YYYY-MM-DD"}), 400
+    if limit is not None:
+        limit = max(1, min(limit, CALENDAR_MAX_LIMIT))
+
+    etag, not_modified = conditional_get(("bookings", "resources"))
+    if not_modified:
+        return not_modified
+
+    # Show all events (pending, conducted, approved), optionally for one resource
+    where = [f"e.status IN ({','.join('?' * len(CALENDAR_STATUSES))})"]
+    params = list(CALENDAR_STATUSES)
+    if resource_id:
+        where.append("e.resource_id = ?")
+        params.append(resource_id)
+    if window_start:
+        where.append("e.day >= ?")
+        params.append(booking_times.day_number(window_start))
+    if window_end:
+        where.append("e.day < ?")
+        params.append(booking_times.day_number(window_end))
+    if cursor:
+        after = decode_cursor(cursor, 3)
+        if after is None or not all(isinstance(v, int) for v in after):
+            return jsonify({"message": "Invalid cursor"}), 400
+        where.append("(e.day, e.start_min, e.id) > (?, ?, ?)")
+        params.extend(after)
+
+    query = f"""
+        SELECT e.id, e.title, e.resource, e.date, e.start_time, e.end_time,
+               e.purpose, e.status, e.requester, e.user_id, e.day, e.start_min
+        FROM calendar_events e
+        WHERE {" AND ".join(where)}
+        ORDER BY e.day, e.start_min, e.id
+    """
+    if limit is not None:
+        # Fetch one extra row to know whether another page follows
+        query += " LIMIT ?"
+        params.append(limit + 1)
+
     conn = db_conn()
     cur = conn.cursor()
-    
-    # Get today's date for status determination
-    today = datetime.now().date()
-    
-    if resource_id:
-        # Get events for specific resource - show all events (pending, conducted, approved)
-        cur.execute("""
-            SELECT b.id, b.title, r.name, b.date, b.start_time, b.end_time, 
-                   b.purpose, b.status, u.name, b.user_id
-            FROM bookings b
-            JOIN resources r ON r.id = b.resource_id
-            LEFT JOIN users u ON u.id = b.user_id
-            WHERE b.resource_id = ? AND b.status IN ('pending', 'conducted', 'approved')
-            ORDER BY b.date, b.start_time
-        """, (resource_id,))
-    else:
-        # Get all events - show all events (pending, conducted, approved)
-        cur.execute("""
-            SELECT b.id, b.title, r.name, b.date, b.start_time, b.end_time, 
-                   b.purpose, b.status, u.name, b.user_id
-            FROM bookings b
-            JOIN resources r ON r.id = b.resource_id
-            LEFT JOIN users u ON u.id = b.user_id
-            WHERE b.status IN ('pending', 'conducted', 'approved')
-            ORDER BY b.date, b.start_time
-        """)
-    
+    cur.execute(query, params)
+    if limit is None:
+        # Unpaginated: stream straight off the cursor
+        events = (calendar_event(row[:10]) for row in json_stream.iter_rows(cur))
+        return with_etag(stream_json_array(events, conn), etag)
+
     rows = cur.fetchall()
     conn.close()
-    
-    events = []
-    for row in rows:
-        booking_id, title, resource_name, date, start_time, end_time, purpose, status, requester_name, requester_id = row
-        # Format datetime strings
-        start_datetime = f"{date}T{start_time}:00"
-        end_datetime = f"{date}T{end_time}:00"
-        
-        # Determine display status based on date
-        booking_date = datetime.strptime(date, "%Y-%m-%d").date()
-        if booking_date < today:
-            display_status = 'conducted'
-        else:
-            display_status = 'pending'
-        
-        events.append({
-            "id": booking_id,
-            "title": title,
-            "resource": resource_name,
-            "start": start_datetime,
-            "end": end_datetime,
-            "purpose": purpose,
-            "status": display_status,  # Use computed status based on date
-            "type": "booking",
-            "requester": requester_name or "Unknown",
-            "requesterId": requester_id or 0
-        })
-    
-    return jsonify(events)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[10], last[11], last[0])
+
+    events = [calendar_event(row[:10]) for row in rows]
+    response = with_etag(json_response(events), etag)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+# Live updates
+@app.route("/api/stream", methods=["GET"])
+def stream_events():
+    """Server-sent events for booking changes.
+
+    Needs a token, passed as ?token= since EventSource cannot set headers.
+    Event names are the change kind (created, approved, rejected,
+    cancelled); data is the booking in calendar-event shape plus its raw
+    "bookingStatus" and the requester's "departmentId".
+
+    What is sent depends on who asks. An HOD gets the bookings of their
+    own department (department_id picks another). Everyone else gets
+    their own bookings, and other people's only as far as the calendar
+    shows them: once one leaves the calendar (rejected, cancelled) just
+    its "id" and "bookingStatus" are sent, so it can be taken off.
+    resource_id narrows any stream to one resource, mine=1 to the
+    caller's own bookings.
+    """
+    user = get_user_from_token(request.args.get("token"))
+    if not user:
+        return jsonify({"message": "Unauthorized"}), 401
+    hod = user["role"] == "hod"
+    resource_id = request.args.get("resource_id", type=int)
+    department_id = (request.args.get("department_id", type=int) or user["department_id"]) if hod else None
+    user_id = user["id"] if request.args.get("mine", "").lower() in ("1", "true", "yes") else None
+
+    last_id = request.headers.get("Last-Event-ID", type=int)
+    if last_id is None:
+        last_id = request.args.get("last_event_id", type=int)
+    if last_id is None:
+        # Fresh subscription: only changes from now on
+        conn = db_conn()
+        last_id = booking_events.latest_id(conn.cursor())
+        conn.close()
+
+    def generate(last_id):
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline:
+            conn = db_conn()
+            try:
+                cur = conn.cursor()
+                head = booking_events.latest_id(cur)
+                rows = []
+                if head > last_id:
+                    rows = booking_events.fetch_since(cur, last_id, head, resource_id, user_id,
+                                                      department_id, STREAM_BATCH)
+            finally:
+                conn.close()
+
+            for row in rows:
+                if hod or row[11] == user["id"] or row[9] in CALENDAR_STATUSES:
+                    event = calendar_event(row[2:12])
+                    event["bookingStatus"] = row[9]
+                    event["departmentId"] = row[12]
+                else:
+                    event = {"id": row[2], "bookingStatus": row[9]}
+                yield f"id: {row[0]}\nevent: {row[1]}\ndata: {json.dumps(event)}\n\n"
+            # Rows outside the filters are skipped too, not just the ones sent
+            last_id = rows[-1][0] if len(rows) == STREAM_BATCH else max(last_id, head)
+
+            if rows:
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= STREAM_HEARTBEAT_SECONDS:
+                # Keeps proxies from closing the connection and moves the
+                # client's Last-Event-ID past events it was not sent
+                yield f"id: {last_id}\n: keepalive\n\n"
+                last_sent = time.monotonic()
+            if len(rows) < STREAM_BATCH:
+                time.sleep(STREAM_POLL_SECONDS)
+        yield f"id: {last_id}\n\n"
+
+    return Response(
+        stream_with_context(generate(last_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # Bookings
-@app.route("/api/bookings", methods=["POST"])
-def create_booking():
-    """Create booking - matches frontend format"""
-    user = require_auth()
-    if isinstance(user, tuple):  # Error response
-        return user
-    
-    data = request.get_json(force=True)
+def parse_booking(data):
+    """Validate a booking request body.
+
+    Returns (booking, None) with the normalized fields, or (None, message).
+    """
+    if not isinstance(data, dict):
+        return None, "Booking must be a JSON object"
+
     title = (data.get("title") or "").strip()
     resource = (data.get("resource") or "").strip()
-    start = data.get("start", "").strip()  # ISO format: "2024-01-15T10:00:00"
-    end = data.get("end", "").strip()  # ISO format: "2024-01-15T12:00:00"
+    start = (data.get("start") or "").strip()  # ISO format: "2024-01-15T10:00:00"
+    end = (data.get("end") or "").strip()  # ISO format: "2024-01-15T12:00:00"
     purpose = (data.get("purpose") or "").strip()
-    requester = data.get("requester", "").strip()
-    requesterId = data.get("requesterId")
 
     # Parse ISO datetime strings
     try:
@@ -717,74 +1566,224 @@ def create_booking():
         start_time = start_dt.strftime("%H:%M")
         end_time = end_dt.strftime("%H:%M")
     except Exception as e:
-        return jsonify({"message": f"Invalid date/time format: {str(e)}"}), 400
+        return None, f"Invalid date/time format: {str(e)}"
 
     # Validate required fields
     if not all([title, resource, date, start_time, end_time, purpose]):
-        return jsonify({"message": "All fields are required"}), 400
+        return None, "All fields are required"
 
     if start_time >= end_time:
-        return jsonify({"message": "End time must be after start time"}), 400
+        return None, "End time must be after start time"
 
     # Check if date is in the past
     if datetime.strptime(date, "%Y-%m-%d") < datetime.now().replace(hour=0, minute=0, second=0, microsecond=0):
-        return jsonify({"message": "Cannot book resources for past dates"}), 400
+        return None, "Cannot book resources for past dates"
 
     # Check if date is Saturday (5) or Sunday (6)
-    booking_date = datetime.strptime(date, "%Y-%m-%d")
-    weekday = booking_date.weekday()  # Monday=0, Sunday=6
+    weekday = start_dt.weekday()  # Monday=0, Sunday=6
     if weekday == 5:  # Saturday
-        return jsonify({"message": "Bookings are not allowed on Saturdays"}), 400
+        return None, "Bookings are not allowed on Saturdays"
     if weekday == 6:  # Sunday
-        return jsonify({"message": "Bookings are not allowed on Sundays"}), 400
+        return None, "Bookings are not allowed on Sundays"
+
+    return {
+        "title": title,
+        "resource": resource,
+        "start": start,
+        "end": end,
+        "purpose": purpose,
+        "date": date,
+        "start_time": start_time,
+        "end_time": end_time,
+    }, None
 
-    conn = db_conn()
-    cur = conn.cursor()
+@app.route("/api/bookings", methods=["POST"])
+def create_booking():
+    """Create booking - matches frontend format"""
+    user = require_auth()
+    if isinstance(user, tuple):  # Error response
+        return user
+    
+    data = request.get_json(force=True)
+    booking, error = parse_booking(data)
+    if error:
+        return jsonify({"message": error}), 400
+    title, resource, purpose = booking["title"], booking["resource"], booking["purpose"]
+    start, end = booking["start"], booking["end"]
+    date, start_time, end_time = booking["date"], booking["start_time"], booking["end_time"]
+    requester = data.get("requester", "").strip()
+    requesterId = data.get("requesterId")
 
     try:
-        # Get resource_id from resource name
-        cur.execute("SELECT id FROM resources WHERE name = ?", (resource,))
-        resource_result = cur.fetchone()
-        if not resource_result:
-            return jsonify({"message": "Invalid resource"}), 400
-        resource_id = resource_result[0]
+        result, status = writes.submit("insert_booking", user_id=user["id"], resource=resource, title=title,
+                                       date=date, start_time=start_time, end_time=end_time, purpose=purpose)
+    except write_queue.WriteUnknown as e:
+        return write_outcome_unknown(e)
+    except write_queue.WriteFailed as e:
+        logging.error(f"Error creating booking: {str(e)}")
+        return jsonify({"message": str(e)}), 500
+    if status != 201:
+        return jsonify(result), status
 
-        # Use authenticated user_id
-        user_id = user["id"]
+    # Return response matching frontend format
+    return jsonify({
+        "id": result["id"],
+        "title": title,
+        "resource": resource,
+        "start": start,
+        "end": end,
+        "purpose": purpose,
+        "status": "pending",
+        "requester": requester or user.get("name", "Unknown"),
+        "requesterId": requesterId or user["id"]
+    }), 201
+
+def read_bulk_items():
+    """Items of a bulk request: a JSON array, {"bookings": [...]}, or NDJSON lines"""
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        items = []
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(None)  # reported as invalid for this line
+        return items
+    data = request.get_json(force=True, silent=True)
+    if isinstance(data, dict):
+        data = data.get("bookings")
+    return data if isinstance(data, list) else None
+
+@app.route("/api/bookings/bulk", methods=["POST"])
+def bulk_create_bookings():
+    """Import many bookings in one transaction.
+
+    Each item has the same shape as POST /api/bookings. Items are checked
+    against existing bookings and against each other; the valid ones are
+    inserted together and a per-item result is returned. With ?atomic=1
+    nothing is inserted unless every item is accepted.
+    """
+    user = require_auth()
+    if isinstance(user, tuple):  # Error response
+        return user
 
-        # Check for overlaps
-        if has_overlap(cur, resource_id, date, start_time, end_time):
-            return jsonify({"message": "Slot already booked or has a conflict"}), 409
+    items = read_bulk_items()
+    if items is None:
+        return jsonify({"message": "Expected a JSON array of bookings or NDJSON"}), 400
+    if len(items) > BULK_MAX_ITEMS:
+        return jsonify({"message": f"At most {BULK_MAX_ITEMS} bookings per request"}), 413
+    atomic = request.args.get("atomic", "").lower() in ("1", "true", "yes")
+
+    results = [None] * len(items)
+    parsed = []
+    for index, item in enumerate(items):
+        booking, error = parse_booking(item)
+        if error:
+            results[index] = {"index": index, "status": "invalid", "message": error}
+        else:
+            parsed.append((index, booking))
 
-        # Insert the booking
-        cur.execute("""
-            INSERT INTO bookings (user_id, resource_id, title, date, start_time, end_time, purpose, status)
-            VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
-        """, (user_id, resource_id, title, date, start_time, end_time, purpose))
-        
-        booking_id = cur.lastrowid
-        conn.commit()
+    # Conflict checks and inserts run inside the write transaction
+    try:
+        item_results, created = writes.submit("insert_bookings", user_id=user["id"], items=parsed,
+                                              total=len(items), atomic=atomic)
+    except write_queue.WriteUnknown as e:
+        return write_outcome_unknown(e)
+    except write_queue.WriteFailed as e:
+        logging.error(f"Error importing bookings: {str(e)}")
+        return jsonify({"message": str(e)}), 500
+    for result in item_results:
+        results[result["index"]] = result
+
+    failed = sum(result["status"] not in ("created", "skipped") for result in results)
+    body = {"created": created, "failed": failed, "results": results}
+    if atomic and failed:
+        return jsonify(body), 409
+    return jsonify(body)
+
+@app.route("/api/bookings/search", methods=["GET"])
+def search_bookings():
+    """Full-text search over booking titles and purposes (HOD only).
+
+    Query parameters:
+      q           - words and "quoted phrases", all of which must match;
+                    word* matches a prefix
+      resource_id - only this resource
+      from, to    - date range (YYYY-MM-DD, both inclusive)
+      status      - comma-separated stored statuses
+      limit       - page size (default SEARCH_DEFAULT_LIMIT, max SEARCH_MAX_LIMIT)
+      cursor      - value of the X-Next-Cursor header from the previous page
+
+    Results are calendar events, best match first, with the stored
+    "bookingStatus" and the bm25 "score" (higher is better). Only the
+    newest SEARCH_RANK_WINDOW matches are ranked; when older bookings
+    match too, every page carries "X-Search-Truncated: 1". Later pages
+    leave out bookings added since the first; other changes in between
+    can make a result skip or repeat across pages (see booking_search.py).
+    """
+    user = require_hod()
+    if isinstance(user, tuple):  # Error response
+        return user
 
-        # Return response matching frontend format
-        return jsonify({
-            "id": booking_id,
-            "title": title,
-            "resource": resource,
-            "start": start,
-            "end": end,
-            "purpose": purpose,
-            "status": "pending",
-            "requester": requester or user.get("name", "Unknown"),
-            "requesterId": requesterId or user_id
-        }), 201
+    query = booking_search.match_query(request.args.get("q"))
+    if query is None:
+        return jsonify({"message": "q must contain at least one word"}), 400
+    resource_id = request.args.get("resource_id", type=int)
+    date_from = (request.args.get("from") or "")[:10]
+    date_to = (request.args.get("to") or "")[:10]
+    if date_from and not date_ok(date_from):
+        return jsonify({"message": "from must be YYYY-MM-DD"}), 400
+    if date_to and not date_ok(date_to):
+        return jsonify({"message": "to must be YYYY-MM-DD"}), 400
+    statuses = [s.strip().lower() for s in (request.args.get("status") or "").split(",") if s.strip()]
+    unknown = [s for s in statuses if s not in analytics.STATUSES]
+    if unknown:
+        return jsonify({"message": f"Unknown status: {', '.join(unknown)}"}), 400
+    limit = request.args.get("limit", default=SEARCH_DEFAULT_LIMIT, type=int)
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    after = None
+    cursor = request.args.get("cursor")
+    if cursor:
+        after = decode_cursor(cursor, 3)
+        if after is None or not all(isinstance(v, int) and v >= 0 for v in after):
+            return jsonify({"message": "Invalid cursor"}), 400
+
+    etag, not_modified = conditional_get(("bookings", "resources"), private=True)
+    if not_modified:
+        return not_modified
 
-    except Exception as e:
-        conn.rollback()
-        logging.error(f"Error creating booking: {str(e)}")
-        return jsonify({"message": str(e)}), 500
+    conn = db_conn()
+    cur = conn.cursor()
+    try:
+        rows, window, truncated = booking_search.search(
+            cur, query, resource_id,
+            booking_times.day_number(date_from) if date_from else None,
+            booking_times.day_number(date_to) if date_to else None,
+            statuses, after, limit + 1,  # one extra row to know whether another page follows
+        )
     finally:
         conn.close()
 
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor((after[0] if after else 0) + limit, *window)
+
+    results = []
+    for row in rows:
+        event = calendar_event(row[:10])
+        event["bookingStatus"] = row[7]
+        event["score"] = round(-row[10], 4)
+        results.append(event)
+    response = with_etag(json_response(results), etag, private=True)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if truncated:
+        response.headers["X-Search-Truncated"] = "1"
+    return response
+
 @app.route("/api/bookings/my", methods=["GET"])
 def my_bookings():
     """Get current user's bookings - matches frontend format"""
@@ -792,27 +1791,26 @@ def my_bookings():
     if isinstance(user, tuple):  # Error response
         return user
 
+    etag, not_modified = conditional_get(("bookings", "resources"), user["id"], private=True)
+    if not_modified:
+        return not_modified
+
     conn = db_conn()
     cur = conn.cursor()
     cur.execute("""
-        SELECT b.id, b.title, r.name, b.date, b.start_time, b.end_time, 
-               b.purpose, b.status, u.name, b.user_id
-        FROM bookings b
-        JOIN resources r ON r.id = b.resource_id
-        LEFT JOIN users u ON u.id = b.user_id
-        WHERE b.user_id = ?
-        ORDER BY b.date DESC, b.start_time DESC
+        SELECT id, title, resource, date, start_time, end_time,
+               purpose, status, requester, user_id
+        FROM calendar_events
+        WHERE user_id = ?
+        ORDER BY day DESC, start_min DESC
     """, (user["id"],))
-    rows = cur.fetchall()
-    conn.close()
 
-    bookings = []
-    for row in rows:
+    def booking(row):
         booking_id, title, resource_name, date, start_time, end_time, purpose, status, requester_name, requester_id = row
         start_datetime = f"{date}T{start_time}:00"
         end_datetime = f"{date}T{end_time}:00"
-        
-        bookings.append({
+
+        return {
             "id": booking_id,
             "title": title,
             "resource": resource_name,
@@ -822,9 +1820,10 @@ def my_bookings():
             "status": status,
             "requester": requester_name or "Unknown",
             "requesterId": requester_id or 0
-        })
+        }
 
-    return jsonify(bookings)
+    bookings = (booking(row) for row in json_stream.iter_rows(cur))
+    return with_etag(stream_json_array(bookings, conn), etag, private=True)
 
 @app.route("/api/bookings/pending", methods=["GET"])
 def pending_bookings():
@@ -858,17 +1857,13 @@ def pending_bookings():
             WHERE b.status = 'pending'
             ORDER BY b.created_at DESC
         """)
-    
-    rows = cur.fetchall()
-    conn.close()
 
-    pending_requests = []
-    for row in rows:
+    def pending_request(row):
         booking_id, title, resource_name, date, start_time, end_time, purpose, status, requester_name, requester_id, created_at = row
         start_datetime = f"{date}T{start_time}:00"
         end_datetime = f"{date}T{end_time}:00"
-        
-        pending_requests.append({
+
+        return {
             "id": booking_id,
             "title": title,
             "resource": resource_name,
@@ -879,9 +1874,10 @@ def pending_bookings():
             "requesterName": requester_name or "Unknown",
             "requesterId": requester_id or 0,
             "createdAt": created_at or datetime.now().isoformat()
-        })
+        }
 
-    return jsonify(pending_requests)
+    pending_requests = (pending_request(row) for row in json_stream.iter_rows(cur))
+    return stream_json_array(pending_requests, conn)
 
 @app.route("/api/bookings/<int:booking_id>", methods=["PATCH"])
 def update_booking(booking_id):
@@ -892,91 +1888,86 @@ def update_booking(booking_id):
     conn = db_conn()
     cur = conn.cursor()
 
-    # Get booking details and user_id
-    cur.execute("""
-        SELECT resource_id, date, start_time, end_time, status, user_id 
-        FROM bookings 
-        WHERE id = ?
-    """, (booking_id,))
+    # Get booking owner
+    cur.execute("SELECT user_id FROM bookings WHERE id = ?", (booking_id,))
     row = cur.fetchone()
+    conn.close()
 
     if not row:
-        conn.close()
         return jsonify({"message": "Booking not found"}), 404
 
-    resource_id, date, start_time, end_time, current_status, booking_user_id = row
+    booking_user_id = row[0]
 
     # Handle cancel action - user can cancel their own bookings
     if action == "cancel":
         # Check if user is authorized (either HOD or booking owner)
         user_data = get_user_from_token()
         if not user_data:
-            conn.close()
             return jsonify({"message": "Unauthorized"}), 401
         
-        # Get user details from database
-        cur.execute("SELECT id, role FROM users WHERE id = ?", (user_data["id"],))
-        user_row = cur.fetchone()
-        if not user_row:
-            conn.close()
-            return jsonify({"message": "User not found"}), 404
-        
-        user_id, user_role = user_row
+        user_id, user_role = user_data["id"], user_data["role"]
         
         # Allow cancellation if user is the owner or HOD
         if user_id != booking_user_id and user_role != "hod":
-            conn.close()
             return jsonify({"message": "Unauthorized"}), 403
+    else:
+        # For approve/reject, require HOD
+        user = require_hod()
+        if isinstance(user, tuple):  # Error response
+            return user
 
-        if current_status == "cancelled":
-            conn.close()
-            return jsonify({"message": "Booking already cancelled"}), 400
+        if action not in ["approve", "reject"]:
+            return jsonify({"message": "Action must be 'approve', 'reject', or 'cancel'"}), 400
 
-        cur.execute("UPDATE bookings SET status = 'cancelled' WHERE id = ?", (booking_id,))
-        new_status = "cancelled"
-        conn.commit()
-        conn.close()
-        return jsonify({
-            "id": booking_id,
-            "status": new_status,
-            "action": action
-        })
+    # Status and conflict checks run inside the write transaction
+    try:
+        result, status = writes.submit("set_booking_status", booking_id=booking_id, action=action)
+    except write_queue.WriteUnknown as e:
+        return write_outcome_unknown(e)
+    except write_queue.WriteFailed as e:
+        logging.error(f"Error updating booking: {str(e)}")
+        return jsonify({"message": str(e)}), 500
+
+    # Return response matching frontend format
+    return jsonify(result), status
+
+@app.route("/api/bookings/batch", methods=["PATCH"])
+def batch_update_bookings():
+    """Approve or reject many pending bookings at once (HOD only).
 
-    # For approve/reject, require HOD
+    Body: {"ids": [...], "action": "approve" | "reject"}.
+    The HOD check runs once, approvals are conflict-checked in one sweep
+    per (resource, date) with the same rule as single approvals, and all
+    updates are committed in one transaction; each id gets its own result.
+    """
     user = require_hod()
     if isinstance(user, tuple):  # Error response
-        conn.close()
         return user
 
-    if action not in ["approve", "reject"]:
-        conn.close()
-        return jsonify({"message": "Action must be 'approve', 'reject', or 'cancel'"}), 400
+    data = request.get_json(force=True, silent=True) or {}
+    action = (data.get("action") or "").strip().lower()
+    ids = data.get("ids")
 
-    if current_status in ("approved", "rejected", "cancelled"):
-        conn.close()
-        return jsonify({"message": f"Booking already {current_status}"}), 400
-
-    if action == "approve":
-        # Check for conflicts before approving
-        if has_overlap(cur, resource_id, date, start_time, end_time, ignore_booking_id=booking_id):
-            conn.close()
-            return jsonify({"message": "Conflict detected; cannot approve"}), 409
-
-        cur.execute("UPDATE bookings SET status = 'approved' WHERE id = ?", (booking_id,))
-        new_status = "approved"
-    else:  # reject
-        reason = data.get("reason", "")
-        cur.execute("UPDATE bookings SET status = 'rejected' WHERE id = ?", (booking_id,))
-        new_status = "rejected"
+    if action not in ["approve", "reject"]:
+        return jsonify({"message": "Action must be 'approve' or 'reject'"}), 400
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) for i in ids):
+        return jsonify({"message": "ids must be a non-empty list of booking ids"}), 400
+    if len(ids) > BATCH_MAX_IDS:
+        return jsonify({"message": f"At most {BATCH_MAX_IDS} bookings per request"}), 413
+    ids = list(dict.fromkeys(ids))  # drop duplicates, keep order
 
-    conn.commit()
-    conn.close()
+    try:
+        results, updated = writes.submit("set_booking_statuses", ids=ids, action=action)
+    except write_queue.WriteUnknown as e:
+        return write_outcome_unknown(e)
+    except write_queue.WriteFailed as e:
+        logging.error(f"Error updating bookings: {str(e)}")
+        return jsonify({"message": str(e)}), 500
 
-    # Return response matching frontend format
     return jsonify({
-        "id": booking_id,
-        "status": new_status,
-        "action": action
+        "updated": updated,
+        "failed": len(ids) - updated,
+        "results": results
     })
 
 # ---------------- Initialize Database on App Start ----------------
@@ -986,6 +1977,8 @@ try:
 except Exception as e:
     logging.error(f"Failed to initialize database: {str(e)}")
     # Don't raise - let the app start and handle errors in routes
+else:
+    jobs.start()
 
 # ---------------- Main ----------------
 if __name__ == "__main__":
@@ -0,0 +1,15 @@
+"""
+Backend benchmark suite.
+
+Run from the backend directory:
+
+    python -m bench generate --db /tmp/bench.db --bookings 1000000
+    python -m bench run --db /tmp/bench.db --output results.json
+    python -m bench http --url http://localhost:8000 --token <jwt> --output http.json
+    python -m bench compare before.json after.json
+
+`generate` builds a synthetic campus, `run` drives every route in app.py
+through the Flask test client (latency, throughput and SQL statements per
+request), `http` replays the read routes against a running server with
+concurrent clients, and `compare` diffs two result files.
+"""
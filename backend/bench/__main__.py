@@ -0,0 +1,87 @@
+import argparse
+import json
+import sys
+
+from bench import contention, runner, synth
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Backend benchmark suite")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="build a synthetic campus database")
+    gen.add_argument("--db", required=True)
+    gen.add_argument("--departments", type=int, default=10)
+    gen.add_argument("--users", type=int, default=5000)
+    gen.add_argument("--resources", type=int, default=200)
+    gen.add_argument("--bookings", type=int, default=100000)
+    gen.add_argument("--past-days", type=int, default=365)
+    gen.add_argument("--future-days", type=int, default=90)
+    gen.add_argument("--seed", type=int, default=1)
+
+    run = sub.add_parser("run", help="drive every route through the Flask test client")
+    run.add_argument("--db", required=True)
+    run.add_argument("--iterations", type=int, default=200)
+    run.add_argument("--only", action="append", help="substring of scenario names to run (repeatable)")
+    run.add_argument("--seed", type=int, default=1)
+    run.add_argument("--output")
+
+    http = sub.add_parser("http", help="concurrent load against a running server")
+    http.add_argument("--url", default="http://localhost:8000")
+    http.add_argument("--token", help="JWT for authenticated routes")
+    http.add_argument("--concurrency", type=int, default=16)
+    http.add_argument("--duration", type=float, default=10.0)
+    http.add_argument("--path", action="append", dest="paths")
+    http.add_argument("--output")
+
+    cont = sub.add_parser("contention", help="many clients booking the same slots at once")
+    cont.add_argument("--db", required=True)
+    cont.add_argument("--mode", choices=("queue", "direct", "both"), default="both")
+    cont.add_argument("--workers", type=int, default=4, help="worker processes")
+    cont.add_argument("--clients", type=int, default=200, help="client threads, split across workers")
+    cont.add_argument("--attempts", type=int, default=20, help="bookings tried per client")
+    cont.add_argument("--slots", type=int, default=4, help="hot slots competed for")
+    cont.add_argument("--seed", type=int, default=1)
+    cont.add_argument("--output")
+
+    cmp_ = sub.add_parser("compare", help="diff two result files")
+    cmp_.add_argument("before")
+    cmp_.add_argument("after")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        params = synth.generate(args.db, args.departments, args.users, args.resources, args.bookings,
+                                args.past_days, args.future_days, args.seed)
+        print(json.dumps(params))
+    elif args.command == "run":
+        endpoints = runner.run_inprocess(args.db, args.iterations, args.only, args.seed)
+        params = {"db": args.db, "iterations": args.iterations, "seed": args.seed}
+        runner.dump(runner.report("inprocess", endpoints, params), args.output)
+    elif args.command == "http":
+        endpoints = runner.run_http(args.url, args.token, args.concurrency, args.duration, args.paths)
+        params = {"url": args.url, "concurrency": args.concurrency, "duration": args.duration}
+        runner.dump(runner.report("http", endpoints, params), args.output)
+    elif args.command == "contention":
+        endpoints = {}
+        for mode in (("queue", "direct") if args.mode == "both" else (args.mode,)):
+            endpoints.update(contention.run_contention(args.db, mode, args.workers, args.clients,
+                                                       args.attempts, args.slots, args.seed))
+        params = {"db": args.db, "workers": args.workers, "clients": args.clients,
+                  "attempts": args.attempts, "slots": args.slots, "seed": args.seed}
+        runner.dump(runner.report("contention", endpoints, params), args.output)
+        if any(result["double_bookings"] for result in endpoints.values()):
+            return 1
+    elif args.command == "compare":
+        with open(args.before) as f:
+            before = json.load(f)
+        with open(args.after) as f:
+            after = json.load(f)
+        for name, metric, a, b, change in runner.compare(before, after):
+            print(f"{name:45s} {metric:16s} {a:>12} -> {b:>12}  ({change:+}%)" if change is not None
+                  else f"{name:45s} {metric:16s} {a:>12} -> {b:>12}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
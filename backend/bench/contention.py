@@ -0,0 +1,151 @@
+"""
+Booking admission under contention.
+
+Starts `workers` processes against one database, like gunicorn workers,
+each running `clients / workers` client threads. Every client repeatedly
+POSTs /api/bookings for a handful of hot slots on the same resource and
+day, with start times staggered so that nearly every pair overlaps. At
+the end the active bookings on those days are checked for overlaps: any
+overlap is a double booking, and the run reports it as a failure.
+
+Run it once with the write queue and once with WRITE_QUEUE=0 (mode
+"direct") to compare the two admission paths.
+"""
+import multiprocessing
+import os
+import random
+import threading
+import time
+from datetime import date, timedelta
+
+from bench.runner import summarize
+from bench.synth import load_app
+
+TITLE = "Contention bench"
+# Staggered starts (minutes past the hour): 60-minute bookings that mostly overlap
+OFFSETS = (0, 0, 0, 10, 20, 30, 40, 50)
+
+
+def _worker(db_path, mode, clients, attempts, slots, start_at, seed, results):
+    if mode == "direct":
+        os.environ["WRITE_QUEUE"] = "0"
+    app = load_app(db_path)
+    conn = app.db_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM users WHERE role='student' ORDER BY id LIMIT 200")
+    headers = [{"Authorization": "Bearer " + app.generate_token(r[0])} for r in cur.fetchall()]
+    conn.close()
+
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def client(n):
+        rng = random.Random(seed * 100003 + n)
+        test_client = app.app.test_client()
+        mine_latencies, mine_statuses = [], {}
+        time.sleep(max(0.0, start_at - time.time()))
+        for _ in range(attempts):
+            resource, day, hour = rng.choice(slots)
+            offset = rng.choice(OFFSETS)
+            body = {
+                "title": TITLE,
+                "resource": resource,
+                "start": f"{day}T{hour:02d}:{offset:02d}:00",
+                "end": f"{day}T{hour + 1:02d}:{offset:02d}:00",
+                "purpose": "Benchmark",
+            }
+            t0 = time.perf_counter()
+            response = test_client.post("/api/bookings", json=body, headers=rng.choice(headers))
+            mine_latencies.append(time.perf_counter() - t0)
+            mine_statuses[response.status_code] = mine_statuses.get(response.status_code, 0) + 1
+            response.close()
+        with lock:
+            latencies.extend(mine_latencies)
+            for code, count in mine_statuses.items():
+                statuses[code] = statuses.get(code, 0) + count
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.put((latencies, statuses, app.writes.stats()))
+
+
+def find_overlaps(cur, days):
+    """Pairs of active bookings that overlap on the benchmark days."""
+    marks = ",".join("?" * len(days))
+    cur.execute(f"""
+        SELECT resource_id, date, start_min, end_min, id FROM bookings
+        WHERE date IN ({marks}) AND status IN ('pending', 'approved')
+        ORDER BY resource_id, date, start_min
+    """, days)
+    overlaps = []
+    previous = None
+    for row in cur.fetchall():
+        if previous and previous[:2] == row[:2] and row[2] < previous[3]:
+            overlaps.append((previous[4], row[4]))
+        if previous is None or previous[:2] != row[:2] or row[3] > previous[3]:
+            previous = row
+    return overlaps
+
+
+def run_contention(db_path, mode="queue", workers=4, clients=200, attempts=20, slots=4, seed=1):
+    app = load_app(db_path)
+    conn = app.db_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM resources ORDER BY id LIMIT 1")
+    resource = cur.fetchone()[0]
+    # Far enough ahead to be clear of generated bookings
+    base = date.today() + timedelta(days=400)
+    base += timedelta(days=max(0, 7 - base.weekday()) if base.weekday() >= 5 else 0)  # a Monday..Friday
+    slot_list = [(resource, (base + timedelta(weeks=i // 8)).isoformat(), 9 + i % 8) for i in range(slots)]
+    days = sorted({day for _, day, _ in slot_list})
+    cur.execute("BEGIN IMMEDIATE")
+    cur.execute(f"DELETE FROM bookings WHERE title = ? AND date IN ({','.join('?' * len(days))})",
+                [TITLE, *days])
+    conn.commit()
+    conn.close()
+
+    ctx = multiprocessing.get_context("spawn")  # fresh imports, like separate gunicorn workers
+    results = ctx.Queue()
+    per_worker = max(1, clients // workers)
+    start_at = time.time() + 3.0  # after every worker has imported the app
+    processes = [
+        ctx.Process(target=_worker, args=(db_path, mode, per_worker, attempts, slot_list, start_at,
+                                          seed + i, results))
+        for i in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    latencies, statuses, queue_stats = [], {}, []
+    for _ in processes:
+        worker_latencies, worker_statuses, stats = results.get()
+        latencies.extend(worker_latencies)
+        for code, count in worker_statuses.items():
+            statuses[code] = statuses.get(code, 0) + count
+        queue_stats.append(stats)
+    for p in processes:
+        p.join()
+    elapsed = time.time() - start_at
+
+    conn = app.db_conn()
+    cur = conn.cursor()
+    overlaps = find_overlaps(cur, days)
+    cur.execute(f"""
+        SELECT COUNT(*) FROM bookings
+        WHERE title = ? AND date IN ({','.join('?' * len(days))}) AND status IN ('pending', 'approved')
+    """, [TITLE, *days])
+    admitted = cur.fetchone()[0]
+    conn.close()
+
+    result = summarize(latencies, statuses, elapsed)
+    result.update({
+        "clients": per_worker * workers,
+        "admitted": admitted,
+        "double_bookings": len(overlaps),
+        "write_batches": sum(s["batches"] for s in queue_stats),
+        "batched_writes": sum(s["batched_ops"] for s in queue_stats),
+        "lock_retries": sum(s["lock_retries"] for s in queue_stats),
+    })
+    return {f"POST /api/bookings contention ({mode})": result}
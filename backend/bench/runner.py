@@ -0,0 +1,277 @@
+"""
+Benchmark drivers.
+
+run_inprocess() calls each route through the Flask test client and counts
+the SQL statements it issues (trigger bodies excluded). run_http() replays
+the read routes against a live server from concurrent threads. Both
+return plain dicts that are written out as JSON.
+"""
+import itertools
+import json
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import date, datetime, timedelta
+
+from bench.synth import BENCH_PASSWORD, load_app
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def summarize(latencies, statuses, elapsed, sql_counts=None):
+    ordered = sorted(latencies)
+    result = {
+        "requests": len(ordered),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3) if ordered else None,
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3) if ordered else None,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else None,
+        "throughput_rps": round(len(ordered) / elapsed, 1) if elapsed else None,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    }
+    if sql_counts is not None:
+        result["sql_per_request"] = round(sum(sql_counts) / len(sql_counts), 2) if sql_counts else None
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+class SqlCounter:
+    """Counts top-level statements on every pooled connection."""
+
+    def __init__(self, pool):
+        self.count = 0
+        pool.add_connect_hook(self._install)
+
+    def _install(self, conn):
+        conn.set_trace_callback(self._trace)
+
+    def _trace(self, statement):
+        if not statement.startswith("--"):  # "-- TRIGGER ..." lines
+            self.count += 1
+
+
+def _future_weekday(rng, days_ahead=90):
+    while True:
+        d = date.today() + timedelta(days=rng.randint(1, days_ahead))
+        if d.weekday() < 5:
+            return d
+
+
+def build_scenarios(app, rng):
+    """name -> callable(client) returning a response, plus optional setup"""
+    conn = app.db_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM users WHERE role='student' ORDER BY id LIMIT 200")
+    students = [r[0] for r in cur.fetchall()]
+    cur.execute("SELECT id, department_id FROM users WHERE role='hod' ORDER BY id LIMIT 1")
+    hod_id, hod_dept = cur.fetchone()
+    cur.execute("SELECT username FROM users WHERE username LIKE '%@bench.test' ORDER BY id LIMIT 50")
+    logins = [r[0] for r in cur.fetchall()]
+    cur.execute("SELECT id, name FROM resources ORDER BY id")
+    resources = cur.fetchall()
+    cur.execute("""
+        SELECT id FROM bookings WHERE status='pending' AND date >= date('now')
+        ORDER BY id DESC LIMIT 5000
+    """)
+    pending = [r[0] for r in cur.fetchall()]
+    # Oldest first, so cancellations do not take the ones approved above
+    cur.execute("""
+        SELECT id, user_id FROM bookings WHERE status='pending' AND date >= date('now')
+        ORDER BY id LIMIT 5000
+    """)
+    cancellable = cur.fetchall()[::-1]
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM booking_events")
+    last_event = cur.fetchone()[0]
+    conn.close()
+
+    student_headers = [{"Authorization": "Bearer " + app.generate_token(uid)} for uid in students]
+    hod_token = app.generate_token(hod_id)
+    hod_headers = {"Authorization": "Bearer " + hod_token}
+    signups = itertools.count(time.time_ns())
+    window_start = date.today() - timedelta(days=date.today().weekday())
+    window = f"start={window_start}&end={window_start + timedelta(days=7)}"
+
+    def booking_body():
+        d = _future_weekday(rng)
+        hour = rng.randint(8, 17)
+        return {
+            "title": "Bench booking",
+            "resource": rng.choice(resources)[1],
+            "start": f"{d}T{hour:02d}:00:00",
+            "end": f"{d}T{hour + 1:02d}:00:00",
+            "purpose": "Benchmark",
+        }
+
+    def cancel(c):
+        booking_id, owner = cancellable.pop() if cancellable else (0, hod_id)
+        return c.patch(f"/api/bookings/{booking_id}", json={"action": "cancel"},
+                       headers={"Authorization": "Bearer " + app.generate_token(owner)})
+
+    return {
+        "GET /health": lambda c: c.get("/health"),
+        "GET /api/resources": lambda c: c.get("/api/resources"),
+        "GET /api/departments": lambda c: c.get("/api/departments"),
+        "GET /api/calendar/events?window": lambda c: c.get(f"/api/calendar/events?{window}"),
+        "GET /api/calendar/events?resource_id": lambda c: c.get(
+            f"/api/calendar/events?resource_id={rng.choice(resources)[0]}&{window}"),
+        "GET /api/calendar/events (full)": lambda c: c.get("/api/calendar/events?limit=1000"),
+        "GET /api/resources/<id>/availability": lambda c: c.get(
+            f"/api/resources/{rng.choice(resources)[0]}/availability"),
+        "GET /api/resources/free-slots": lambda c: c.get(
+            f"/api/resources/free-slots?duration={rng.choice((60, 120, 180))}&capacity={rng.choice((0, 50, 100))}"),
+        "GET /api/auth/me": lambda c: c.get("/api/auth/me", headers=rng.choice(student_headers)),
+        "GET /api/bookings/my": lambda c: c.get("/api/bookings/my", headers=rng.choice(student_headers)),
+        "GET /api/bookings/pending": lambda c: c.get(
+            f"/api/bookings/pending?department_id={hod_dept}", headers=hod_headers),
+        "GET /api/bookings/search": lambda c: c.get(
+            f"/api/bookings/search?q={rng.choice(('session', 'synth*', '%22benchmark+booking%22'))}",
+            headers=hod_headers),
+        "GET /api/bookings/search?status": lambda c: c.get(
+            f"/api/bookings/search?q=session&status={rng.choice(('pending', 'approved', 'rejected'))}",
+            headers=hod_headers),
+        "GET /api/analytics/utilization": lambda c: c.get("/api/analytics/utilization", headers=hod_headers),
+        "GET /api/analytics/utilization?department_id": lambda c: c.get(
+            f"/api/analytics/utilization?department_id={hod_dept}", headers=hod_headers),
+        # Catch-up on the last 200 booking changes (see STREAM_MAX_SECONDS in synth.load_app)
+        "GET /api/stream": lambda c: c.get(
+            f"/api/stream?token={hod_token}&last_event_id={max(0, last_event - 200)}"),
+        "POST /api/auth/login": lambda c: c.post(
+            "/api/auth/login", json={"email": rng.choice(logins), "password": BENCH_PASSWORD}),
+        "POST /api/auth/signup": lambda c: c.post("/api/auth/signup", json={
+            "email": f"signup-{next(signups)}@bench.test", "password": BENCH_PASSWORD,
+            "name": "Bench Signup", "role": "student", "department_id": hod_dept}),
+        "POST /api/bookings": lambda c: c.post(
+            "/api/bookings", json=booking_body(), headers=rng.choice(student_headers)),
+        "POST /api/bookings/bulk": lambda c: c.post(
+            "/api/bookings/bulk", json=[booking_body() for _ in range(50)], headers=rng.choice(student_headers)),
+        "PATCH /api/bookings/<id>": lambda c: c.patch(
+            f"/api/bookings/{pending.pop() if pending else 0}", json={"action": "approve"}, headers=hod_headers),
+        "PATCH /api/bookings/batch": lambda c: c.patch(
+            "/api/bookings/batch", headers=hod_headers,
+            json={"ids": [pending.pop() for _ in range(min(20, len(pending)))] or [0], "action": "reject"}),
+        "PATCH /api/bookings/<id> (cancel)": cancel,
+    }
+
+
+# bcrypt-bound scenarios get fewer iterations
+SLOW_SCENARIOS = {"POST /api/auth/login": 10, "POST /api/auth/signup": 10}
+
+
+def run_inprocess(db_path, iterations=200, only=None, seed=1):
+    app = load_app(db_path)
+    rng = random.Random(seed)
+    counter = SqlCounter(app.pool)
+    client = app.app.test_client()
+    scenarios = build_scenarios(app, rng)
+
+    results = {}
+    for name, call in scenarios.items():
+        if only and not any(o in name for o in only):
+            continue
+        n = min(iterations, SLOW_SCENARIOS.get(name, iterations))
+        call(client)  # warm-up: caches, statement cache, page cache
+        latencies, sql_counts, statuses = [], [], {}
+        started = time.perf_counter()
+        for _ in range(n):
+            before = counter.count
+            t0 = time.perf_counter()
+            response = call(client)
+            response.get_data()  # drain streamed bodies
+            response.close()  # as a WSGI server would; returns streamed connections to the pool
+            latencies.append(time.perf_counter() - t0)
+            sql_counts.append(counter.count - before)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        results[name] = summarize(latencies, statuses, time.perf_counter() - started, sql_counts)
+    return results
+
+
+def run_http(url, token=None, concurrency=16, duration=10.0, paths=None):
+    paths = paths or [
+        "/api/resources",
+        "/api/departments",
+        "/api/calendar/events?limit=500",
+        "/api/bookings/my",
+        "/api/auth/me",
+    ]
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    samples = {p: [] for p in paths}
+    statuses = {p: {} for p in paths}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(offset):
+        i = offset
+        while time.monotonic() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            req = urllib.request.Request(url.rstrip("/") + path, headers=headers)
+            t0 = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req, timeout=30) as resp:
+                    resp.read()
+                    code = resp.status
+            except urllib.error.HTTPError as e:
+                code = e.code
+            except Exception:
+                code = "error"
+            elapsed = time.perf_counter() - t0
+            with lock:
+                samples[path].append(elapsed)
+                statuses[path][code] = statuses[path].get(code, 0) + 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return {f"GET {p}": summarize(samples[p], statuses[p], elapsed) for p in paths}
+
+
+def report(mode, endpoints, params):
+    return {
+        "mode": mode,
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "params": params,
+        "endpoints": endpoints,
+    }
+
+
+def compare(before, after):
+    """Rows of (endpoint, metric, before, after, change %) for shared endpoints."""
+    rows = []
+    for name, new in after["endpoints"].items():
+        old = before["endpoints"].get(name)
+        if not old:
+            continue
+        for metric in ("p50_ms", "p99_ms", "throughput_rps", "sql_per_request"):
+            a, b = old.get(metric), new.get(metric)
+            if a is None or b is None:
+                continue
+            change = round((b - a) / a * 100, 1) if a else None
+            rows.append((name, metric, a, b, change))
+    return rows
+
+
+def dump(result, path):
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if path:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
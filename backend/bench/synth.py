@@ -0,0 +1,133 @@
+"""
+Synthetic campus generator.
+
+Builds departments, users, resources and bookings on top of the schema
+that app.init_db() creates. Bookings follow a skewed resource popularity
+and a mid-morning/early-afternoon peak, span the past year plus the next
+quarter, and never double-book an active (pending/approved) slot.
+"""
+import os
+import random
+import sqlite3
+from datetime import date, timedelta
+
+RESOURCE_TYPES = (("seminar", 60, 150), ("auditorium", 200, 800), ("lab", 20, 60))
+# Start hours weighted towards the 10:00 and 14:00 peaks
+START_HOURS = [8, 9, 10, 10, 10, 11, 11, 12, 13, 14, 14, 14, 15, 15, 16, 17]
+BENCH_PASSWORD = "bench-password"
+CHUNK = 50000
+
+
+def load_app(db_path):
+    """Import app.py against db_path (runs init_db there)."""
+    os.environ["DB_PATH"] = os.path.abspath(db_path)
+    # Benchmarks drive thousands of requests from one address; measure the handlers, not the limiter
+    os.environ.setdefault("RATE_LIMIT", "0")
+    # Keep generated past bookings as generated while measuring
+    os.environ.setdefault("BOOKING_JOBS_INTERVAL", "0")
+    # One /api/stream request is one catch-up poll, then the connection ends
+    os.environ.setdefault("STREAM_MAX_SECONDS", "0.02")
+    os.environ.setdefault("STREAM_POLL_SECONDS", "0.02")
+    import app
+    return app
+
+
+def generate(db_path, departments=10, users=5000, resources=200, bookings=100000,
+             past_days=365, future_days=90, seed=1):
+    rng = random.Random(seed)
+    app = load_app(db_path)
+    password_hash = app.hasher.hash(BENCH_PASSWORD)
+
+    conn = sqlite3.connect(os.environ["DB_PATH"])
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    cur = conn.cursor()
+
+    cur.executemany("INSERT INTO departments (name) VALUES (?)",
+                    [(f"Department {i}",) for i in range(1, departments + 1)])
+    cur.execute("SELECT id, name FROM departments")
+    dept_rows = cur.fetchall()
+
+    user_rows = []
+    for i in range(users):
+        dept_id, dept_name = rng.choice(dept_rows)
+        role = "hod" if i < len(dept_rows) else ("teacher" if rng.random() < 0.15 else "student")
+        if role == "hod":
+            dept_id, dept_name = dept_rows[i]
+        user_rows.append((f"user{i}@bench.test", password_hash, role, f"Bench User {i}", dept_name, dept_id))
+    cur.executemany(
+        "INSERT INTO users (username, password, role, name, department, department_id) VALUES (?, ?, ?, ?, ?, ?)",
+        user_rows,
+    )
+    cur.execute("SELECT id FROM users WHERE username LIKE '%@bench.test'")
+    user_ids = [r[0] for r in cur.fetchall()]
+
+    resource_rows = []
+    for i in range(resources):
+        rtype, low, high = rng.choice(RESOURCE_TYPES)
+        resource_rows.append((f"{rtype.title()} {i}", rtype, rng.randint(low, high)))
+    cur.executemany("INSERT INTO resources (name, type, capacity) VALUES (?, ?, ?)", resource_rows)
+    cur.execute("SELECT id FROM resources ORDER BY id")
+    resource_ids = [r[0] for r in cur.fetchall()]
+    # Zipf-like popularity: a few halls take most of the load
+    weights = [1.0 / (rank + 1) for rank in range(len(resource_ids))]
+    conn.commit()
+
+    today = date.today()
+    days = [today + timedelta(days=d) for d in range(-past_days, future_days + 1)]
+    days = [d for d in days if d.weekday() < 5]
+    day_index = {d: i for i, d in enumerate(days)}
+    # One bit per (resource, day, hour) taken by an active booking
+    taken = bytearray((len(resource_ids) * len(days) * 24 + 7) // 8)
+
+    def claim(r_idx, d_idx, hour, hours):
+        bits = [((r_idx * len(days) + d_idx) * 24 + h) for h in range(hour, hour + hours)]
+        if any(taken[b >> 3] & (1 << (b & 7)) for b in bits):
+            return False
+        for b in bits:
+            taken[b >> 3] |= 1 << (b & 7)
+        return True
+
+    rows = []
+    created = attempts = 0
+    while created < bookings and attempts < bookings * 5:
+        attempts += 1
+        r_idx = rng.choices(range(len(resource_ids)), weights)[0]
+        day = rng.choice(days)
+        hour = rng.choice(START_HOURS)
+        hours = rng.choice((1, 1, 2, 2, 3))
+        if day < today:
+            status = rng.choices(("conducted", "rejected", "cancelled"), (80, 10, 10))[0]
+        else:
+            status = rng.choices(("pending", "approved", "rejected", "cancelled"), (45, 40, 10, 5))[0]
+        if status in ("pending", "approved", "conducted") and not claim(r_idx, day_index[day], hour, hours):
+            continue
+        rows.append((
+            rng.choice(user_ids), resource_ids[r_idx], f"Session {created}", day.isoformat(),
+            f"{hour:02d}:00", f"{hour + hours:02d}:00", "Synthetic benchmark booking", status,
+        ))
+        created += 1
+        if len(rows) >= CHUNK:
+            _insert_bookings(cur, rows)
+            conn.commit()
+            rows = []
+    _insert_bookings(cur, rows)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    return {
+        "departments": departments,
+        "users": users,
+        "resources": resources,
+        "bookings": created,
+        "past_days": past_days,
+        "future_days": future_days,
+        "seed": seed,
+    }
+
+
+def _insert_bookings(cur, rows):
+    cur.executemany("""
+        INSERT INTO bookings (user_id, resource_id, title, date, start_time, end_time, purpose, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
@@ -0,0 +1,107 @@
+"""
+Booking change log for the /api/stream push channel.
+
+Triggers append a row to `booking_events` whenever a booking is created
+or changes status, no matter which gunicorn worker (or script) wrote it.
+Every open stream tails the log by id, so the SQLite file is the fan-out
+mechanism between workers. Only the newest KEEP_EVENTS rows are kept;
+a client that falls further behind than that simply reloads.
+
+Moves to QUIET_STATUSES are not logged. Only booking_jobs makes them,
+for every booking whose day has passed; its first pass over a database
+would otherwise flood the streams and push the real changes out of the
+kept window. Clients pick those statuses up on their next full load.
+"""
+import os
+
+KEEP_EVENTS = int(os.environ.get("BOOKING_EVENTS_KEEP", 10000))
+# End-of-life statuses set in bulk by booking_jobs
+QUIET_STATUSES = ("conducted", "expired")
+
+STATUS_TRIGGER = f"""
+    CREATE TRIGGER IF NOT EXISTS trg_bookings_event_status
+    AFTER UPDATE OF status ON bookings
+    WHEN NEW.status IS NOT OLD.status AND NEW.status NOT IN ({", ".join(map(repr, QUIET_STATUSES))})
+    BEGIN
+        INSERT INTO booking_events (booking_id, kind, resource_id, user_id)
+        VALUES (NEW.id, NEW.status, NEW.resource_id, NEW.user_id);
+    END
+    """
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS booking_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        booking_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        resource_id INTEGER,
+        user_id INTEGER,
+        created_at TEXT DEFAULT (datetime('now'))
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_bookings_event_insert
+    AFTER INSERT ON bookings
+    BEGIN
+        INSERT INTO booking_events (booking_id, kind, resource_id, user_id)
+        VALUES (NEW.id, 'created', NEW.resource_id, NEW.user_id);
+    END
+    """,
+    STATUS_TRIGGER,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_booking_events_prune
+    AFTER INSERT ON booking_events
+    BEGIN
+        DELETE FROM booking_events WHERE id <= NEW.id - {KEEP_EVENTS};
+    END
+    """,
+]
+
+
+def ensure_schema(cur):
+    for stmt in SCHEMA:
+        cur.execute(stmt)
+
+
+def quiet_job_statuses(cur):
+    """Replace a status trigger that still logs moves to QUIET_STATUSES."""
+    cur.execute("DROP TRIGGER IF EXISTS trg_bookings_event_status")
+    cur.execute(STATUS_TRIGGER)
+
+
+def latest_id(cur):
+    cur.execute("SELECT MAX(id) FROM booking_events")
+    return cur.fetchone()[0] or 0
+
+
+def fetch_since(cur, last_id, up_to, resource_id=None, user_id=None, department_id=None, limit=500):
+    """Events in (last_id, up_to] matching the filters, oldest first.
+
+    Rows: (event_id, kind, booking_id, title, resource_name, date,
+    start_time, end_time, purpose, status, requester_name, requester_id,
+    department_id)
+    """
+    where = ["e.id > ?", "e.id <= ?"]
+    params = [last_id, up_to]
+    if resource_id:
+        where.append("e.resource_id = ?")
+        params.append(resource_id)
+    if user_id:
+        where.append("e.user_id = ?")
+        params.append(user_id)
+    if department_id:
+        where.append("u.department_id = ?")
+        params.append(department_id)
+    params.append(limit)
+    cur.execute(f"""
+        SELECT e.id, e.kind, b.id, b.title, r.name, b.date, b.start_time, b.end_time,
+               b.purpose, b.status, u.name, b.user_id, u.department_id
+        FROM booking_events e
+        JOIN bookings b ON b.id = e.booking_id
+        JOIN resources r ON r.id = b.resource_id
+        LEFT JOIN users u ON u.id = b.user_id
+        WHERE {" AND ".join(where)}
+        ORDER BY e.id
+        LIMIT ?
+    """, params)
+    return cur.fetchall()
@@ -0,0 +1,244 @@
+"""
+Background booking jobs: stored end-of-life statuses and archival.
+
+- Approved bookings whose day has passed are set to `conducted`;
+  requests still pending by then were never approved and are set to
+  `expired` instead. Every reader sees the same stored status instead of
+  working it out per row against today's date, and only bookings that
+  were approved count as booked time in the utilization summary.
+- If ARCHIVE_AFTER_DAYS is set, conducted, expired, rejected and
+  cancelled bookings whose day is more than that many days in the past
+  are moved to `bookings_archive`, which has its own indexes. The hot
+  `bookings` table, and the calendar read model and search index built
+  on it, then only hold the retention window and the future. Archived
+  bookings keep counting in the utilization summary (its delete trigger
+  skips rows that were archived), but they no longer show in
+  /api/bookings/my or search, so archiving is off unless a deployment
+  turns it on.
+
+Both jobs work in batches of BATCH rows, one short write transaction
+each, so bookings made meanwhile only wait for one batch. Neither is
+pushed to /api/stream: the status moves are in booking_events'
+QUIET_STATUSES, and archiving only deletes bookings that are already
+finished. Every worker
+runs a Scheduler thread; the one holding the flock on `<db>-jobs.lock`
+does the work every INTERVAL_SECONDS, the others stand by in case it
+exits.
+
+    python booking_jobs.py run     # one pass now (from cron, or by hand)
+"""
+import fcntl
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import date
+
+import analytics
+import booking_times
+import db_pool
+
+# Seconds between passes of the in-app scheduler; 0 leaves it to cron
+INTERVAL_SECONDS = float(os.environ.get("BOOKING_JOBS_INTERVAL", 3600))
+# Days a finished booking stays in the hot table; 0 (the default) never archives
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", 0))
+BATCH = int(os.environ.get("BOOKING_JOBS_BATCH", 500))
+
+FINISHED_STATUSES = ("conducted", "expired", "rejected", "cancelled")
+ARCHIVE_COLUMNS = "id, user_id, resource_id, title, date, start_time, end_time, purpose, status, created_at, day, start_min, end_min"
+
+SCHEMA = [
+    # Both jobs look for old rows of a few statuses
+    "CREATE INDEX IF NOT EXISTS idx_bookings_status_day ON bookings(status, day)",
+    """
+    CREATE TABLE IF NOT EXISTS bookings_archive (
+        id INTEGER PRIMARY KEY,  -- bookings.id (AUTOINCREMENT, never reused)
+        user_id INTEGER,
+        resource_id INTEGER,
+        title TEXT,
+        date TEXT,
+        start_time TEXT,
+        end_time TEXT,
+        purpose TEXT,
+        status TEXT,
+        created_at TEXT,
+        day INTEGER,
+        start_min INTEGER,
+        end_min INTEGER,
+        archived_at TEXT DEFAULT (datetime('now'))
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_bookings_archive_day ON bookings_archive(day)",
+    "CREATE INDEX IF NOT EXISTS idx_bookings_archive_user_day ON bookings_archive(user_id, day)",
+    "CREATE INDEX IF NOT EXISTS idx_bookings_archive_resource_day ON bookings_archive(resource_id, day)",
+    # Archiving moves a booking; it must not be taken out of the summary
+    "DROP TRIGGER IF EXISTS trg_bookings_stats_delete",
+    analytics.ARCHIVE_AWARE_DELETE_TRIGGER,
+]
+
+
+def ensure_schema(cur):
+    for stmt in SCHEMA:
+        cur.execute(stmt)
+
+
+def _placeholders(values):
+    return ",".join("?" * len(values))
+
+
+def _close_past(conn, old_status, new_status, today, batch):
+    """Move bookings in old_status on days before `today` (a day number)
+    to new_status; returns how many were changed."""
+    cur = conn.cursor()
+    total = 0
+    while True:
+        db_pool.begin_immediate(cur)
+        try:
+            cur.execute("""
+                UPDATE bookings SET status = ?
+                WHERE id IN (
+                    SELECT id FROM bookings WHERE status = ? AND day < ? LIMIT ?
+                )
+            """, (new_status, old_status, today, batch))
+            changed = cur.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        total += changed
+        if changed < batch:
+            return total
+
+
+def mark_conducted(conn, today, batch=BATCH):
+    """Set approved bookings on days before `today` to conducted."""
+    return _close_past(conn, "approved", "conducted", today, batch)
+
+
+def expire_pending(conn, today, batch=BATCH):
+    """Set requests still pending on days before `today` to expired."""
+    return _close_past(conn, "pending", "expired", today, batch)
+
+
+def archive(conn, before_day, batch=BATCH):
+    """Move finished bookings on days before `before_day` to bookings_archive.
+
+    Returns how many were moved.
+    """
+    cur = conn.cursor()
+    total = 0
+    while True:
+        db_pool.begin_immediate(cur)
+        try:
+            cur.execute(f"""
+                SELECT id FROM bookings
+                WHERE status IN ({_placeholders(FINISHED_STATUSES)}) AND day < ?
+                LIMIT ?
+            """, (*FINISHED_STATUSES, before_day, batch))
+            ids = [row[0] for row in cur.fetchall()]
+            if ids:
+                # Archive first: the summary's delete trigger checks for the copy
+                cur.execute(f"""
+                    INSERT INTO bookings_archive ({ARCHIVE_COLUMNS})
+                    SELECT {ARCHIVE_COLUMNS} FROM bookings WHERE id IN ({_placeholders(ids)})
+                """, ids)
+                cur.execute(f"DELETE FROM bookings WHERE id IN ({_placeholders(ids)})", ids)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        total += len(ids)
+        if len(ids) < batch:
+            return total
+
+
+def run_once(conn, today=None, archive_after_days=ARCHIVE_AFTER_DAYS, batch=BATCH):
+    """Both jobs, in order; returns (conducted, expired, archived)."""
+    today = booking_times.day_number(today or date.today())
+    conducted = mark_conducted(conn, today, batch)
+    expired = expire_pending(conn, today, batch)
+    archived = archive(conn, today - archive_after_days, batch) if archive_after_days > 0 else 0
+    return conducted, expired, archived
+
+
+class Scheduler:
+    def __init__(self, connect, lock_path, interval=INTERVAL_SECONDS, archive_after_days=ARCHIVE_AFTER_DAYS,
+                 batch=BATCH):
+        """connect() -> sqlite3 connection whose close() releases it."""
+        self.connect = connect
+        self.lock_path = lock_path
+        self.interval = interval
+        self.archive_after_days = archive_after_days
+        self.batch = batch
+        self._lock_file = None
+        self._lock = threading.Lock()
+        self._stats = {"runs": 0, "failed": 0, "conducted": 0, "expired": 0, "archived": 0, "seconds": 0.0}
+
+    def start(self):
+        if self.interval > 0:
+            threading.Thread(target=self._loop, name="booking-jobs", daemon=True).start()
+
+    def _lead(self):
+        """Whether this process runs the jobs (takes the flock if it is free)."""
+        if self._lock_file is not None:
+            return True
+        lock_file = open(self.lock_path, "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file  # held until this process exits
+        logging.info("Worker %d runs the booking jobs", os.getpid())
+        return True
+
+    def _loop(self):
+        while True:
+            if self._lead():
+                self.run()
+            time.sleep(self.interval)
+
+    def run(self):
+        started = time.perf_counter()
+        conn = self.connect()
+        try:
+            conducted, expired, archived = run_once(conn, archive_after_days=self.archive_after_days,
+                                                    batch=self.batch)
+        except Exception as e:
+            logging.error(f"Booking jobs failed: {e}")
+            self._count("failed")
+            return
+        finally:
+            conn.close()
+        if conducted or expired or archived:
+            logging.info(f"Booking jobs: {conducted} conducted, {expired} expired, {archived} archived")
+        self._count("runs")
+        self._count("conducted", conducted)
+        self._count("expired", expired)
+        self._count("archived", archived)
+        self._count("seconds", time.perf_counter() - started)
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, leader=int(self._lock_file is not None))
+
+
+def main(argv):
+    if argv[1:2] != ["run"]:
+        print("usage: python booking_jobs.py run")
+        return 2
+    path = os.environ.get("DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "college_booking.db"))
+    conn = db_pool.ConnectionPool(path).acquire()
+    conducted, expired, archived = run_once(conn)
+    conn.close()
+    print(f"{path}: {conducted} bookings conducted, {expired} expired, {archived} archived")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
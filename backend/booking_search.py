@@ -0,0 +1,261 @@
+"""
+Full-text search over booking titles and purposes.
+
+`bookings_fts` is a contentless FTS5 index (it stores terms, not text)
+over bookings.title and bookings.purpose, stemmed with the porter
+tokenizer so "workshops" finds "Workshop". A third column holds filter
+tags for each booking - its month and year (m202501 y2025), resource
+(r12) and status (sapproved) - so resource, date and status filters are
+intersected inside the index instead of by looking up every match.
+Triggers keep it in step with every insert, delete and change to those
+columns, in the same transaction as the write.
+
+Results are ranked by bm25, a title match weighing TITLE_WEIGHT times a
+purpose match. Scoring is the expensive part (a few microseconds per
+match), so when more than RANK_WINDOW bookings match, only the newest
+RANK_WINDOW of them are ranked and the result says it was truncated; a
+query that broad is better narrowed with more words or filters anyway.
+
+Pages are taken by position within a window of booking ids fixed by the
+first page, not by comparing bm25 scores: a score depends on the whole
+index (how many bookings hold each term, their average length), so any
+write shifts every score and a score from page 1 means nothing on page
+2. Bookings added after the first page are left out of later pages.
+Edits, deletes, and the reordering a write can cause among close scores
+may still move a result across a page boundary (skipped or repeated).
+The display columns come from the calendar read model (`calendar_events`).
+
+    python booking_search.py rebuild    # re-index every booking
+    python booking_search.py optimize   # merge the index after bulk loads
+"""
+import os
+import re
+import sys
+from datetime import date
+
+import booking_times
+
+# bm25 weight of a match in the title relative to one in the purpose
+TITLE_WEIGHT = 10.0
+# Matches ranked per query at most (the newest ones)
+RANK_WINDOW = int(os.environ.get("SEARCH_RANK_WINDOW", 2000))
+# Quoted phrases, or single words with an optional trailing * for a prefix
+_TERM = re.compile(r'"([^"]*)"|(\w+)(\*?)', re.UNICODE)
+
+
+def _tags(row):
+    """SQL for the tags column of one booking (NEW or OLD in a trigger).
+
+    A contentless index can only delete the exact terms it was given, so
+    the same expression is used everywhere.
+    """
+    return (f"('m' || substr({row}.date, 1, 4) || substr({row}.date, 6, 2) || ' y' || substr({row}.date, 1, 4)"
+            f" || ' r' || {row}.resource_id || ' s' || {row}.status)")
+
+
+def _index(row):
+    return (f"INSERT INTO bookings_fts (rowid, title, purpose, tags) "
+            f"VALUES ({row}.id, {row}.title, {row}.purpose, {_tags(row)});")
+
+
+def _unindex(row):
+    return (f"INSERT INTO bookings_fts (bookings_fts, rowid, title, purpose, tags) "
+            f"VALUES ('delete', {row}.id, {row}.title, {row}.purpose, {_tags(row)});")
+
+
+SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS bookings_fts USING fts5(
+        title, purpose, tags,
+        content='',
+        tokenize='porter unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    # Tags never count towards the score
+    f"INSERT INTO bookings_fts (bookings_fts, rank) VALUES ('rank', 'bm25({TITLE_WEIGHT}, 1.0, 0.0)')",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_bookings_fts_insert
+    AFTER INSERT ON bookings
+    BEGIN
+        {_index("NEW")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_bookings_fts_delete
+    AFTER DELETE ON bookings
+    BEGIN
+        {_unindex("OLD")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_bookings_fts_update
+    AFTER UPDATE OF title, purpose, date, resource_id, status ON bookings
+    BEGIN
+        {_unindex("OLD")}
+        {_index("NEW")}
+    END
+    """,
+]
+
+
+def ensure_schema(cur):
+    for stmt in SCHEMA:
+        cur.execute(stmt)
+    rebuild(cur)
+
+
+def rebuild(cur):
+    """Re-index bookings from scratch (run inside a transaction)."""
+    cur.execute("INSERT INTO bookings_fts (bookings_fts) VALUES ('delete-all')")
+    cur.execute(f"""
+        INSERT INTO bookings_fts (rowid, title, purpose, tags)
+        SELECT b.id, b.title, b.purpose, {_tags("b")} FROM bookings b
+    """)
+
+
+def match_query(text):
+    """Turn what a user typed into an FTS5 query, or None if it has no terms.
+
+    Every word or "quoted phrase" must match (implicit AND); a trailing *
+    makes a word a prefix. Everything else, including FTS5 operators and
+    column filters, is treated as plain text, so no input is a syntax error.
+    """
+    terms = []
+    for phrase, word, star in _TERM.findall(text or ""):
+        if phrase:
+            words = re.findall(r"\w+", phrase, re.UNICODE)
+            if words:
+                terms.append('"' + " ".join(words) + '"')
+        elif word:
+            terms.append(f'"{word}"' + ("*" if star else ""))
+    return " ".join(terms) or None
+
+
+def _month_tags(day_from, day_to):
+    """Tags covering day_from..day_to: whole years as yYYYY, the rest as mYYYYMM."""
+    first = date.fromordinal(booking_times.EPOCH_ORDINAL + day_from)
+    last = date.fromordinal(booking_times.EPOCH_ORDINAL + day_to)
+    tags = []
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        if month == 1 and (year < last.year or last.month == 12):
+            tags.append(f"y{year}")
+            year += 1
+        else:
+            tags.append(f"m{year}{month:02d}")
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return tags
+
+
+def search(cur, query, resource_id=None, day_from=None, day_to=None, statuses=None, after=None, limit=50):
+    """Bookings matching match_query() output, best first.
+
+    day_from/day_to are inclusive day numbers. after is the cursor of
+    the previous page, (offset, floor, ceiling): the position of the
+    next result and the lowest and highest booking id of the ranked
+    window, both fixed on the first page so later pages rank the same
+    set. Returns (rows, window, truncated); rows are (id, title,
+    resource, date, start_time, end_time, purpose, status, requester,
+    user_id, rank), window is (floor, ceiling) for the next cursor,
+    truncated is whether older bookings match too but were left out of
+    the ranked window.
+    """
+    match = f"{{title purpose}} : ({query})"
+    if resource_id:
+        match += f" AND tags : r{int(resource_id)}"
+    if day_from is not None or day_to is not None:
+        if day_from is None or day_to is None:
+            cur.execute("SELECT (SELECT MIN(day) FROM calendar_events), (SELECT MAX(day) FROM calendar_events)")
+            lowest, highest = cur.fetchone()
+            day_from = lowest if day_from is None else day_from
+            day_to = highest if day_to is None else day_to
+        if day_from is None or day_to is None or day_from > day_to:
+            return [], (0, 0), False
+    # Date and status tags bound the window, but ranking checks them on the
+    # read model instead: bm25 first counts every booking carrying each
+    # term of the query, which for a month, a year or a status is a lot.
+    window_match = match
+    if day_from is not None:
+        window_match += " AND tags : (" + " OR ".join(_month_tags(day_from, day_to)) + ")"
+    if statuses:
+        window_match += " AND tags : (" + " OR ".join(f"s{s}" for s in statuses) + ")"
+
+    if after is not None:
+        offset, floor, ceiling = after
+        truncated = floor > 0 and _matches_before(cur, window_match, floor, day_from, day_to)
+    else:
+        offset = 0
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM bookings")
+        ceiling = cur.fetchone()[0]
+        # The window's oldest booking, and the next older match if there is one
+        cur.execute("""
+            SELECT rowid FROM bookings_fts WHERE bookings_fts MATCH ? AND rowid <= ?
+            ORDER BY rowid DESC LIMIT 2 OFFSET ?
+        """, (window_match, ceiling, RANK_WINDOW - 1))
+        edge = [row[0] for row in cur.fetchall()]
+        floor = edge[0] if edge else 0
+        truncated = len(edge) > 1
+        if truncated and day_from is not None:
+            # Month tags are coarser than the date range
+            truncated = _matches_before(cur, window_match, floor, day_from, day_to)
+
+    where = ["bookings_fts MATCH ?", "f.rowid BETWEEN ? AND ?"]
+    params = [match, floor, ceiling]
+    if day_from is not None:
+        where.append("e.day BETWEEN ? AND ?")
+        params.extend((day_from, day_to))
+    if statuses:
+        where.append(f"e.status IN ({','.join('?' * len(statuses))})")
+        params.extend(statuses)
+    params.extend((limit, offset))
+    cur.execute(f"""
+        SELECT e.id, e.title, e.resource, e.date, e.start_time, e.end_time,
+               e.purpose, e.status, e.requester, e.user_id, f.rank
+        FROM bookings_fts f
+        JOIN calendar_events e ON e.id = f.rowid
+        WHERE {" AND ".join(where)}
+        ORDER BY f.rank, e.id
+        LIMIT ? OFFSET ?
+    """, params)
+    return cur.fetchall(), (floor, ceiling), truncated
+
+
+def _matches_before(cur, window_match, floor, day_from, day_to):
+    """Whether a booking older than the window (rowid below floor) matches."""
+    if day_from is None:
+        cur.execute("SELECT 1 FROM bookings_fts WHERE bookings_fts MATCH ? AND rowid < ? LIMIT 1",
+                    (window_match, floor))
+    else:
+        cur.execute("""
+            SELECT 1 FROM bookings_fts f
+            JOIN calendar_events e ON e.id = f.rowid
+            WHERE bookings_fts MATCH ? AND f.rowid < ? AND e.day BETWEEN ? AND ?
+            LIMIT 1
+        """, (window_match, floor, day_from, day_to))
+    return cur.fetchone() is not None
+
+
+def main(argv):
+    import sqlite3
+
+    command = argv[1] if len(argv) > 1 else None
+    if command not in ("rebuild", "optimize"):
+        print("usage: python booking_search.py rebuild|optimize")
+        return 2
+    path = os.environ.get("DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "college_booking.db"))
+    conn = sqlite3.connect(path, timeout=60)
+    conn.execute("BEGIN IMMEDIATE")
+    if command == "rebuild":
+        rebuild(conn.cursor())
+    else:
+        conn.execute("INSERT INTO bookings_fts (bookings_fts) VALUES ('optimize')")
+    conn.commit()
+    count = conn.execute("SELECT COUNT(*) FROM bookings_fts_docsize").fetchone()[0]
+    conn.close()
+    print(f"{path}: {command} bookings_fts ({count} bookings indexed)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,62 @@
+"""
+Integer time columns for bookings.
+
+`date`, `start_time` and `end_time` stay the TEXT source of truth (they
+are what the API echoes back), but every range filter and sort goes
+through three VIRTUAL generated columns instead:
+
+    day        days since 1970-01-01
+    start_min  minute of day the booking starts
+    end_min    minute of day the booking ends
+
+Virtual columns cost nothing per row and can never drift from the TEXT
+columns; the indexes built on them hold small integers rather than
+strings, and callers no longer parse dates or times row by row.
+"""
+from datetime import date as _date
+
+EPOCH_ORDINAL = _date(1970, 1, 1).toordinal()
+
+COLUMNS = [
+    ("day", "CAST(julianday(date) - 2440587.5 AS INTEGER)"),
+    ("start_min", "CAST(substr(start_time, 1, 2) AS INTEGER) * 60 + CAST(substr(start_time, 4, 2) AS INTEGER)"),
+    ("end_min", "CAST(substr(end_time, 1, 2) AS INTEGER) * 60 + CAST(substr(end_time, 4, 2) AS INTEGER)"),
+]
+
+INDEXES = [
+    # Calendar window queries: ORDER BY day, start_min, id
+    ("idx_bookings_day_start", "CREATE INDEX IF NOT EXISTS idx_bookings_day_start ON bookings(day, start_min)"),
+    ("idx_bookings_resource_day_start",
+     "CREATE INDEX IF NOT EXISTS idx_bookings_resource_day_start ON bookings(resource_id, day, start_min)"),
+]
+
+# Replaced by the integer indexes above
+OBSOLETE_INDEXES = ("idx_bookings_date_start", "idx_bookings_resource_date_start")
+
+
+def ensure_schema(cur):
+    cur.execute("PRAGMA table_xinfo(bookings)")
+    existing = {row[1] for row in cur.fetchall()}
+    for name, expr in COLUMNS:
+        if name not in existing:
+            cur.execute(f"ALTER TABLE bookings ADD COLUMN {name} INTEGER GENERATED ALWAYS AS ({expr}) VIRTUAL")
+    cur.execute("SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='bookings'")
+    indexes = {row[0] for row in cur.fetchall()}
+    for name, stmt in INDEXES:
+        cur.execute(stmt)
+    for name in OBSOLETE_INDEXES:
+        cur.execute(f"DROP INDEX IF EXISTS {name}")
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name='sqlite_stat1'")
+    if cur.fetchone():
+        # A database that has been ANALYZEd needs stats for the new indexes
+        # too, or the planner prefers the ones it has numbers for.
+        for name, _ in INDEXES:
+            if name not in indexes:
+                cur.execute(f"ANALYZE {name}")
+
+
+def day_number(iso_date):
+    """'YYYY-MM-DD' (or a date) -> value of the `day` column"""
+    if isinstance(iso_date, str):
+        iso_date = _date.fromisoformat(iso_date)
+    return iso_date.toordinal() - EPOCH_ORDINAL
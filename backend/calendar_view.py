@@ -0,0 +1,149 @@
+"""
+Calendar read model.
+
+`calendar_events` holds one row per booking in the shape the calendar
+and "my bookings" pages consume, with the resource and requester names
+copied in, so those reads are a single indexed range scan instead of a
+bookings/resources/users join. Triggers keep it in step with `bookings`
+in the same transaction as every write, and a resource or user rename
+rewrites just the rows that carry the old name.
+
+Like the join it replaces, bookings whose resource no longer exists are
+left out. `python calendar_view.py rebuild` recomputes the table.
+"""
+import os
+import sys
+
+COLUMNS = "id, user_id, resource_id, day, start_min, status, title, resource, date, start_time, end_time, purpose, requester"
+
+
+def _project(row):
+    """INSERT .. SELECT copying one booking (NEW in a trigger)."""
+    return f"""
+        INSERT INTO calendar_events ({COLUMNS})
+        SELECT {row}.id, {row}.user_id, {row}.resource_id, {row}.day, {row}.start_min, {row}.status,
+               {row}.title, r.name, {row}.date, {row}.start_time, {row}.end_time, {row}.purpose,
+               (SELECT name FROM users WHERE id = {row}.user_id)
+        FROM resources r
+        WHERE r.id = {row}.resource_id;
+    """
+
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS calendar_events (
+        id INTEGER PRIMARY KEY,  -- bookings.id
+        user_id INTEGER,
+        resource_id INTEGER NOT NULL,
+        day INTEGER,
+        start_min INTEGER,
+        status TEXT,
+        title TEXT,
+        resource TEXT,
+        date TEXT,
+        start_time TEXT,
+        end_time TEXT,
+        purpose TEXT,
+        requester TEXT
+    )
+    """,
+    # id rides along in every index, so these also serve ORDER BY day, start_min, id
+    "CREATE INDEX IF NOT EXISTS idx_calendar_events_day_start ON calendar_events(day, start_min)",
+    "CREATE INDEX IF NOT EXISTS idx_calendar_events_resource_day ON calendar_events(resource_id, day, start_min)",
+    "CREATE INDEX IF NOT EXISTS idx_calendar_events_user_day ON calendar_events(user_id, day, start_min)",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_bookings_calendar_insert
+    AFTER INSERT ON bookings
+    BEGIN
+        {_project("NEW")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_bookings_calendar_update
+    AFTER UPDATE ON bookings
+    BEGIN
+        DELETE FROM calendar_events WHERE id = OLD.id;
+        {_project("NEW")}
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_bookings_calendar_delete
+    AFTER DELETE ON bookings
+    BEGIN
+        DELETE FROM calendar_events WHERE id = OLD.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_resources_calendar_rename
+    AFTER UPDATE OF name ON resources
+    WHEN NEW.name IS NOT OLD.name
+    BEGIN
+        UPDATE calendar_events SET resource = NEW.name WHERE resource_id = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_resources_calendar_delete
+    AFTER DELETE ON resources
+    BEGIN
+        DELETE FROM calendar_events WHERE resource_id = OLD.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_users_calendar_rename
+    AFTER UPDATE OF name ON users
+    WHEN NEW.name IS NOT OLD.name
+    BEGIN
+        UPDATE calendar_events SET requester = NEW.name WHERE user_id = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_users_calendar_delete
+    AFTER DELETE ON users
+    BEGIN
+        UPDATE calendar_events SET requester = NULL WHERE user_id = OLD.id;
+    END
+    """,
+]
+
+
+def ensure_schema(cur):
+    for stmt in SCHEMA:
+        cur.execute(stmt)
+    rebuild(cur)
+
+
+def rebuild(cur):
+    """Recompute calendar_events from bookings (run inside a transaction)."""
+    cur.execute("DELETE FROM calendar_events")
+    cur.execute(f"""
+        INSERT INTO calendar_events ({COLUMNS})
+        SELECT b.id, b.user_id, b.resource_id, b.day, b.start_min, b.status,
+               b.title, r.name, b.date, b.start_time, b.end_time, b.purpose, u.name
+        FROM bookings b
+        JOIN resources r ON r.id = b.resource_id
+        LEFT JOIN users u ON u.id = b.user_id
+    """)
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+    if cur.fetchone():
+        cur.execute("ANALYZE calendar_events")
+
+
+def main(argv):
+    import sqlite3
+
+    if argv[1:2] != ["rebuild"]:
+        print("usage: python calendar_view.py rebuild")
+        return 2
+    path = os.environ.get("DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "college_booking.db"))
+    conn = sqlite3.connect(path, timeout=60)
+    conn.execute("BEGIN IMMEDIATE")
+    rebuild(conn.cursor())
+    conn.commit()
+    count = conn.execute("SELECT COUNT(*) FROM calendar_events").fetchone()[0]
+    conn.close()
+    print(f"{path}: rebuilt calendar_events ({count} rows)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,196 @@
+"""
+Response compression.
+
+Picks brotli (when the `brotli` package is installed) or gzip from the
+request's Accept-Encoding and compresses JSON/text bodies of at least
+COMPRESS_MIN_BYTES. Streamed bodies are compressed chunk by chunk as they
+are produced, so they keep streaming.
+
+A compressed body gets its own ETag ("<etag>-gzip" / "<etag>-br"), since
+it is a different representation, and is kept in a small LRU keyed by
+that ETag: the next request for an unchanged resource reuses the bytes
+instead of compressing them again. Streamed bodies are cached too once
+complete, if they are not too large.
+
+Per-encoding byte counts and compression time are exposed through
+stats() so the ratio and cost show up in /metrics.
+"""
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", 5))
+CACHE_ITEMS = int(os.environ.get("COMPRESS_CACHE_ITEMS", 256))
+CACHE_MAX_BYTES = int(os.environ.get("COMPRESS_CACHE_MAX_BYTES", 1024 * 1024))  # per body
+
+COMPRESSIBLE = ("application/json", "text/plain", "text/html", "text/css", "application/javascript")
+
+
+def available_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding):
+    """Best supported coding the client accepts (None for identity)."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in available_encodings():
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def etag_variants(etag, accept_encoding):
+    """ETags a request may validate: the plain one (sent uncompressed, or
+    too small to compress) and the one for the encoding chosen now. A
+    variant for another encoding is not the representation this request
+    would get, so it must not earn a 304."""
+    encoding = choose_encoding(accept_encoding)
+    return (etag,) if encoding is None else (etag, f"{etag}-{encoding}")
+
+
+def _compressor(encoding):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+    return compressor.compress, compressor.flush
+
+
+class Compressor:
+    def __init__(self, cache_items=CACHE_ITEMS, min_bytes=MIN_BYTES):
+        self.min_bytes = min_bytes
+        self.cache_items = cache_items
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._cache_hits = 0
+
+    def _record(self, encoding, bytes_in, bytes_out, seconds):
+        with self._lock:
+            stats = self._stats.setdefault(encoding, [0, 0, 0.0, 0])
+            stats[0] += bytes_in
+            stats[1] += bytes_out
+            stats[2] += seconds
+            stats[3] += 1
+
+    def _cached(self, key):
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+                self._cache_hits += 1
+            return body
+
+    def _store(self, key, body):
+        if not key or len(body) > CACHE_MAX_BYTES:
+            return
+        with self._lock:
+            self._cache[key] = body
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_items:
+                self._cache.popitem(last=False)
+
+    def compress(self, encoding, data):
+        started = time.perf_counter()
+        compress, finish = _compressor(encoding)
+        body = compress(data) + finish()
+        self._record(encoding, len(data), len(body), time.perf_counter() - started)
+        return body
+
+    def compress_stream(self, encoding, chunks, cache_key=None):
+        compress, finish = _compressor(encoding)
+        bytes_in = bytes_out = 0
+        seconds = 0.0
+        kept = [] if cache_key else None  # dropped once past CACHE_MAX_BYTES
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode("utf-8")
+                started = time.perf_counter()
+                out = compress(chunk)
+                seconds += time.perf_counter() - started
+                bytes_in += len(chunk)
+                if out:
+                    bytes_out += len(out)
+                    if kept is not None and bytes_out <= CACHE_MAX_BYTES:
+                        kept.append(out)
+                    else:
+                        kept = None
+                    yield out
+            started = time.perf_counter()
+            out = finish()
+            seconds += time.perf_counter() - started
+            bytes_out += len(out)
+            if kept is not None:
+                self._store(cache_key, b"".join(kept) + out)
+            yield out
+        finally:
+            if bytes_in:
+                self._record(encoding, bytes_in, bytes_out, seconds)
+
+    def apply(self, response, accept_encoding):
+        """Compress a Flask response in place when it is worth it."""
+        if response.status_code != 200 or "Content-Encoding" in response.headers:
+            return response
+        if response.mimetype not in COMPRESSIBLE:
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = choose_encoding(accept_encoding)
+        if encoding is None:
+            return response
+
+        etag, weak = response.get_etag()
+        key = f"{etag}-{encoding}" if etag else None
+        cached = self._cached(key) if key else None
+
+        if cached is not None:
+            response.close()  # drop the fresh body, streamed or not
+            response.response = [cached]
+            response.direct_passthrough = False
+            response.content_length = len(cached)
+        elif response.is_streamed:
+            response.response = self.compress_stream(encoding, response.response, key)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_bytes:
+                return response
+            body = self.compress(encoding, data)
+            self._store(key, body)
+            response.set_data(body)
+
+        response.headers["Content-Encoding"] = encoding
+        if etag:
+            response.set_etag(key, weak)
+        return response
+
+    def stats(self):
+        with self._lock:
+            stats = {"cache_hits": self._cache_hits, "cached_bodies": len(self._cache)}
+            for encoding, (bytes_in, bytes_out, seconds, count) in self._stats.items():
+                stats[encoding] = {
+                    "responses": count,
+                    "bytes_in": bytes_in,
+                    "bytes_out": bytes_out,
+                    "seconds": round(seconds, 6),
+                }
+            return stats
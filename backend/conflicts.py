@@ -0,0 +1,356 @@
+"""
+Booking conflict detection.
+
+Active bookings (pending/approved) are kept in process memory as sorted
+interval lists, one bucket per (resource_id, date). A bucket is loaded
+once through the (resource_id, date, status) index and then kept in sync
+by the write paths. Writers in other gunicorn workers are picked up via
+`booking_slot_versions`, a per-bucket counter bumped by triggers on every
+write to `bookings`, so a stale bucket is simply reloaded.
+"""
+import bisect
+import threading
+from collections import OrderedDict
+
+ACTIVE_STATUSES = ("pending", "approved")
+MAX_BUCKETS = 4096
+
+# Occupancy bitmaps: bit i covers minutes [5i, 5i + 5) of the day
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+SCHEMA = [
+    """
+    CREATE INDEX IF NOT EXISTS idx_bookings_resource_date_status
+        ON bookings(resource_id, date, status)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS booking_slot_versions (
+        resource_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        version INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (resource_id, date)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_bookings_slot_insert
+    AFTER INSERT ON bookings
+    BEGIN
+        INSERT INTO booking_slot_versions (resource_id, date, version)
+        VALUES (NEW.resource_id, NEW.date, 1)
+        ON CONFLICT(resource_id, date) DO UPDATE SET version = version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_bookings_slot_update
+    AFTER UPDATE OF resource_id, date, start_time, end_time, status ON bookings
+    BEGIN
+        INSERT INTO booking_slot_versions (resource_id, date, version)
+        VALUES (OLD.resource_id, OLD.date, 1)
+        ON CONFLICT(resource_id, date) DO UPDATE SET version = version + 1;
+        INSERT INTO booking_slot_versions (resource_id, date, version)
+        SELECT NEW.resource_id, NEW.date, 1
+        WHERE NEW.resource_id IS NOT OLD.resource_id OR NEW.date IS NOT OLD.date
+        ON CONFLICT(resource_id, date) DO UPDATE SET version = version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_bookings_slot_delete
+    AFTER DELETE ON bookings
+    BEGIN
+        INSERT INTO booking_slot_versions (resource_id, date, version)
+        VALUES (OLD.resource_id, OLD.date, 1)
+        ON CONFLICT(resource_id, date) DO UPDATE SET version = version + 1;
+    END
+    """,
+]
+
+
+def ensure_schema(cur):
+    """Create the conflict-detection index, version table and triggers."""
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='booking_slot_versions'")
+    fresh = cur.fetchone() is None
+    for stmt in SCHEMA:
+        cur.execute(stmt)
+    if fresh:
+        # Days booked before the triggers existed still need a version row
+        # so range lookups (occupancy) know to load them.
+        cur.execute("""
+            INSERT OR IGNORE INTO booking_slot_versions (resource_id, date, version)
+            SELECT DISTINCT resource_id, date, 0 FROM bookings
+            WHERE resource_id IS NOT NULL AND date IS NOT NULL
+        """)
+
+
+def to_minutes(t):
+    """'HH:MM' -> minute of day"""
+    return int(t[:2]) * 60 + int(t[3:5])
+
+
+def slot_mask(start, end):
+    """Bitmap of the 5-minute slots touched by [start, end) (minutes)."""
+    first = start // SLOT_MINUTES
+    last = -(-end // SLOT_MINUTES)
+    return ((1 << (last - first)) - 1) << first if last > first else 0
+
+
+def free_runs(occupied, open_minute, close_minute):
+    """Yield (start, end) minute ranges of free slots between open and close."""
+    lo = -(-open_minute // SLOT_MINUTES)
+    hi = close_minute // SLOT_MINUTES
+    if hi <= lo:
+        return
+    free = ~occupied & (((1 << (hi - lo)) - 1) << lo)
+    while free:
+        start = (free & -free).bit_length() - 1
+        shifted = free >> start
+        length = (shifted ^ (shifted + 1)).bit_length() - 1  # trailing ones
+        yield start * SLOT_MINUTES, (start + length) * SLOT_MINUTES
+        free &= ~(((1 << length) - 1) << start)
+
+
+def slot_version(cur, resource_id, date):
+    cur.execute(
+        "SELECT version FROM booking_slot_versions WHERE resource_id=? AND date=?",
+        (resource_id, date),
+    )
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+class IntervalSet:
+    """Intervals (in minutes) of one resource on one day, sorted by start."""
+
+    __slots__ = ("version", "starts", "ends", "ids", "max_ends", "_bits")
+
+    def __init__(self, intervals=(), version=0):
+        intervals = sorted(intervals)
+        self.version = version
+        self.starts = [i[0] for i in intervals]
+        self.ends = [i[1] for i in intervals]
+        self.ids = [i[2] for i in intervals]
+        self._bits = None
+        self._reindex(0)
+
+    def occupancy(self):
+        """Occupancy bitmap (one bit per SLOT_MINUTES), built on first use."""
+        if self._bits is None:
+            bits = 0
+            for start, end in zip(self.starts, self.ends):
+                bits |= slot_mask(start, end)
+            self._bits = bits
+        return self._bits
+
+    def _reindex(self, lo):
+        # max_ends[i] = max(ends[0..i]); lets find() stop scanning early
+        if lo == 0:
+            self.max_ends = []
+        else:
+            del self.max_ends[lo:]
+        running = self.max_ends[-1] if self.max_ends else -1
+        for end in self.ends[lo:]:
+            running = max(running, end)
+            self.max_ends.append(running)
+
+    def find(self, start, end, ignore_id=None):
+        """Return the id of an interval overlapping [start, end), or None."""
+        i = bisect.bisect_left(self.starts, end) - 1
+        while i >= 0 and self.max_ends[i] > start:
+            if self.ends[i] > start and self.ids[i] != ignore_id:
+                return self.ids[i]
+            i -= 1
+        return None
+
+    def add(self, start, end, booking_id):
+        i = bisect.bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, booking_id)
+        self._reindex(i)
+        if self._bits is not None:
+            self._bits |= slot_mask(start, end)
+
+    def remove(self, booking_id):
+        try:
+            i = self.ids.index(booking_id)
+        except ValueError:
+            return
+        del self.starts[i], self.ends[i], self.ids[i]
+        self._reindex(i)
+        self._bits = None  # other intervals may share the freed slots
+
+
+class ConflictIndex:
+    """Per-worker cache of active booking intervals."""
+
+    def __init__(self, max_buckets=MAX_BUCKETS):
+        self._buckets = OrderedDict()
+        self._max_buckets = max_buckets
+        self._lock = threading.Lock()
+
+    def _load(self, cur, resource_id, date, version):
+        cur.execute(
+            """
+            SELECT start_min, end_min, id FROM bookings
+            WHERE resource_id=? AND date=? AND status IN ('pending','approved')
+            """,
+            (resource_id, date),
+        )
+        return IntervalSet(cur.fetchall(), version)
+
+    def bucket(self, cur, resource_id, date):
+        """Return an up-to-date bucket, reloading it if another writer touched it."""
+        key = (resource_id, date)
+        # Read the version before the rows: a racing write can then only
+        # make us reload once too often, never keep a stale bucket.
+        version = slot_version(cur, resource_id, date)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None and bucket.version == version:
+                self._buckets.move_to_end(key)
+                return bucket
+        bucket = self._load(cur, resource_id, date, version)
+        with self._lock:
+            self._buckets[key] = bucket
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self._max_buckets:
+                self._buckets.popitem(last=False)
+        return bucket
+
+    def buckets(self, cur, resource_ids, date_from, date_to):
+        """Up-to-date buckets for every resource over an inclusive date range.
+
+        Returns {(resource_id, date): IntervalSet} for days that have (or had)
+        bookings; days never written to are simply absent. Versions are read
+        with one query and all stale buckets are reloaded with one more.
+        """
+        if not resource_ids:
+            return {}
+        marks = ",".join("?" * len(resource_ids))
+        cur.execute(f"""
+            SELECT resource_id, date, version FROM booking_slot_versions
+            WHERE resource_id IN ({marks}) AND date BETWEEN ? AND ?
+        """, [*resource_ids, date_from, date_to])
+        versions = {(r, d): v for r, d, v in cur.fetchall()}
+
+        result, stale = {}, {}
+        with self._lock:
+            for key, version in versions.items():
+                bucket = self._buckets.get(key)
+                if bucket is not None and bucket.version == version:
+                    result[key] = bucket
+                else:
+                    stale[key] = version
+        if not stale:
+            return result
+
+        stale_resources = sorted({r for r, _ in stale})
+        cur.execute(f"""
+            SELECT resource_id, date, start_min, end_min, id FROM bookings
+            WHERE resource_id IN ({",".join("?" * len(stale_resources))})
+              AND date BETWEEN ? AND ? AND status IN ('pending','approved')
+        """, [*stale_resources, min(d for _, d in stale), max(d for _, d in stale)])
+        intervals = {key: [] for key in stale}
+        for resource_id, date, start, end, booking_id in cur.fetchall():
+            key = (resource_id, date)
+            if key in intervals:
+                intervals[key].append((start, end, booking_id))
+
+        with self._lock:
+            for key, version in stale.items():
+                bucket = IntervalSet(intervals[key], version)
+                self._buckets[key] = bucket
+                self._buckets.move_to_end(key)
+                result[key] = bucket
+            while len(self._buckets) > self._max_buckets:
+                self._buckets.popitem(last=False)
+        return result
+
+    def occupancy(self, cur, resource_ids, date_from, date_to):
+        """{(resource_id, date): occupancy bitmap} for days with active bookings."""
+        buckets = self.buckets(cur, resource_ids, date_from, date_to)
+        with self._lock:
+            occupied = {key: bucket.occupancy() for key, bucket in buckets.items()}
+        return {key: bits for key, bits in occupied.items() if bits}
+
+    def find_conflict(self, cur, resource_id, date, start_time, end_time, ignore_booking_id=None):
+        """Return the id of an active booking overlapping the slot, or None."""
+        bucket = self.bucket(cur, resource_id, date)
+        with self._lock:
+            return bucket.find(to_minutes(start_time), to_minutes(end_time), ignore_booking_id)
+
+    def changes(self):
+        return ChangeSet(self)
+
+    def _apply(self, key, version, bumps, ops):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                return
+            if bucket.version != version - bumps:
+                # Someone else wrote to this slot in between; reload lazily.
+                del self._buckets[key]
+                return
+            for op in ops:
+                if op[0] == "add":
+                    bucket.add(*op[1:])
+                else:
+                    bucket.remove(op[1])
+            bucket.version = version
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class ChangeSet:
+    """
+    Records booking writes made inside one transaction so the index can be
+    updated after commit. Usage:
+
+        changes = conflict_index.changes()
+        changes.added(resource_id, date, start_time, end_time, booking_id)
+        changes.stamp(cur)   # inside the transaction, after the writes
+        conn.commit()
+        changes.apply()
+    """
+
+    def __init__(self, index):
+        self._index = index
+        self._ops = OrderedDict()
+        self._versions = {}
+
+    def _record(self, resource_id, date, op):
+        self._ops.setdefault((resource_id, date), []).append(op)
+
+    def added(self, resource_id, date, start_time, end_time, booking_id):
+        self._record(resource_id, date, ("add", to_minutes(start_time), to_minutes(end_time), booking_id))
+
+    def removed(self, resource_id, date, booking_id):
+        self._record(resource_id, date, ("remove", booking_id))
+
+    def touched(self, resource_id, date):
+        """A row changed without leaving the active set (e.g. pending -> approved)."""
+        self._record(resource_id, date, ("touch",))
+
+    def status_changed(self, resource_id, date, start_time, end_time, booking_id, old_status, new_status):
+        """Record a status update, whichever way it moves the row."""
+        was_active = old_status in ACTIVE_STATUSES
+        is_active = new_status in ACTIVE_STATUSES
+        if was_active and not is_active:
+            self.removed(resource_id, date, booking_id)
+        elif is_active and not was_active:
+            self.added(resource_id, date, start_time, end_time, booking_id)
+        else:
+            self.touched(resource_id, date)
+
+    def stamp(self, cur):
+        for resource_id, date in self._ops:
+            self._versions[(resource_id, date)] = slot_version(cur, resource_id, date)
+
+    def apply(self):
+        for key, ops in self._ops.items():
+            if key not in self._versions:
+                continue
+            self._index._apply(key, self._versions[key], len(ops),
+                               [op for op in ops if op[0] != "touch"])
@@ -0,0 +1,83 @@
+"""
+Data-version counters for conditional GETs.
+
+Every write to one of the tracked tables bumps its row in `data_versions`
+through a trigger, whichever worker or script made it. Read endpoints
+hash the counters they depend on into a strong ETag and can answer
+If-None-Match with a 304 without touching the tables themselves.
+"""
+import hashlib
+
+TRACKED_TABLES = ("bookings", "resources", "users", "departments")
+
+
+def _bump(table):
+    return (
+        "INSERT INTO data_versions (name, version) VALUES ('%s', 1) "
+        "ON CONFLICT(name) DO UPDATE SET version = version + 1;" % table
+    )
+
+
+def ensure_schema(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS data_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """)
+    for table in TRACKED_TABLES:
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+            AFTER {event} ON {table}
+            BEGIN
+                {_bump(table)}
+            END
+            """)
+
+
+# Booking responses show the requester's name, and the utilization summary
+# counts by the requester's department; bump `bookings` when those change
+# rather than making every booking ETag depend on the whole users table.
+USER_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_users_bookings_version_update
+    AFTER UPDATE OF name, department_id ON users
+    BEGIN
+        {_bump("bookings")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_users_bookings_version_delete
+    AFTER DELETE ON users
+    BEGIN
+        {_bump("bookings")}
+    END
+    """,
+]
+
+
+def ensure_user_triggers(cur):
+    for stmt in USER_TRIGGERS:
+        cur.execute(stmt)
+
+
+def current(cur, tables):
+    """Return {table: version} for the given tables (0 if never written)."""
+    cur.execute("SELECT name, version FROM data_versions")
+    versions = dict(cur.fetchall())
+    return {table: versions.get(table, 0) for table in tables}
+
+
+def version(cur, table):
+    """Current version of one table (0 if never written)."""
+    cur.execute("SELECT version FROM data_versions WHERE name = ?", (table,))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def etag_for(versions, *extra):
+    """Strong ETag value derived from table versions plus request-specific parts."""
+    parts = [f"{name}={versions[name]}" for name in sorted(versions)]
+    parts.extend(str(e) for e in extra)
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:20]
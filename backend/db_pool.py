@@ -0,0 +1,267 @@
+"""
+SQLite connection pool.
+
+Connections are kept per thread (gunicorn sync workers have exactly one)
+and handed out again instead of being reopened on every request. Calling
+`close()` on a pooled connection returns it to the pool; any transaction
+left open is rolled back first. The pool is discarded after a fork so
+a worker never reuses its parent's connections.
+
+Statement observers (add_statement_observer) see every statement run on
+a pooled connection along with the time spent executing and fetching it.
+
+begin_immediate() takes the write lock for the check-then-write paths.
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+
+BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", 5000))
+MMAP_SIZE = int(os.environ.get("DB_MMAP_SIZE", 64 * 1024 * 1024))
+CACHED_STATEMENTS = int(os.environ.get("DB_CACHED_STATEMENTS", 256))
+MAX_IDLE_PER_THREAD = int(os.environ.get("DB_POOL_MAX_IDLE", 4))
+# begin_immediate(): SQLite's own wait per attempt, and the cap on the sleep between attempts
+BEGIN_WAIT_MS = int(os.environ.get("DB_BEGIN_WAIT_MS", 20))
+BEGIN_BACKOFF_MAX_MS = int(os.environ.get("DB_BEGIN_BACKOFF_MAX_MS", 100))
+
+
+def begin_immediate(cur, timeout_ms=BUSY_TIMEOUT_MS):
+    """BEGIN IMMEDIATE, retried with jittered exponential backoff.
+
+    Once it returns, no other connection can write until we commit, so a
+    conflict check made afterwards stays true until our INSERT lands.
+    SQLite's busy handler wakes every waiter on the same schedule; here
+    each attempt waits at most BEGIN_WAIT_MS in SQLite, then sleeps a
+    random 0..2^n ms (capped) so waiting workers spread out. Gives up
+    with the last "database is locked" error after timeout_ms.
+    Returns the number of retries.
+    """
+    deadline = time.monotonic() + timeout_ms / 1000.0
+    retries = 0
+    cur.execute(f"PRAGMA busy_timeout = {BEGIN_WAIT_MS}")
+    try:
+        while True:
+            try:
+                cur.execute("BEGIN IMMEDIATE")
+                return retries
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) and "busy" not in str(e):
+                    raise
+                if time.monotonic() >= deadline:
+                    raise
+            retries += 1
+            time.sleep(random.uniform(0, min(2 ** retries, BEGIN_BACKOFF_MAX_MS)) / 1000.0)
+    finally:
+        cur.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that reports each statement to the connection's observers.
+
+    A statement is reported once it is done with: when its rows run out,
+    when the cursor runs another statement, or when the cursor is closed
+    or dropped. The time covers execute() plus every fetch.
+    """
+
+    _sql = None
+
+    def _start(self, sql, params):
+        self._finish()
+        self._sql, self._params, self._elapsed, self._rows = sql, params, 0.0, 0
+
+    def _finish(self):
+        if self._sql is None:
+            return
+        sql, self._sql = self._sql, None
+        for observer in self.connection.observers:
+            observer(sql, self._params, self._elapsed, self._rows)
+
+    def _timed(self, call, *args):
+        started = time.perf_counter()
+        try:
+            return call(*args)
+        finally:
+            self._elapsed += time.perf_counter() - started
+
+    def execute(self, sql, params=()):
+        self._start(sql, params)
+        self._timed(super().execute, sql, params)
+        if self.description is None:  # nothing to fetch
+            self._rows = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._start(sql, None)
+        self._timed(super().executemany, sql, seq_of_params)
+        self._rows = max(self.rowcount, 0)
+        self._finish()
+        return self
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        elif self._sql is not None:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, size or self.arraysize)
+        if self._sql is not None:
+            self._rows += len(rows)
+            if len(rows) < (size or self.arraysize):
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._sql is not None:
+            self._rows += len(rows)
+            self._finish()
+        return rows
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to its pool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self.checked_out = False
+        self.observers = ()
+
+    def cursor(self, factory=None):
+        if factory is None and self.observers:
+            factory = TimedCursor
+        return super().cursor(factory) if factory else super().cursor()
+
+    # sqlite3's own shortcuts bypass cursor(), so route them through it
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        elif self.checked_out:
+            self.pool.release(self)
+        # closing an already released connection is a no-op
+
+    def discard(self):
+        self.pool = None
+        sqlite3.Connection.close(self)
+
+
+class ConnectionPool:
+    def __init__(self, path, max_idle=MAX_IDLE_PER_THREAD):
+        self.path = path
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._connect_hooks = []
+        self._statement_observers = []
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._stats = {"created": 0, "reused": 0, "released": 0, "discarded": 0, "in_use": 0}
+
+    def _idle(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+        idle = getattr(self._local, "idle", None)
+        if idle is None:
+            idle = self._local.idle = []
+        return idle
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_MS / 1000.0,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+            factory=PooledConnection,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        for hook in self._connect_hooks:
+            hook(conn)
+        conn.observers = self._statement_observers
+        return conn
+
+    def add_connect_hook(self, hook):
+        """Call hook(conn) on every connection this pool opens, including idle ones."""
+        self._connect_hooks.append(hook)
+        for conn in getattr(self._local, "idle", None) or []:
+            hook(conn)
+
+    def add_statement_observer(self, observer):
+        """Call observer(sql, params, seconds, rows) for every statement run
+        through a cursor of a pooled connection (conn.execute included)."""
+        self._statement_observers.append(observer)
+
+    def acquire(self):
+        idle = self._idle()
+        if idle:
+            conn = idle.pop()
+            key = "reused"
+        else:
+            conn = self._connect()
+            key = "created"
+        conn.pool = self
+        conn.checked_out = True
+        with self._lock:
+            self._stats[key] += 1
+            self._stats["in_use"] += 1
+        return conn
+
+    def release(self, conn):
+        conn.checked_out = False
+        with self._lock:
+            self._stats["in_use"] -= 1
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.discard()
+            with self._lock:
+                self._stats["discarded"] += 1
+            return
+        idle = self._idle()
+        if len(idle) < self.max_idle:
+            idle.append(conn)
+            key = "released"
+        else:
+            conn.discard()
+            key = "discarded"
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["pid"] = self._pid
+        stats["idle"] = len(getattr(self._local, "idle", None) or [])
+        return stats
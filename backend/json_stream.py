@@ -0,0 +1,55 @@
+"""
+Streaming JSON for large list endpoints.
+
+List routes used to fetchall(), build every dict, then jsonify the whole
+list before sending a byte. array_chunks() instead encodes one item at a
+time as rows come off the cursor and yields the array in ~64 KB pieces,
+so memory stays flat and the first bytes go out after the first page of
+rows. orjson is used when installed; the stdlib encoder otherwise.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+CHUNK_BYTES = 64 * 1024
+FETCH_ROWS = 500
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def dumps(obj):
+    """obj -> UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return _encoder.encode(obj).encode("utf-8")
+
+
+def iter_rows(cur, size=FETCH_ROWS):
+    """Rows of an executed cursor, fetched size at a time."""
+    while True:
+        rows = cur.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
+def array_chunks(items, chunk_bytes=CHUNK_BYTES):
+    """Encode an iterable as a JSON array, yielding bytes chunks."""
+    parts = [b"["]
+    size = 1
+    separator = b""
+    for item in items:
+        data = dumps(item)
+        parts.append(separator)
+        parts.append(data)
+        separator = b","
+        size += len(data) + 1
+        if size >= chunk_bytes:
+            yield b"".join(parts)
+            parts = []
+            size = 0
+    parts.append(b"]")
+    yield b"".join(parts)
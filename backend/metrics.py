@@ -0,0 +1,260 @@
+"""
+Request metrics in Prometheus text format.
+
+Each worker process keeps its own counters in memory: per route (the
+Flask URL rule, e.g. /api/bookings/<int:booking_id>) and method it
+counts requests by status, a latency histogram, SQL statements and the
+seconds spent in SQLite, and the seconds spent waiting on bcrypt.
+
+Workers share nothing, so every worker writes a snapshot of its
+counters to `<directory>/<pid>.json` at most every FLUSH_SECONDS, and
+/metrics adds up all the snapshots. Snapshots of workers that have
+exited are folded into `retired.json` so their counts are not lost and
+the directory does not grow with every worker restart. That includes
+their `*_total` collector counters, so those never go backwards when a
+worker is replaced; collector gauges only describe live workers.
+"""
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+
+FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", 5))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PREFIX = "bookmycampus"
+RETIRED = "retired.json"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _merge(into, snapshot):
+    for section, values in snapshot.items():
+        target = into.setdefault(section, {})
+        for key, value in values.items():
+            if isinstance(value, list):
+                current = target.setdefault(key, [0] * len(value))
+                for i, v in enumerate(value):
+                    current[i] += v
+            else:
+                target[key] = target.get(key, 0) + value
+    return into
+
+
+class Metrics:
+    def __init__(self, directory, flush_seconds=FLUSH_SECONDS):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._collectors = []
+        self._reset()
+        atexit.register(self._flush_at_exit)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._flushed_at = 0.0
+        # "route\tmethod\tstatus" -> count, "route\tmethod" -> [...]
+        self._requests = {}
+        self._latency = {}
+        self._sql = {}
+        self._bcrypt = {}
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+    def add_collector(self, collector):
+        """collector() -> {name: value} of per-process counters, read at flush
+        time and summed across workers (e.g. pool or cache stats)."""
+        self._collectors.append(collector)
+
+    # -- request hooks (called from app.before_request/after_request) --
+
+    def start_request(self):
+        self._local.current = [time.perf_counter(), 0, 0.0, 0.0]  # started, statements, sql s, bcrypt s
+
+    def observe_statement(self, sql, params, seconds, rows):
+        current = getattr(self._local, "current", None)
+        if current is not None:
+            current[1] += 1
+            current[2] += seconds
+
+    def observe_bcrypt(self, seconds):
+        current = getattr(self._local, "current", None)
+        if current is not None:
+            current[3] += seconds
+
+    def finish_request(self, route, method, status):
+        current = getattr(self._local, "current", None)
+        if current is None:
+            return
+        self._local.current = None
+        elapsed = time.perf_counter() - current[0]
+        self._check_fork()
+        key = f"{route}\t{method}"
+        with self._lock:
+            status_key = f"{key}\t{status}"
+            self._requests[status_key] = self._requests.get(status_key, 0) + 1
+            histogram = self._latency.get(key)
+            if histogram is None:
+                histogram = self._latency[key] = [0] * (len(LATENCY_BUCKETS) + 2)  # buckets, count, sum
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    histogram[i] += 1
+            histogram[-2] += 1
+            histogram[-1] += elapsed
+            sql = self._sql.setdefault(key, [0, 0.0])
+            sql[0] += current[1]
+            sql[1] += current[2]
+            if current[3]:
+                self._bcrypt[key] = self._bcrypt.get(key, 0.0) + current[3]
+        if time.monotonic() - self._flushed_at >= self.flush_seconds:
+            self.flush()
+
+    # -- cross-worker aggregation --
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = {
+                "requests": dict(self._requests),
+                "latency": {k: list(v) for k, v in self._latency.items()},
+                "sql": {k: list(v) for k, v in self._sql.items()},
+                "bcrypt": dict(self._bcrypt),
+            }
+        process = {}
+        for collector in self._collectors:
+            process.update(collector())
+        snapshot["process"] = process
+        return snapshot
+
+    def flush(self):
+        """Write this worker's snapshot where the other workers can see it."""
+        self._check_fork()
+        self._flushed_at = time.monotonic()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{self._pid}.json")
+            tmp = f"{path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, path)
+        except OSError:
+            pass  # metrics must never fail a request
+
+    def _flush_at_exit(self):
+        if self._pid == os.getpid() and self._requests:
+            self.flush()
+
+    def collect(self):
+        """Sum of every worker's latest snapshot, this one's included."""
+        self.flush()
+        total = {}
+        try:
+            with open(os.path.join(self.directory, ".lock"), "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                retired_path = os.path.join(self.directory, RETIRED)
+                retired = self._read(retired_path)
+                dead = []
+                for name in os.listdir(self.directory):
+                    if not name.endswith(".json") or name == RETIRED:
+                        continue
+                    pid = int(name[:-5]) if name[:-5].isdigit() else None
+                    snapshot = self._read(os.path.join(self.directory, name))
+                    if pid is None or not snapshot:
+                        continue
+                    if _pid_alive(pid):
+                        _merge(total, snapshot)
+                    else:
+                        # Gauges of a dead worker mean nothing; its counters still count
+                        process = snapshot.pop("process", {})
+                        snapshot["process"] = {k: v for k, v in process.items() if k.endswith("_total")}
+                        _merge(retired, snapshot)
+                        dead.append(name)
+                if dead:
+                    with open(retired_path + ".tmp", "w") as f:
+                        json.dump(retired, f)
+                    os.replace(retired_path + ".tmp", retired_path)
+                    for name in dead:
+                        os.remove(os.path.join(self.directory, name))
+                _merge(total, retired)
+        except OSError:
+            total = self.snapshot()
+        return total
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def render(self):
+        """Prometheus text exposition (version 0.0.4) of collect()."""
+        data = self.collect()
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+        header("http_requests_total", "counter", "Requests handled, by route, method and status.")
+        for key, count in sorted(data.get("requests", {}).items()):
+            route, method, status = key.split("\t")
+            lines.append(f"{PREFIX}_http_requests_total{_labels(route=route, method=method, status=status)} {count}")
+
+        header("http_request_duration_seconds", "histogram", "Request latency up to the first response byte.")
+        for key, histogram in sorted(data.get("latency", {}).items()):
+            route, method = key.split("\t")
+            for bound, count in zip(LATENCY_BUCKETS, histogram):
+                labels = _labels(route=route, method=method, le=bound)
+                lines.append(f"{PREFIX}_http_request_duration_seconds_bucket{labels} {count}")
+            labels = _labels(route=route, method=method, le="+Inf")
+            lines.append(f"{PREFIX}_http_request_duration_seconds_bucket{labels} {histogram[-2]}")
+            labels = _labels(route=route, method=method)
+            lines.append(f"{PREFIX}_http_request_duration_seconds_count{labels} {histogram[-2]}")
+            lines.append(f"{PREFIX}_http_request_duration_seconds_sum{labels} {histogram[-1]:.6f}")
+
+        sql = sorted(data.get("sql", {}).items())
+        header("sql_statements_total", "counter", "SQL statements executed while handling requests.")
+        for key, (count, _) in sql:
+            route, method = key.split("\t")
+            lines.append(f"{PREFIX}_sql_statements_total{_labels(route=route, method=method)} {count}")
+        header("sql_seconds_total", "counter", "Time spent executing SQL and fetching rows.")
+        for key, (_, seconds) in sql:
+            route, method = key.split("\t")
+            lines.append(f"{PREFIX}_sql_seconds_total{_labels(route=route, method=method)} {seconds:.6f}")
+
+        header("bcrypt_seconds_total", "counter", "Time requests spent waiting on password hashing.")
+        for key, seconds in sorted(data.get("bcrypt", {}).items()):
+            route, method = key.split("\t")
+            lines.append(f"{PREFIX}_bcrypt_seconds_total{_labels(route=route, method=method)} {seconds:.6f}")
+
+        for name, value in sorted(data.get("process", {}).items()):
+            if name.endswith("_total"):
+                header(name, "counter", "Summed over all workers, including exited ones.")
+            else:
+                header(name, "gauge", "Summed over live workers.")
+            lines.append(f"{PREFIX}_{name} {value}")
+
+        return "\n".join(lines) + "\n"
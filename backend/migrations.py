@@ -0,0 +1,209 @@
+"""
+Versioned schema migrations.
+
+Each migration runs exactly once per database, in order, and records its
+number in `schema_version`. Every gunicorn worker calls migrate() at
+import; when the database is already current that is a single SELECT.
+Otherwise the first worker takes an EXCLUSIVE lock, applies whatever is
+pending inside that one transaction and commits; the others wait on the
+lock, re-check the version and find nothing left to do.
+
+Migrations that predate this table are written to be idempotent, so an
+existing database without `schema_version` is simply brought up to date.
+New migrations go at the end of MIGRATIONS and must never be renumbered.
+
+    python migrations.py            # show the current version
+    python migrations.py migrate    # apply pending migrations
+"""
+import logging
+import os
+import sys
+
+import analytics
+import booking_events
+import booking_jobs
+import booking_search
+import booking_times
+import calendar_view
+import conflicts
+import data_versions
+import db_pool
+import principal_cache
+
+# How long a worker waits for another one to finish migrating
+LOCK_TIMEOUT_MS = int(os.environ.get("MIGRATION_LOCK_TIMEOUT_MS", 120000))
+
+
+def _base_tables(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE,
+        password TEXT,
+        role TEXT CHECK(role IN ('student','teacher','hod')),
+        name TEXT,
+        department TEXT,
+        department_id INTEGER
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS resources (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        type TEXT CHECK(type IN ('seminar','auditorium','lab')),
+        capacity INTEGER
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS bookings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        resource_id INTEGER,
+        title TEXT,
+        date TEXT,
+        start_time TEXT,
+        end_time TEXT,
+        purpose TEXT,
+        status TEXT CHECK(status IN ('pending','approved','rejected','cancelled','conducted')) DEFAULT 'pending',
+        created_at TEXT DEFAULT (datetime('now')),
+        FOREIGN KEY(user_id) REFERENCES users(id),
+        FOREIGN KEY(resource_id) REFERENCES resources(id)
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS departments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT
+    )
+    """)
+
+
+def _reference_data(cur):
+    """Bookable halls and departments; the app is unusable without them."""
+    cur.execute("SELECT COUNT(*) FROM resources")
+    if cur.fetchone()[0] == 0:
+        cur.executemany(
+            "INSERT INTO resources (name, type, capacity) VALUES (?, ?, ?)",
+            [
+                ("Seminar Hall", "seminar", 100),
+                ("Auditorium", "auditorium", 500),
+                ("Lab", "lab", 30),
+            ],
+        )
+    cur.execute("SELECT COUNT(*) FROM departments")
+    if cur.fetchone()[0] == 0:
+        cur.executemany(
+            "INSERT INTO departments (name) VALUES (?)",
+            [
+                ("Computer Science",),
+                ("Electronics",),
+                ("Mechanical",),
+            ],
+        )
+
+
+def _expired_status(cur):
+    """Allow status 'expired' (pending requests whose day has passed).
+
+    SQLite cannot alter a CHECK constraint, and copying the table would
+    drop every trigger built on it. Accepting one more value leaves all
+    stored rows valid, so the table's SQL is edited in place, as the
+    SQLite ALTER TABLE documentation describes for loosening constraints.
+    """
+    cur.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='bookings'")
+    sql = cur.fetchone()[0]
+    old = "CHECK(status IN ('pending','approved','rejected','cancelled','conducted'))"
+    if old not in sql:
+        return
+    cur.execute("PRAGMA schema_version")
+    schema_version = cur.fetchone()[0]
+    cur.execute("PRAGMA writable_schema = ON")
+    try:
+        cur.execute(
+            "UPDATE sqlite_master SET sql = ? WHERE type='table' AND name='bookings'",
+            (sql.replace(old, "CHECK(status IN ('pending','approved','rejected','cancelled','conducted','expired'))"),),
+        )
+        # Makes every open connection re-read the schema
+        cur.execute(f"PRAGMA schema_version = {schema_version + 1}")
+    finally:
+        cur.execute("PRAGMA writable_schema = OFF")
+
+
+MIGRATIONS = [
+    (1, "base tables", _base_tables),
+    (2, "reference data", _reference_data),
+    (3, "conflict index and slot versions", conflicts.ensure_schema),
+    (4, "data version counters", data_versions.ensure_schema),
+    (5, "booking event log", booking_events.ensure_schema),
+    (6, "integer time columns", booking_times.ensure_schema),
+    (7, "utilization summary tables", analytics.ensure_schema),
+    (8, "calendar read model", calendar_view.ensure_schema),
+    (9, "booking full-text search", booking_search.ensure_schema),
+    (10, "booking archive and status jobs", booking_jobs.ensure_schema),
+    (11, "expired booking status", _expired_status),
+    (12, "no stream events for job status changes", booking_events.quiet_job_statuses),
+    (13, "utilization follows users across departments", analytics.ensure_user_triggers),
+    (14, "principal cache version", principal_cache.ensure_schema),
+    (15, "booking versions follow requester changes", data_versions.ensure_user_triggers),
+]
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def current_version(cur):
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='schema_version'")
+    if cur.fetchone() is None:
+        return 0
+    cur.execute("SELECT MAX(version) FROM schema_version")
+    return cur.fetchone()[0] or 0
+
+
+def migrate(conn, migrations=MIGRATIONS):
+    """Apply pending migrations; returns the versions applied (usually none)."""
+    cur = conn.cursor()
+    if current_version(cur) >= migrations[-1][0]:
+        return []
+
+    cur.execute(f"PRAGMA busy_timeout = {LOCK_TIMEOUT_MS}")
+    try:
+        cur.execute("BEGIN EXCLUSIVE")
+        try:
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT DEFAULT (datetime('now'))
+            )
+            """)
+            # Another worker may have migrated while we waited for the lock
+            version = current_version(cur)
+            applied = []
+            for number, name, step in migrations:
+                if number <= version:
+                    continue
+                logging.info("Applying migration %d: %s", number, name)
+                step(cur)
+                cur.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (number, name))
+                applied.append(number)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        cur.execute(f"PRAGMA busy_timeout = {db_pool.BUSY_TIMEOUT_MS}")
+    return applied
+
+
+def main(argv):
+    # Same default as app.DB_PATH, without importing the app (which migrates)
+    path = os.environ.get("DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "college_booking.db"))
+    conn = db_pool.ConnectionPool(path).acquire()
+    if argv[1:2] == ["migrate"]:
+        print("applied:", migrate(conn) or "nothing")
+    print(f"{path}: schema version {current_version(conn.cursor())} (latest {LATEST})")
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
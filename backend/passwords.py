@@ -0,0 +1,167 @@
+"""
+Password hashing with a host-wide limit.
+
+bcrypt is meant to be slow, and a sync gunicorn worker is held for the
+whole hash whichever thread runs it, so hashing happens in the request
+thread. What protects booking traffic during a login storm is how many
+hashes may run at all: at most BCRYPT_SLOTS at once across every worker
+on the host (one per core by default), with at most BCRYPT_MAX_QUEUE
+more waiting for a slot. Anything beyond that fails fast with HasherBusy
+(answered with a 503) instead of tying up one more worker behind the
+storm. Both counts are sets of flock'd files, `<path>.run.N` and
+`<path>.queue.N`; a slot is freed when its holder closes the file or exits.
+"""
+import fcntl
+import os
+import random
+import threading
+import time
+
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+BCRYPT_SLOTS = int(os.environ.get("BCRYPT_SLOTS", os.cpu_count() or 1))
+BCRYPT_MAX_QUEUE = int(os.environ.get("BCRYPT_MAX_QUEUE", 16))
+# How often a queued hash looks for a free slot
+SLOT_POLL_SECONDS = 0.005
+
+
+class HasherBusy(Exception):
+    """Raised when the bcrypt queue is full; callers should answer 503."""
+
+
+def is_bcrypt_hash(value):
+    return bool(value) and value.startswith(("$2a$", "$2b$", "$2y$"))
+
+
+def hash_cost(hashed):
+    """Cost factor encoded in a bcrypt hash ('$2b$12$...' -> 12)."""
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+class HostSlots:
+    """Counting semaphore shared by every process on the host: `count`
+    files, each held by at most one open file via flock."""
+
+    def __init__(self, path, count):
+        self.paths = [f"{path}.{i}" for i in range(count)]
+
+    def try_acquire(self):
+        """An open file holding a slot (close it to release), or None."""
+        if not self.paths:
+            return None
+        start = random.randrange(len(self.paths))  # spread callers over the files
+        for path in self.paths[start:] + self.paths[:start]:
+            slot = open(path, "a")
+            try:
+                fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                slot.close()
+                continue
+            return slot
+        return None
+
+    def acquire(self):
+        while True:
+            slot = self.try_acquire()
+            if slot is not None:
+                return slot
+            time.sleep(SLOT_POLL_SECONDS)
+
+
+class PasswordHasher:
+    def __init__(self, rounds=BCRYPT_ROUNDS, lock_path=None, slots=BCRYPT_SLOTS, max_queue=BCRYPT_MAX_QUEUE):
+        """Without lock_path there is no limit."""
+        self.rounds = rounds
+        self._run_slots = self._queue_slots = None
+        if lock_path and slots > 0:
+            self._run_slots = HostSlots(lock_path + ".run", slots)
+            self._queue_slots = HostSlots(lock_path + ".queue", max_queue)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._busy_seconds = 0.0
+        self._wait_seconds = 0.0
+        self._observers = []
+
+    def add_observer(self, observer):
+        """Call observer(seconds) after each hash or verify, with the time
+        it took including any wait for a slot."""
+        self._observers.append(observer)
+
+    def _run(self, fn, *args):
+        queued_at = time.perf_counter()
+        slot = ticket = None
+        try:
+            if self._run_slots is not None:
+                slot = self._run_slots.try_acquire()
+                if slot is None:
+                    ticket = self._queue_slots.try_acquire()
+                    if ticket is None:
+                        with self._lock:
+                            self._rejected += 1
+                        raise HasherBusy("Password hashing queue is full")
+                    with self._lock:
+                        self._waiting += 1
+                    try:
+                        slot = self._run_slots.acquire()
+                    finally:
+                        ticket.close()  # no longer waiting
+                        with self._lock:
+                            self._waiting -= 1
+            started = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                self._wait_seconds += started - queued_at
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+                    self._busy_seconds += time.perf_counter() - started
+        finally:
+            if slot is not None:
+                slot.close()
+            elapsed = time.perf_counter() - queued_at
+            for observer in self._observers:
+                observer(elapsed)
+
+    def hash(self, password):
+        return self._run(self._hash, password)
+
+    def hash_many(self, passwords):
+        """Hash without the slot limit, for startup and scripts (e.g. seeding
+        demo accounts) that must not fail because logins are busy."""
+        return [self._hash(p) for p in passwords]
+
+    def verify(self, password, hashed):
+        return self._run(self._verify, password, hashed)
+
+    def needs_rehash(self, hashed):
+        return not is_bcrypt_hash(hashed) or hash_cost(hashed) < self.rounds
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rounds": self.rounds,
+                "queue_depth": self._waiting,
+                "running": self._running,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "busy_seconds": round(self._busy_seconds, 3),
+                "wait_seconds": round(self._wait_seconds, 3),
+            }
+
+    def _hash(self, password):
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return bcrypt.hashpw(password.encode("utf-8"), salt).decode("utf-8")
+
+    @staticmethod
+    def _verify(password, hashed):
+        return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
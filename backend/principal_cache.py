@@ -0,0 +1,138 @@
+"""
+Authenticated-principal cache.
+
+Maps a bearer token to the user row it resolved to, so hot sessions skip
+both the JWT decode and the users lookup. Entries live for at most
+PRINCIPAL_CACHE_TTL seconds (and never past the token's own expiry) and
+the cache is LRU-bounded.
+
+Changes that alter a cached row - a user's login, role, name or
+department being edited, or the user being deleted - bump the
+`principals` counter in data_versions through triggers, whichever worker
+or script made them. Each worker reads that counter at most once every
+PRINCIPAL_CACHE_CHECK seconds and drops all its entries when it has
+moved, so hot sessions cost no database work at all in between.
+Signups and password rehashes do not touch the counter, so login and
+registration storms leave the cache alone.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import data_versions
+
+MAX_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", 2048))
+TTL_SECONDS = float(os.environ.get("PRINCIPAL_CACHE_TTL", 60))
+# How stale a role or department change may be seen by a worker
+CHECK_SECONDS = float(os.environ.get("PRINCIPAL_CACHE_CHECK", 1))
+
+_BUMP = ("INSERT INTO data_versions (name, version) VALUES ('principals', 1) "
+         "ON CONFLICT(name) DO UPDATE SET version = version + 1;")
+
+SCHEMA = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_users_principals_update
+    AFTER UPDATE OF username, role, name, department, department_id ON users
+    BEGIN
+        {_BUMP}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_users_principals_delete
+    AFTER DELETE ON users
+    BEGIN
+        {_BUMP}
+    END
+    """,
+]
+
+
+def ensure_schema(cur):
+    for stmt in SCHEMA:
+        cur.execute(stmt)
+
+
+def version(cur):
+    """Current value of the principals counter."""
+    return data_versions.version(cur, "principals")
+
+
+class PrincipalCache:
+    def __init__(self, max_size=MAX_SIZE, ttl=TTL_SECONDS, check_interval=CHECK_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._entries = OrderedDict()  # token -> (expires_at, row)
+        self._lock = threading.Lock()
+        self._version = None
+        self._generation = 0  # bumped whenever the entries are dropped
+        self._checked_at = float("-inf")
+        self._hits = 0
+        self._misses = 0
+        self._checks = 0
+
+    def check(self, read_version):
+        """Re-read the principals counter with read_version() if the last
+        check is older than check_interval; drop everything if it moved."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now  # other threads keep serving meanwhile
+        try:
+            current = read_version()
+        except Exception:
+            with self._lock:
+                self._checked_at = float("-inf")
+            raise
+        with self._lock:
+            self._checks += 1
+            if current != self._version:
+                self._version = current
+                self._generation += 1
+                self._entries.clear()
+
+    def generation(self):
+        """Take before reading a row to put(), so a row read before a
+        change that check() has since seen is not cached."""
+        with self._lock:
+            return self._generation
+
+    def get(self, token):
+        """Return the cached user row for token, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self._misses += 1
+                return None
+            if entry[0] <= now:
+                del self._entries[token]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, token, row, generation, token_exp=None):
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries.pop(token, None)
+            self._entries[token] = (expires_at, row)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self._hits, "misses": self._misses,
+                    "checks": self._checks}
@@ -0,0 +1,330 @@
+"""
+Rate limiting and load shedding shared by every worker on the host.
+
+Gunicorn workers share nothing, so a limit kept in one worker's memory
+is multiplied by the worker count and reset by every restart. Instead the
+state lives in a small file mapped into every worker (`<db>-ratelimit`):
+
+- Token buckets. Each Rule is a budget such as "10/minute" charged per
+  client IP or per signed-in user, for every /api route or only some. A
+  bucket holds up to that many tokens and refills at that rate; a request
+  takes one token from every bucket that applies, or is refused (429)
+  with the wait until the emptiest one has a token again. Buckets live in
+  a fixed open-addressed table keyed by a hash of (rule, client); when a
+  probe run is full the least recently used bucket is recycled.
+- In-flight counts. Expensive classes of request (bcrypt logins, full
+  calendar reads) are counted per worker process; when the host-wide
+  total reaches the class limit the request is shed at once (503) rather
+  than queueing behind the others and tying up yet another worker.
+  Counts left by a worker that died are dropped the next time the limit
+  is hit.
+
+Every operation takes an flock on the file, held for a few microseconds.
+"""
+import atexit
+import contextlib
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+BUCKETS = int(os.environ.get("RATE_LIMIT_BUCKETS", 16384))
+# Linear probe length before a bucket is recycled
+PROBES = 8
+# Worker processes that can hold in-flight counts at once
+WORKER_SLOTS = 128
+CLASSES = 8
+
+_MAGIC = b"rlimit01"
+_HEADER = struct.Struct("<8sII")
+_BUCKET = struct.Struct("<Qdd")  # key hash (0 = free), tokens, last update
+_WORKER = struct.Struct("<q%di" % CLASSES)  # pid (0 = free), in-flight per class
+_PERIODS = {"second": 1.0, "minute": 60.0, "hour": 3600.0, "day": 86400.0}
+
+
+def parse_limit(limit):
+    """'10/minute' -> (10, 60.0); '', '0' or 'off' -> None (no limit)."""
+    limit = (limit or "").strip().lower()
+    if limit in ("", "0", "off", "none"):
+        return None
+    count, _, period = limit.partition("/")
+    period = period.strip() or "second"
+    if period.endswith("s"):
+        period = period[:-1]
+    if period not in _PERIODS:
+        raise ValueError(f"bad rate limit {limit!r}: period must be one of {', '.join(_PERIODS)}")
+    count = int(count)
+    return (count, _PERIODS[period]) if count > 0 else None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Rule:
+    """A budget of `limit` ("<count>/<period>") per client.
+
+    scope is "ip" (charged to the client address), "user" (charged to
+    the signed-in user; anonymous requests skip the rule) or "anonymous"
+    (charged to the client address of anonymous requests only). routes limits
+    the rule to those Flask URL rules; None means every route.
+    """
+
+    def __init__(self, name, limit, scope="ip", routes=None):
+        if scope not in ("ip", "user", "anonymous"):
+            raise ValueError(f"bad rate limit scope {scope!r}")
+        self.name = name
+        self.scope = scope
+        self.routes = frozenset(routes) if routes is not None else None
+        parsed = parse_limit(limit)
+        self.burst, period = parsed if parsed else (0, 1.0)
+        self.rate = self.burst / period
+
+    def applies(self, route):
+        return self.burst > 0 and (self.routes is None or route in self.routes)
+
+
+class RateLimiter:
+    def __init__(self, path, rules, inflight_limits=None, enabled=True):
+        """inflight_limits maps a request class name to how many such
+        requests may run at once across all workers (0 = unlimited)."""
+        self.path = path
+        self.rules = list(rules)
+        self.enabled = enabled
+        self.inflight_limits = dict(inflight_limits or {})
+        if len(self.inflight_limits) > CLASSES:
+            raise ValueError(f"at most {CLASSES} request classes")
+        self._class_index = {name: i for i, name in enumerate(self.inflight_limits)}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._map = None
+        self._slot = None
+        self._limited = {rule.name: 0 for rule in self.rules}
+        self._shed = {name: 0 for name in self.inflight_limits}
+        self._errors = 0
+        atexit.register(self._release_slot)
+
+    # -- shared file --
+
+    def _size(self):
+        return _HEADER.size + BUCKETS * _BUCKET.size + WORKER_SLOTS * _WORKER.size
+
+    def _open(self):
+        """Map the shared file in this process (again after a fork: an
+        inherited descriptor would share the parent's flock)."""
+        if self._pid == os.getpid():
+            return
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                size = self._size()
+                header = os.pread(fd, _HEADER.size, 0)
+                if os.fstat(fd).st_size != size or header != _HEADER.pack(_MAGIC, BUCKETS, WORKER_SLOTS):
+                    # New file, or laid out by a different configuration: start empty
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, size)
+                    os.pwrite(fd, _HEADER.pack(_MAGIC, BUCKETS, WORKER_SLOTS), 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            shared = mmap.mmap(fd, size)
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd, self._map, self._slot = fd, shared, None
+        self._pid = os.getpid()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """This process's lock plus the file lock."""
+        with self._lock:
+            self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    # -- token buckets --
+
+    @staticmethod
+    def _key(rule, client):
+        digest = hashlib.blake2b(f"{rule.name}\0{client}".encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1
+
+    def _find(self, key):
+        """Offset of key's bucket, claiming (and emptying) one if it has none."""
+        start = key % BUCKETS
+        oldest = oldest_at = None
+        for i in range(PROBES):
+            offset = _HEADER.size + ((start + i) % BUCKETS) * _BUCKET.size
+            stored, _, updated = _BUCKET.unpack_from(self._map, offset)
+            if stored == key:
+                return offset, True
+            if stored == 0:
+                return offset, False
+            if oldest is None or updated < oldest_at:
+                oldest, oldest_at = offset, updated
+        return oldest, False
+
+    def check(self, route, ip, user_id=None):
+        """Charge the request to every applicable bucket.
+
+        Returns None if it may proceed, else (rule name, seconds to wait).
+        Nothing is charged for a refused request.
+        """
+        if not self.enabled:
+            return None
+        charges = []
+        for rule in self.rules:
+            if not rule.applies(route):
+                continue
+            if rule.scope == "user":
+                client = user_id
+            elif rule.scope == "anonymous":
+                client = ip if user_id is None else None
+            else:
+                client = ip
+            if client is None:
+                continue
+            charges.append((rule, self._key(rule, client)))
+        if not charges:
+            return None
+
+        try:
+            with self._locked():
+                now = time.time()
+                updates, refused = [], None
+                for rule, key in charges:
+                    offset, found = self._find(key)
+                    if found:
+                        _, tokens, updated = _BUCKET.unpack_from(self._map, offset)
+                        tokens = min(rule.burst, tokens + max(0.0, now - updated) * rule.rate)
+                    else:
+                        tokens = float(rule.burst)
+                    if tokens < 1.0:
+                        wait = (1.0 - tokens) / rule.rate
+                        if refused is None or wait > refused[1]:
+                            refused = (rule.name, wait)
+                    updates.append((offset, key, tokens))
+                if refused is None:
+                    for offset, key, tokens in updates:
+                        _BUCKET.pack_into(self._map, offset, key, tokens - 1.0, now)
+        except OSError:
+            # Never turn a problem with the shared file into failed requests
+            with self._lock:
+                self._errors += 1
+            return None
+        if refused is not None:
+            with self._lock:
+                self._limited[refused[0]] += 1
+        return refused
+
+    # -- in-flight counts --
+
+    def _slot_offset(self, index):
+        return _HEADER.size + BUCKETS * _BUCKET.size + index * _WORKER.size
+
+    def _claim_slot(self):
+        """This process's worker slot (caller holds the lock), or None."""
+        if self._slot is not None:
+            return self._slot
+        pid = os.getpid()
+        free = None
+        for i in range(WORKER_SLOTS):
+            owner = _WORKER.unpack_from(self._map, self._slot_offset(i))[0]
+            if owner == pid:
+                free = i
+                break
+            if free is None and (owner == 0 or not _pid_alive(owner)):
+                free = i
+        if free is not None:
+            _WORKER.pack_into(self._map, self._slot_offset(free), pid, *([0] * CLASSES))
+            self._slot = free
+        return self._slot
+
+    def _inflight(self, index, prune=False):
+        start = self._slot_offset(0)
+        total = 0
+        for i, slot in enumerate(_WORKER.iter_unpack(self._map[start:start + WORKER_SLOTS * _WORKER.size])):
+            if slot[0] == 0:
+                continue
+            if prune and i != self._slot and not _pid_alive(slot[0]):
+                _WORKER.pack_into(self._map, self._slot_offset(i), 0, *([0] * CLASSES))
+                continue
+            total += slot[1 + index]
+        return total
+
+    def admit(self, name):
+        """Count one request of class `name` in flight, or return False
+        (shed it) if the class is at its limit. Every True must be paired
+        with release(name)."""
+        limit = self.inflight_limits.get(name, 0)
+        if not self.enabled or limit <= 0:
+            return True
+        index = self._class_index[name]
+        try:
+            with self._locked():
+                slot = self._claim_slot()
+                if slot is None:
+                    return True  # more live workers than slots: do not shed
+                if self._inflight(index) >= limit and self._inflight(index, prune=True) >= limit:
+                    admitted = False
+                else:
+                    offset = self._slot_offset(slot) + 8 + 4 * index
+                    struct.pack_into("<i", self._map, offset, struct.unpack_from("<i", self._map, offset)[0] + 1)
+                    admitted = True
+        except OSError:
+            with self._lock:
+                self._errors += 1
+            return True
+        if not admitted:
+            with self._lock:
+                self._shed[name] += 1
+        return admitted
+
+    def release(self, name):
+        index = self._class_index.get(name)
+        if index is None or not self.enabled:
+            return
+        try:
+            with self._locked():
+                if self._slot is None:
+                    return
+                offset = self._slot_offset(self._slot) + 8 + 4 * index
+                count = struct.unpack_from("<i", self._map, offset)[0]
+                struct.pack_into("<i", self._map, offset, max(0, count - 1))
+        except OSError:
+            with self._lock:
+                self._errors += 1
+
+    def _release_slot(self):
+        """At exit: hand this worker's slot back."""
+        if self._pid != os.getpid() or self._slot is None:
+            return
+        try:
+            with self._locked():
+                _WORKER.pack_into(self._map, self._slot_offset(self._slot), 0, *([0] * CLASSES))
+                self._slot = None
+        except (OSError, ValueError):
+            pass
+
+    def stats(self):
+        with self._lock:
+            return {"limited": dict(self._limited), "shed": dict(self._shed), "errors": self._errors}
+
+
+def retry_after(seconds):
+    """Retry-After header value (whole seconds, at least 1)."""
+    return str(max(1, math.ceil(seconds)))
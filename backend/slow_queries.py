@@ -0,0 +1,193 @@
+"""
+Slow-query log.
+
+Registered as a statement observer on the connection pool: any statement
+whose execute-plus-fetch time reaches the threshold is appended to a
+JSONL file with its normalized SQL, the shape of its parameters, the
+number of rows and the `EXPLAIN QUERY PLAN` output, so a query that has
+fallen back to a full scan shows up with the scan in its plan.
+
+    python slow_queries.py [log] [--top N] [--route /api/...]
+
+summarizes the log, worst total time first.
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+PLAN_TTL_SECONDS = 60
+# Statements EXPLAIN QUERY PLAN has something to say about
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(sql):
+    """Collapse whitespace and literals so one query shape is one entry:
+    "WHERE id IN (1, 2, 3) AND name = 'x'" -> "WHERE id IN (?, ...) AND name = ?"
+    """
+    sql = _SPACE.sub(" ", sql).strip()
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    return _LIST.sub("(?, ...)", sql)
+
+
+def param_shape(params):
+    """Types of the bound parameters, never their values."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {k: type(v).__name__ for k, v in params.items()}
+    names = [type(v).__name__ for v in params]
+    if len(names) <= 8:
+        return names
+    counts = {}
+    for name in names:
+        counts[name] = counts.get(name, 0) + 1
+    return [f"{name} x {count}" for name, count in counts.items()]
+
+
+def is_full_scan(plan):
+    """SCAN walks a whole table or index (only a LIMIT stops it early);
+    SEARCH jumps straight to the matching rows."""
+    return any(step.lstrip().startswith("SCAN ") for step in plan or ())
+
+
+class SlowQueryLog:
+    def __init__(self, path, db_path, threshold_ms, context=None):
+        self.path = path
+        self.db_path = db_path
+        self.threshold = threshold_ms / 1000.0
+        self.context = context
+        self._local = threading.local()
+        self._plans = {}
+
+    def observe(self, sql, params, seconds, rows):
+        if seconds < self.threshold or getattr(self._local, "busy", False):
+            return
+        self._local.busy = True
+        try:
+            normalized = normalize(sql)
+            entry = {
+                "ts": round(time.time(), 3),
+                "pid": os.getpid(),
+                "ms": round(seconds * 1000, 3),
+                "rows": rows,
+                "sql": normalized,
+                "params": param_shape(params),
+                "plan": self._plan(sql, params, normalized),
+            }
+            if self.context:
+                entry["route"] = self.context()
+            line = json.dumps(entry, separators=(",", ":")) + "\n"
+            # O_APPEND keeps lines from different workers whole
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode("utf-8"))
+            finally:
+                os.close(fd)
+        except Exception:
+            pass  # logging must never fail the query it is logging
+        finally:
+            self._local.busy = False
+
+    def _plan(self, sql, params, normalized):
+        if params is None or not sql.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+        cached = self._plans.get(normalized)
+        if cached and time.monotonic() - cached[0] < PLAN_TTL_SECONDS:
+            return cached[1]
+        # A connection of our own: the caller's may be mid-transaction
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        try:
+            rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        except sqlite3.Error as e:
+            return [f"EXPLAIN failed: {e}"]
+        depth = {0: 0}
+        plan = []
+        for node, parent, _, detail in rows:
+            depth[node] = depth.get(parent, 0) + 1
+            plan.append("  " * (depth[node] - 1) + detail)
+        self._plans[normalized] = (time.monotonic(), plan)
+        return plan
+
+
+def summarize(entries, top=20):
+    """Per normalized statement: count, total/max ms, rows, plan flags."""
+    groups = {}
+    for entry in entries:
+        group = groups.setdefault(entry["sql"], {
+            "sql": entry["sql"], "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+            "rows": 0, "routes": set(), "plan": None,
+        })
+        group["count"] += 1
+        group["total_ms"] += entry["ms"]
+        group["max_ms"] = max(group["max_ms"], entry["ms"])
+        group["rows"] += entry.get("rows") or 0
+        if entry.get("route"):
+            group["routes"].add(entry["route"])
+        if entry.get("plan"):
+            group["plan"] = entry["plan"]  # latest wins
+    worst = sorted(groups.values(), key=lambda g: g["total_ms"], reverse=True)[:top]
+    for group in worst:
+        group["routes"] = sorted(group["routes"])
+        group["full_scan"] = is_full_scan(group["plan"])
+        group["temp_btree"] = any("TEMP B-TREE" in step for step in group["plan"] or ())
+    return worst
+
+
+def read_log(path, route=None, since=None):
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if route and entry.get("route") != route:
+                continue
+            if since and entry["ts"] < since:
+                continue
+            yield entry
+
+
+def main(argv=None):
+    default = os.environ.get("SLOW_QUERY_LOG") or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "college_booking.db-slow-queries.jsonl")
+    parser = argparse.ArgumentParser(prog="slow_queries.py", description="Summarize the slow-query log")
+    parser.add_argument("log", nargs="?", default=default)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--route", help="only statements run by this route")
+    parser.add_argument("--hours", type=float, help="only the last N hours")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    since = time.time() - args.hours * 3600 if args.hours else None
+    worst = summarize(read_log(args.log, args.route, since), args.top)
+    if args.json:
+        print(json.dumps(worst, indent=2))
+        return 0
+    for group in worst:
+        flags = [f for f in ("full_scan", "temp_btree") if group[f]]
+        print(f"{group['total_ms']:10.1f} ms total  {group['count']:6d}x  max {group['max_ms']:.1f} ms  "
+              f"avg rows {group['rows'] / group['count']:.0f}  {' '.join(flags)}")
+        print(f"    {group['sql'][:300]}")
+        if group["routes"]:
+            print(f"    routes: {', '.join(group['routes'])}")
+        for step in group["plan"] or ():
+            print(f"    | {step}")
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Shared fixtures. app.py is imported once per session, against a fresh
+database in a temporary directory with the demo accounts seeded. Tests
+book on their own future weekdays (the `new_day` fixture), so they do
+not see each other's bookings.
+"""
+import itertools
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp = tempfile.mkdtemp(prefix="bookmycampus-tests-")
+os.environ["DB_PATH"] = os.path.join(_tmp, "test.db")
+os.environ["SEED_DEMO_DATA"] = "1"
+os.environ["RATE_LIMIT"] = "0"
+os.environ["BOOKING_JOBS_INTERVAL"] = "0"
+os.environ["BCRYPT_ROUNDS"] = "4"
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    import app
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def _headers(app_module, username):
+    conn = app_module.db_conn()
+    user_id = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()[0]
+    conn.close()
+    return {"Authorization": "Bearer " + app_module.generate_token(user_id)}
+
+
+@pytest.fixture(scope="session")
+def student(app_module):
+    return _headers(app_module, "student@college.edu")
+
+
+@pytest.fixture(scope="session")
+def teacher(app_module):
+    return _headers(app_module, "teacher@college.edu")
+
+
+@pytest.fixture(scope="session")
+def hod(app_module):
+    return _headers(app_module, "hod@college.edu")
+
+
+@pytest.fixture(scope="session")
+def new_day():
+    """Callable returning a future weekday (YYYY-MM-DD) not handed out before."""
+    days = (date(2031, 1, 1) + timedelta(days=i) for i in itertools.count())
+    weekdays = (d.isoformat() for d in days if d.weekday() < 5)
+    return lambda: next(weekdays)
+
+
+def booking_body(day, start, end, resource="Seminar Hall", title="Test booking"):
+    return {"title": title, "resource": resource, "start": f"{day}T{start}:00",
+            "end": f"{day}T{end}:00", "purpose": "Tests"}
+
+
+@pytest.fixture
+def book(client, student):
+    """book(day, start, end, resource=..., headers=...) -> response of POST /api/bookings"""
+    def book(day, start, end, resource="Seminar Hall", headers=None, title="Test booking"):
+        return client.post("/api/bookings", headers=headers or student,
+                           json=booking_body(day, start, end, resource, title))
+    return book
@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+import conflicts
+from conftest import booking_body
+
+
+def test_interval_set_is_half_open():
+    slots = conflicts.IntervalSet([(600, 660, 1), (720, 780, 2)])
+    assert slots.find(660, 720) is None  # the gap between them
+    assert slots.find(540, 600) is None  # ends where the first starts
+    assert slots.find(659, 661) == 1
+    assert slots.find(500, 800) in (1, 2)
+    assert slots.find(610, 620, ignore_id=1) is None
+    slots.add(660, 720, 3)
+    assert slots.find(700, 710) == 3
+    slots.remove(3)
+    assert slots.find(700, 710) is None
+
+
+@pytest.mark.parametrize("start, end", [
+    ("10:30", "11:30"),  # overlaps the end
+    ("09:30", "10:30"),  # overlaps the start
+    ("10:15", "10:45"),  # inside
+    ("09:00", "12:00"),  # around
+    ("10:00", "11:00"),  # the same slot
+])
+def test_overlapping_booking_is_refused(book, new_day, start, end):
+    day = new_day()
+    assert book(day, "10:00", "11:00").status_code == 201
+    assert book(day, start, end).status_code == 409
+
+
+def test_adjacent_bookings_are_admitted(book, new_day):
+    day = new_day()
+    assert book(day, "10:00", "11:00").status_code == 201
+    assert book(day, "11:00", "12:00").status_code == 201
+    assert book(day, "09:00", "10:00").status_code == 201
+
+
+def test_other_resource_is_independent(book, new_day):
+    day = new_day()
+    assert book(day, "10:00", "11:00").status_code == 201
+    assert book(day, "10:00", "11:00", resource="Lab").status_code == 201
+
+
+def test_cancelled_booking_frees_its_slot(client, student, book, new_day):
+    day = new_day()
+    booking_id = book(day, "10:00", "11:00").get_json()["id"]
+    response = client.patch(f"/api/bookings/{booking_id}", headers=student, json={"action": "cancel"})
+    assert response.status_code == 200
+    assert book(day, "10:30", "11:30").status_code == 201
+
+
+def test_approval_rechecks_conflicts(client, hod, book, new_day, app_module):
+    day = new_day()
+    first = book(day, "10:00", "11:00").get_json()["id"]
+    # A pending request that overlaps, written behind the API's back
+    conn = app_module.db_conn()
+    conn.execute("""
+        INSERT INTO bookings (user_id, resource_id, title, date, start_time, end_time, purpose, status)
+        SELECT user_id, resource_id, title, date, '10:30', '11:30', purpose, 'pending' FROM bookings WHERE id = ?
+    """, (first,))
+    second = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    conn.commit()
+    conn.close()
+    app_module.conflict_index.clear()
+
+    def decide(booking_id, action):
+        return client.patch(f"/api/bookings/{booking_id}", headers=hod, json={"action": action}).status_code
+
+    assert decide(first, "approve") == 409
+    assert decide(second, "reject") == 200
+    assert decide(first, "approve") == 200
+
+
+def test_concurrent_requests_for_one_slot_admit_one(app_module, student, new_day):
+    day = new_day()
+    statuses = []
+    barrier = threading.Barrier(8)
+
+    def attempt(i):
+        client = app_module.app.test_client()
+        barrier.wait()
+        response = client.post("/api/bookings", headers=student,
+                               json=booking_body(day, "10:00", f"11:{i:02d}"))
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=attempt, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(statuses) == [201] + [409] * 7
@@ -0,0 +1,104 @@
+import itertools
+import sqlite3
+
+import pytest
+
+import analytics
+import migrations
+
+_emails = (f"analytics{i}@college.edu" for i in itertools.count())
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "analytics.db")
+    migrations.migrate(conn)
+    conn.execute("INSERT INTO users (username, password, role, name, department_id) "
+                 "VALUES ('a@x.edu', 'x', 'student', 'A', 1), ('b@x.edu', 'x', 'teacher', 'B', 2)")
+    conn.executemany("""
+        INSERT INTO bookings (user_id, resource_id, title, date, start_time, end_time, purpose, status)
+        VALUES (?, ?, 'Stats test', ?, ?, ?, 'Tests', ?)
+    """, [
+        (1, 1, "2031-03-03", "09:30", "11:00", "approved"),
+        (1, 2, "2031-03-04", "14:00", "15:00", "pending"),
+        (2, 1, "2031-04-07", "10:00", "12:30", "approved"),
+    ])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def stats(conn):
+    return sorted(conn.execute("SELECT * FROM booking_stats WHERE bookings OR minutes").fetchall())
+
+
+def rebuilt_stats(conn):
+    conn.execute("SAVEPOINT check_stats")
+    analytics.rebuild(conn.cursor())
+    rows = stats(conn)
+    conn.execute("ROLLBACK TO check_stats")
+    conn.execute("RELEASE check_stats")
+    return rows
+
+
+def per_department(conn):
+    _, departments, _ = analytics.utilization(conn.cursor(), "2031-01", "2031-12")
+    return {department: counts for department, counts in departments.items() if any(
+        bookings or minutes for bookings, minutes in counts.values())}
+
+
+def test_hours_are_split(conn):
+    _, _, peaks = analytics.utilization(conn.cursor(), "2031-03", "2031-03")
+    # 09:30-11:00 on a Monday (strftime weekday 1): 30 minutes at 9, 60 at 10
+    assert peaks == {(1, 9): (1, 30), (1, 10): (0, 60)}
+
+
+def test_every_write_keeps_the_summary_exact(conn):
+    conn.execute("UPDATE bookings SET status = 'approved' WHERE id = 2")
+    conn.execute("UPDATE bookings SET start_time = '08:00' WHERE id = 1")
+    conn.execute("UPDATE bookings SET date = '2031-05-05' WHERE id = 3")
+    conn.execute("DELETE FROM bookings WHERE id = 2")
+    conn.execute("""
+        INSERT INTO bookings (user_id, resource_id, title, date, start_time, end_time, purpose, status)
+        VALUES (2, 3, 'Late', '2031-03-05', '16:45', '18:15', 'Tests', 'rejected')
+    """)
+    assert stats(conn) == rebuilt_stats(conn)
+
+
+def test_department_move_takes_the_bookings_along(conn):
+    before = per_department(conn)
+    assert set(before) == {1, 2}
+    conn.execute("UPDATE users SET department_id = 3 WHERE id = 1")
+    after = per_department(conn)
+    assert after == {2: before[2], 3: before[1]}
+    assert stats(conn) == rebuilt_stats(conn)
+
+
+def test_deleted_user_moves_to_department_zero(conn):
+    before = per_department(conn)
+    conn.execute("DELETE FROM users WHERE id = 2")
+    assert per_department(conn) == {0: before[2], 1: before[1]}
+    assert stats(conn) == rebuilt_stats(conn)
+
+
+def test_utilization_follows_a_department_change(client, hod, new_day, book, app_module):
+    response = client.post("/api/auth/signup", json={"email": next(_emails), "password": "secret1",
+                                                     "role": "teacher", "department_id": 1})
+    user_id = response.get_json()["user"]["id"]
+    headers = {"Authorization": "Bearer " + response.get_json()["token"]}
+    day = new_day()
+    booking_id = book(day, "10:00", "12:00", headers=headers).get_json()["id"]
+    assert client.patch(f"/api/bookings/{booking_id}", headers=hod, json={"action": "approve"}).status_code == 200
+
+    def booked_hours(department_id):
+        url = f"/api/analytics/utilization?from={day[:7]}&to={day[:7]}&department_id={department_id}"
+        departments = client.get(url, headers=hod).get_json()["departments"]
+        return sum(d["bookedHours"] for d in departments)
+
+    before = booked_hours(1), booked_hours(2)
+    conn = app_module.db_conn()
+    conn.execute("UPDATE users SET department_id = 2 WHERE id = ?", (user_id,))
+    conn.commit()
+    conn.close()
+    assert booked_hours(1) == pytest.approx(before[0] - 2)
+    assert booked_hours(2) == pytest.approx(before[1] + 2)
@@ -0,0 +1,153 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+import analytics
+import booking_jobs
+import migrations
+
+TODAY = date(2031, 3, 3)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "jobs.db")
+    migrations.migrate(conn)
+    conn.execute("INSERT INTO users (username, password, role, name, department_id) "
+                 "VALUES ('a@x.edu', 'x', 'student', 'A', 1), ('b@x.edu', 'x', 'teacher', 'B', 2)")
+    conn.executemany("""
+        INSERT INTO bookings (user_id, resource_id, title, date, start_time, end_time, purpose, status)
+        VALUES (?, ?, 'Job test', ?, ?, ?, 'Tests', ?)
+    """, [
+        (1, 1, "2030-01-07", "09:00", "10:30", "approved"),   # 1: long past
+        (2, 2, "2030-01-08", "10:00", "12:00", "pending"),    # 2
+        (1, 3, "2030-01-09", "14:00", "15:00", "rejected"),   # 3
+        (2, 1, "2031-02-24", "09:00", "11:00", "approved"),   # 4: last week
+        (1, 2, "2031-02-25", "13:00", "14:00", "pending"),    # 5
+        (2, 3, "2031-02-26", "08:00", "09:00", "cancelled"),  # 6
+        (1, 1, "2031-03-03", "09:00", "10:00", "approved"),   # 7: today
+        (2, 2, "2031-03-04", "09:00", "10:00", "pending"),    # 8: tomorrow
+    ])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def stats(conn):
+    return sorted(conn.execute("SELECT * FROM booking_stats WHERE bookings OR minutes").fetchall())
+
+
+def rebuilt_stats(conn):
+    conn.execute("SAVEPOINT check_stats")
+    analytics.rebuild(conn.cursor())
+    rows = stats(conn)
+    conn.execute("ROLLBACK TO check_stats")
+    conn.execute("RELEASE check_stats")
+    return rows
+
+
+def statuses(conn):
+    return dict(conn.execute("SELECT id, status FROM bookings").fetchall())
+
+
+def totals(conn):
+    """Bookings and minutes per status over the whole summary."""
+    return dict((status, (bookings, minutes)) for status, bookings, minutes in conn.execute(
+        "SELECT status, SUM(bookings), SUM(minutes) FROM booking_stats GROUP BY status"))
+
+
+def test_past_bookings_are_closed(conn):
+    today = booking_jobs.booking_times.day_number(TODAY)
+    assert booking_jobs.mark_conducted(conn, today, batch=1) == 2
+    assert booking_jobs.expire_pending(conn, today, batch=1) == 2
+    assert statuses(conn) == {1: "conducted", 2: "expired", 3: "rejected", 4: "conducted",
+                              5: "expired", 6: "cancelled", 7: "approved", 8: "pending"}
+    assert stats(conn) == rebuilt_stats(conn)
+
+
+def test_conducted_time_still_counts_as_booked(conn):
+    before = totals(conn)
+    booking_jobs.run_once(conn, today=TODAY, archive_after_days=0)
+    after = totals(conn)
+    assert after["conducted"] == (2, 210)
+    assert after["approved"] == (1, 60)
+    assert before["approved"] == (3, 270)
+    assert "conducted" in analytics.BOOKED_STATUSES
+
+
+def test_archiving_keeps_the_summary(conn):
+    booking_jobs.run_once(conn, today=TODAY, archive_after_days=0)
+    closed = stats(conn)
+
+    # A year's retention archives the 2030 bookings only
+    assert booking_jobs.run_once(conn, today=TODAY, archive_after_days=365, batch=2) == (0, 0, 3)
+    assert sorted(r[0] for r in conn.execute("SELECT id FROM bookings_archive")) == [1, 2, 3]
+    assert sorted(r[0] for r in conn.execute("SELECT id FROM bookings")) == [4, 5, 6, 7, 8]
+    assert stats(conn) == closed == rebuilt_stats(conn)
+
+    # Archived bookings are gone from the read model and the search index
+    assert conn.execute("SELECT COUNT(*) FROM calendar_events WHERE id IN (1, 2, 3)").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM bookings_fts WHERE rowid IN (1, 2, 3)").fetchone()[0] == 0
+
+
+def test_deleting_a_live_booking_still_counts(conn):
+    booking_jobs.run_once(conn, today=TODAY, archive_after_days=365)
+    conn.execute("DELETE FROM bookings WHERE id = 8")
+    conn.commit()
+    assert stats(conn) == rebuilt_stats(conn)
+
+
+def test_archived_bookings_follow_their_user(conn):
+    booking_jobs.run_once(conn, today=TODAY, archive_after_days=365)
+    conn.execute("UPDATE users SET department_id = 3 WHERE id = 1")
+    assert stats(conn) == rebuilt_stats(conn)
+    conn.execute("DELETE FROM users WHERE id = 2")
+    assert stats(conn) == rebuilt_stats(conn)
+
+
+def test_jobs_do_not_publish_events(conn):
+    events = conn.execute("SELECT COUNT(*) FROM booking_events").fetchone()[0]
+    booking_jobs.run_once(conn, today=TODAY, archive_after_days=365)
+    assert conn.execute("SELECT COUNT(*) FROM booking_events").fetchone()[0] == events
+
+
+def test_a_second_pass_changes_nothing(conn):
+    booking_jobs.run_once(conn, today=TODAY, archive_after_days=365)
+    closed = stats(conn)
+    assert booking_jobs.run_once(conn, today=TODAY, archive_after_days=365) == (0, 0, 0)
+    assert stats(conn) == closed
+
+
+def test_one_scheduler_leads(tmp_path):
+    lock = str(tmp_path / "jobs.lock")
+    first = booking_jobs.Scheduler(None, lock, interval=0)
+    second = booking_jobs.Scheduler(None, lock, interval=0)
+    assert first._lead()
+    assert not second._lead()
+    assert first.stats()["leader"] == 1 and second.stats()["leader"] == 0
+    first._lock_file.close()
+    assert second._lead()
+
+
+@pytest.mark.parametrize("final", ["conducted", "expired", "rejected", "cancelled"])
+def test_finished_booking_cannot_be_cancelled(client, student, hod, book, new_day, app_module, final):
+    booking_id = book(new_day(), "10:00", "11:00").get_json()["id"]
+    conn = app_module.db_conn()
+    conn.execute("UPDATE bookings SET status = ? WHERE id = ?", (final, booking_id))
+    conn.commit()
+    conn.close()
+    for headers in (student, hod):
+        response = client.patch(f"/api/bookings/{booking_id}", headers=headers, json={"action": "cancel"})
+        assert response.status_code == 400
+        assert response.get_json()["message"] == f"Booking already {final}"
+    conn = app_module.db_conn()
+    assert conn.execute("SELECT status FROM bookings WHERE id = ?", (booking_id,)).fetchone()[0] == final
+    conn.close()
+
+
+def test_archiving_is_off_by_default(conn):
+    assert booking_jobs.ARCHIVE_AFTER_DAYS == 0
+    assert booking_jobs.run_once(conn, today=TODAY) == (2, 2, 0)
+    assert conn.execute("SELECT COUNT(*) FROM bookings_archive").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM bookings").fetchone()[0] == 8
@@ -0,0 +1,100 @@
+import json
+
+from conftest import booking_body
+
+
+def bulk(client, headers, items, atomic=False):
+    url = "/api/bookings/bulk" + ("?atomic=1" if atomic else "")
+    return client.post(url, headers=headers, json=items)
+
+
+def count_bookings(app_module, day):
+    conn = app_module.db_conn()
+    count = conn.execute("SELECT COUNT(*) FROM bookings WHERE date = ?", (day,)).fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_items_conflicting_within_the_batch(client, student, new_day):
+    day = new_day()
+    response = bulk(client, student, [
+        booking_body(day, "10:00", "11:00"),
+        booking_body(day, "10:30", "11:30"),  # clashes with item 0
+        booking_body(day, "11:00", "12:00"),  # adjacent to item 0
+        booking_body(day, "10:00", "11:00", resource="Lab"),
+    ])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [r["status"] for r in body["results"]] == ["created", "conflict", "created", "created"]
+    assert body["results"][1]["message"] == "Conflicts with item 0 of this batch"
+    assert (body["created"], body["failed"]) == (3, 1)
+
+
+def test_batch_order_does_not_matter(client, student, new_day):
+    # Items are swept by start time, so the earlier slot wins wherever it is listed
+    day = new_day()
+    body = bulk(client, student, [
+        booking_body(day, "10:30", "11:30"),
+        booking_body(day, "10:00", "11:00"),
+    ]).get_json()
+    assert [r["status"] for r in body["results"]] == ["conflict", "created"]
+
+
+def test_items_conflicting_with_stored_bookings(client, student, book, new_day):
+    day = new_day()
+    assert book(day, "10:00", "11:00").status_code == 201
+    body = bulk(client, student, [
+        booking_body(day, "10:30", "11:30"),
+        booking_body(day, "11:00", "12:00"),
+    ]).get_json()
+    assert [r["status"] for r in body["results"]] == ["conflict", "created"]
+
+
+def test_created_ids_match_the_stored_bookings(client, student, app_module, new_day):
+    day = new_day()
+    items = [booking_body(day, f"{h:02d}:00", f"{h + 1:02d}:00", title=f"Bulk {h}") for h in (9, 11, 13)]
+    body = bulk(client, student, items).get_json()
+    conn = app_module.db_conn()
+    for item, result in zip(items, body["results"]):
+        title = conn.execute("SELECT title FROM bookings WHERE id = ?", (result["id"],)).fetchone()[0]
+        assert title == item["title"]
+    conn.close()
+
+
+def test_atomic_import_writes_nothing_on_failure(client, student, app_module, new_day):
+    day = new_day()
+    response = bulk(client, student, [
+        booking_body(day, "10:00", "11:00"),
+        booking_body(day, "10:30", "11:30"),
+        {"title": "missing fields"},
+    ], atomic=True)
+    assert response.status_code == 409
+    body = response.get_json()
+    assert [r["status"] for r in body["results"]] == ["skipped", "conflict", "invalid"]
+    assert (body["created"], body["failed"]) == (0, 2)
+    assert count_bookings(app_module, day) == 0
+
+
+def test_atomic_import_of_valid_items(client, student, app_module, new_day):
+    day = new_day()
+    response = bulk(client, student, [booking_body(day, "10:00", "11:00"), booking_body(day, "11:00", "12:00")],
+                    atomic=True)
+    assert response.status_code == 200
+    assert count_bookings(app_module, day) == 2
+
+
+def test_ndjson_lines(client, student, new_day):
+    day = new_day()
+    lines = [json.dumps(booking_body(day, "10:00", "11:00")), "not json", json.dumps(booking_body(day, "12:00", "13:00"))]
+    response = client.post("/api/bookings/bulk", headers=student, data="\n".join(lines) + "\n",
+                           content_type="application/x-ndjson")
+    assert [r["status"] for r in response.get_json()["results"]] == ["created", "invalid", "created"]
+
+
+def test_bad_requests(client, student, monkeypatch, app_module, new_day):
+    assert client.post("/api/bookings/bulk", json=[]).status_code == 401
+    assert client.post("/api/bookings/bulk", headers=student, json={"nope": 1}).status_code == 400
+    monkeypatch.setattr(app_module, "BULK_MAX_ITEMS", 1)
+    day = new_day()
+    items = [booking_body(day, "10:00", "11:00"), booking_body(day, "11:00", "12:00")]
+    assert bulk(client, student, items).status_code == 413
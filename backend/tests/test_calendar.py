@@ -0,0 +1,107 @@
+from datetime import date, timedelta
+
+from conftest import booking_body
+
+
+def next_date(day):
+    return (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+
+
+def get(client, url, **kwargs):
+    response = client.get(url, **kwargs)
+    response.get_data()
+    response.close()  # streamed bodies hold a pooled connection until closed
+    return response
+
+
+def make_days(client, student, new_day):
+    """Two days of bookings, several starting at the same time; returns the window."""
+    first, second = new_day(), new_day()
+    items = []
+    for day in (first, second):
+        for resource in ("Seminar Hall", "Auditorium", "Lab"):
+            items.append(booking_body(day, "09:00", "10:00", resource))
+        items.append(booking_body(day, "13:00", "14:00", "Lab"))
+    items.append(booking_body(first, "08:00", "09:00", "Lab"))
+    body = client.post("/api/bookings/bulk", headers=student, json=items).get_json()
+    assert body["created"] == len(items)
+    return f"start={first}&end={next_date(second)}"
+
+
+def pages(client, url, cursor=None):
+    events, requests = [], 0
+    while True:
+        response = get(client, url + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        events.extend(response.get_json())
+        requests += 1
+        assert requests < 50, "cursor does not advance"
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return events, requests
+
+
+def test_pages_cover_the_window_once_in_order(client, student, new_day):
+    window = make_days(client, student, new_day)
+    everything = get(client, f"/api/calendar/events?{window}").get_json()
+    assert len(everything) == 9
+
+    paged, requests = pages(client, f"/api/calendar/events?{window}&limit=2")
+    assert requests == 5
+    assert [e["id"] for e in paged] == [e["id"] for e in everything]
+    keys = [(e["start"], e["id"]) for e in paged]
+    assert keys == sorted(keys)
+
+
+def test_last_full_page_has_no_cursor(client, student, new_day):
+    window = make_days(client, student, new_day)
+    response = get(client, f"/api/calendar/events?{window}&limit=9")
+    assert len(response.get_json()) == 9
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_resource_filter_with_pages(client, student, new_day, app_module):
+    window = make_days(client, student, new_day)
+    conn = app_module.db_conn()
+    lab = conn.execute("SELECT id FROM resources WHERE name = 'Lab'").fetchone()[0]
+    conn.close()
+    paged, _ = pages(client, f"/api/calendar/events?{window}&resource_id={lab}&limit=2")
+    assert len(paged) == 5
+    assert {e["resource"] for e in paged} == {"Lab"}
+
+
+def test_cursor_is_stable_across_inserts(client, student, book, new_day):
+    window = make_days(client, student, new_day)
+    url = f"/api/calendar/events?{window}&limit=4"
+    first = get(client, url)
+    seen = [e["id"] for e in first.get_json()]
+    # A booking sorting before the cursor must not shift the next page
+    day = window[len("start="):len("start=") + 10]
+    assert book(day, "07:00", "08:00", resource="Seminar Hall").status_code == 201
+    rest, _ = pages(client, url, first.headers["X-Next-Cursor"])
+    ids = seen + [e["id"] for e in rest]
+    assert len(ids) == len(set(ids)) == 9
+
+
+def test_rejected_and_cancelled_bookings_are_left_out(client, student, hod, new_day):
+    day = new_day()
+    ids = [r["id"] for r in client.post("/api/bookings/bulk", headers=student, json=[
+        booking_body(day, "09:00", "10:00"), booking_body(day, "10:00", "11:00"), booking_body(day, "11:00", "12:00"),
+    ]).get_json()["results"]]
+    client.patch(f"/api/bookings/{ids[0]}", headers=hod, json={"action": "reject"})
+    client.patch(f"/api/bookings/{ids[1]}", headers=student, json={"action": "cancel"})
+    events = get(client, f"/api/calendar/events?start={day}&end={next_date(day)}").get_json()
+    assert [e["id"] for e in events] == [ids[2]]
+
+
+def test_bad_parameters(client):
+    assert get(client, "/api/calendar/events?limit=5&cursor=bm9wZQ").status_code == 400
+    assert get(client, "/api/calendar/events?start=31-01-2031").status_code == 400
+    assert get(client, "/api/calendar/events?end=tomorrow").status_code == 400
+
+
+def test_unchanged_window_is_not_modified(client, student, new_day):
+    window = make_days(client, student, new_day)
+    etag = get(client, f"/api/calendar/events?{window}").headers["ETag"]
+    response = get(client, f"/api/calendar/events?{window}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
@@ -0,0 +1,90 @@
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+import calendar_view
+import migrations
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "calendar.db")
+    migrations.migrate(conn)
+    conn.execute("INSERT INTO users (username, password, role, name, department_id) "
+                 "VALUES ('a@x.edu', 'x', 'student', 'Asha', 1), ('b@x.edu', 'x', 'teacher', 'Bala', 2)")
+    conn.executemany("""
+        INSERT INTO bookings (user_id, resource_id, title, date, start_time, end_time, purpose, status)
+        VALUES (?, ?, ?, ?, ?, ?, 'Tests', 'pending')
+    """, [
+        (1, 1, "Talk", "2031-03-03", "09:00", "10:00"),
+        (2, 2, "Concert", "2031-03-03", "18:00", "21:00"),
+        (1, 3, "Practical", "2031-03-04", "14:00", "16:00"),
+    ])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def events(conn):
+    return sorted(conn.execute(f"SELECT {calendar_view.COLUMNS} FROM calendar_events").fetchall())
+
+
+def rebuilt_events(conn):
+    conn.execute("SAVEPOINT check_events")
+    calendar_view.rebuild(conn.cursor())
+    rows = events(conn)
+    conn.execute("ROLLBACK TO check_events")
+    conn.execute("RELEASE check_events")
+    return rows
+
+
+def column(conn, name, booking_id):
+    return conn.execute(f"SELECT {name} FROM calendar_events WHERE id = ?", (booking_id,)).fetchone()[0]
+
+
+def test_bookings_are_copied_with_names(conn):
+    assert column(conn, "resource", 2) == "Auditorium"
+    assert column(conn, "requester", 2) == "Bala"
+    assert events(conn) == rebuilt_events(conn)
+
+
+def test_booking_writes_are_followed(conn):
+    conn.execute("UPDATE bookings SET status = 'approved', start_time = '08:30' WHERE id = 1")
+    conn.execute("UPDATE bookings SET resource_id = 2, date = '2031-03-05' WHERE id = 3")
+    conn.execute("DELETE FROM bookings WHERE id = 2")
+    assert column(conn, "status", 1) == "approved"
+    assert column(conn, "resource", 3) == "Auditorium"
+    assert events(conn) == rebuilt_events(conn)
+
+
+def test_renames_rewrite_only_their_rows(conn):
+    conn.execute("UPDATE users SET name = 'Asha K' WHERE id = 1")
+    conn.execute("UPDATE resources SET name = 'Main Hall' WHERE id = 1")
+    assert [column(conn, "requester", i) for i in (1, 2, 3)] == ["Asha K", "Bala", "Asha K"]
+    assert column(conn, "resource", 1) == "Main Hall"
+    assert events(conn) == rebuilt_events(conn)
+
+
+def test_deletes_match_the_join(conn):
+    conn.execute("DELETE FROM users WHERE id = 2")
+    assert column(conn, "requester", 2) is None
+    conn.execute("DELETE FROM resources WHERE id = 3")
+    assert conn.execute("SELECT COUNT(*) FROM calendar_events WHERE id = 3").fetchone()[0] == 0
+    assert events(conn) == rebuilt_events(conn)
+
+
+def test_calendar_shows_the_new_requester_name(client, book, new_day, app_module):
+    response = client.post("/api/auth/signup", json={"email": "calendar-rename@college.edu",
+                                                     "password": "secret1", "role": "student", "name": "Old"})
+    user_id = response.get_json()["user"]["id"]
+    day = new_day()
+    book(day, "10:00", "11:00", headers={"Authorization": "Bearer " + response.get_json()["token"]})
+    conn = app_module.db_conn()
+    conn.execute("UPDATE users SET name = 'New' WHERE id = ?", (user_id,))
+    conn.commit()
+    conn.close()
+    end = (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+    response = client.get(f"/api/calendar/events?start={day}&end={end}")
+    assert [e["requester"] for e in response.get_json()] == ["New"]
+    response.close()
@@ -0,0 +1,71 @@
+import gzip
+import json
+from datetime import date, timedelta
+
+from flask import Response
+
+import compression
+
+
+def json_body(size):
+    return json.dumps([{"id": i, "title": "Seminar on compilers"} for i in range(size)])
+
+
+def test_choose_encoding():
+    assert compression.choose_encoding("gzip, deflate") == "gzip"
+    assert compression.choose_encoding("gzip;q=0") is None
+    assert compression.choose_encoding("identity") is None
+    assert compression.choose_encoding("") is None
+    assert compression.choose_encoding("*") == compression.available_encodings()[0]
+
+
+def test_large_json_is_compressed_and_cached():
+    compressor = compression.Compressor(min_bytes=100)
+    body = json_body(200)
+
+    def response():
+        r = Response(body, mimetype="application/json")
+        r.set_etag("v1")
+        return compressor.apply(r, "gzip")
+
+    first = response()
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert first.get_etag() == ("v1-gzip", False)
+    assert first.headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(first.get_data()).decode() == body
+    second = response()
+    assert second.get_data() == first.get_data()
+    assert compressor.stats()["cache_hits"] == 1
+
+
+def test_small_or_binary_bodies_are_left_alone():
+    compressor = compression.Compressor(min_bytes=1024)
+    small = compressor.apply(Response("[]", mimetype="application/json"), "gzip")
+    assert "Content-Encoding" not in small.headers and small.get_data() == b"[]"
+    image = compressor.apply(Response(b"\x89PNG" * 1000, mimetype="image/png"), "gzip")
+    assert "Content-Encoding" not in image.headers
+    error = compressor.apply(Response(json_body(200), status=400, mimetype="application/json"), "gzip")
+    assert "Content-Encoding" not in error.headers
+
+
+def test_streamed_body_is_compressed_chunk_by_chunk():
+    compressor = compression.Compressor()
+    chunks = ["[", *(json.dumps({"id": i}) + "," for i in range(500)), "{}]"]
+    response = compressor.apply(Response(iter(chunks), mimetype="application/json"), "gzip")
+    assert response.is_streamed and "Content-Length" not in response.headers
+    assert gzip.decompress(b"".join(response.response)).decode() == "".join(chunks)
+
+
+def test_calendar_is_sent_gzipped(client, book, new_day):
+    day = new_day()
+    book(day, "10:00", "11:00")
+    end = (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+    url = f"/api/calendar/events?start={day}&end={end}"
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    events = json.loads(gzip.decompress(response.get_data()))
+    response.close()
+    plain = client.get(url)
+    assert "Content-Encoding" not in plain.headers
+    assert plain.get_json() == events
+    plain.close()
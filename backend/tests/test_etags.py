@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+
+CALENDAR = "/api/calendar/events"
+
+
+def get(client, url, **kwargs):
+    response = client.get(url, **kwargs)
+    response.get_data()
+    response.close()  # streamed bodies hold a pooled connection until closed
+    return response
+
+
+def window(day):
+    end = (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+    return f"{CALENDAR}?start={day}&end={end}"
+
+
+def touch_users(app_module, sql):
+    conn = app_module.db_conn()
+    conn.execute(sql)
+    conn.commit()
+    conn.close()
+
+
+def test_unchanged_calendar_is_a_304(client, book, new_day):
+    day = new_day()
+    book(day, "10:00", "11:00")
+    first = get(client, window(day))
+    assert first.status_code == 200 and len(first.get_json()) == 1
+    again = get(client, window(day), headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    book(day, "12:00", "13:00")
+    assert get(client, window(day), headers={"If-None-Match": first.headers["ETag"]}).status_code == 200
+
+
+def test_signups_and_password_changes_keep_booking_etags(client, student, hod, book, new_day, app_module):
+    day = new_day()
+    book(day, "10:00", "11:00")
+    requests = [(window(day), student), ("/api/bookings/my", student), ("/api/bookings/search?q=Test", hod),
+                ("/api/analytics/utilization", hod)]
+    etags = [(url, headers, get(client, url, headers=headers).headers["ETag"]) for url, headers in requests]
+
+    assert client.post("/api/auth/signup", json={"email": "etag-signup@college.edu", "password": "secret1",
+                                                 "role": "student"}).status_code == 201
+    touch_users(app_module, "UPDATE users SET password = password WHERE username = 'student@college.edu'")
+    for url, headers, etag in etags:
+        assert get(client, url, headers=dict(headers, **{"If-None-Match": etag})).status_code == 304, url
+
+
+def test_requester_rename_changes_the_calendar(client, book, new_day, app_module):
+    day = new_day()
+    book(day, "10:00", "11:00")
+    etag = get(client, window(day)).headers["ETag"]
+    touch_users(app_module, "UPDATE users SET name = name WHERE username = 'student@college.edu'")
+    assert get(client, window(day), headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_compressed_etag_only_validates_for_its_encoding(client, book, new_day):
+    day = new_day()
+    book(day, "10:00", "11:00")
+    gzipped = get(client, window(day), headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    etag = gzipped.headers["ETag"]
+    assert etag.endswith('-gzip"')
+
+    assert get(client, window(day), headers={"Accept-Encoding": "gzip", "If-None-Match": etag}).status_code == 304
+    # Same tag, but this request would be sent uncompressed
+    plain = get(client, window(day), headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert plain.status_code == 200
+    assert "Content-Encoding" not in plain.headers
@@ -0,0 +1,52 @@
+import json
+import multiprocessing
+
+import metrics
+
+
+def dead_pid():
+    process = multiprocessing.get_context("spawn").Process(target=int)
+    process.start()
+    process.join()
+    return process.pid
+
+
+def test_requests_are_counted_per_route(tmp_path):
+    m = metrics.Metrics(str(tmp_path))
+    for status in (200, 200, 404):
+        m.start_request()
+        m.observe_statement("SELECT 1", (), 0.001, 1)
+        m.finish_request("/api/resources", "GET", status)
+    text = m.render()
+    assert 'bookmycampus_http_requests_total{route="/api/resources",method="GET",status="200"} 2' in text
+    assert 'bookmycampus_http_request_duration_seconds_count{route="/api/resources",method="GET"} 3' in text
+    assert 'bookmycampus_sql_statements_total{route="/api/resources",method="GET"} 3' in text
+
+
+def test_exited_workers_keep_their_counters(tmp_path):
+    m = metrics.Metrics(str(tmp_path))
+    m.add_collector(lambda: {"logins_total": 1, "connections_in_use": 1})
+    with open(tmp_path / f"{dead_pid()}.json", "w") as f:
+        json.dump({"requests": {"/api/x\tGET\t200": 5},
+                   "process": {"logins_total": 3, "connections_in_use": 7}}, f)
+    for _ in range(2):  # the second collect must not count the dead worker twice
+        total = m.collect()
+        assert total["requests"]["/api/x\tGET\t200"] == 5
+        assert total["process"] == {"logins_total": 4, "connections_in_use": 1}
+    assert sorted(p.name for p in tmp_path.glob("*.json")) == sorted([f"{m._pid}.json", metrics.RETIRED])
+
+
+def test_metrics_are_loopback_only_without_a_token(client):
+    assert client.get("/metrics").status_code == 200
+    remote = client.get("/metrics", environ_base={"REMOTE_ADDR": "10.1.2.3"})
+    assert remote.status_code == 403
+
+
+def test_metrics_token_is_required_when_set(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "METRICS_TOKEN", "s3cret")
+    assert client.get("/metrics").status_code == 403  # loopback is not enough
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 403
+    response = client.get("/metrics", headers={"Authorization": "Bearer s3cret"},
+                          environ_base={"REMOTE_ADDR": "10.1.2.3"})
+    assert response.status_code == 200
+    assert "bookmycampus_http_requests_total" in response.get_data(as_text=True)
@@ -0,0 +1,116 @@
+import sqlite3
+
+import pytest
+
+import analytics
+import migrations
+
+
+@pytest.fixture
+def connect(tmp_path):
+    """connect(name) -> connection to a new database file in tmp_path"""
+    def connect(name="test.db"):
+        return sqlite3.connect(tmp_path / name)
+    return connect
+
+
+def schema(conn):
+    return sorted(conn.execute(
+        "SELECT type, name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' AND sql IS NOT NULL"
+    ).fetchall())
+
+
+def seed(conn):
+    """A few bookings written straight into a migrated database."""
+    conn.execute("INSERT INTO users (username, password, role, name, department_id) "
+                 "VALUES ('a@x.edu', 'x', 'student', 'A', 1), ('b@x.edu', 'x', 'teacher', 'B', 2)")
+    conn.executemany("""
+        INSERT INTO bookings (user_id, resource_id, title, date, start_time, end_time, purpose, status)
+        VALUES (?, ?, ?, ?, ?, ?, 'Migration test', ?)
+    """, [
+        (1, 1, "Robotics club", "2031-02-03", "09:00", "10:30", "pending"),
+        (1, 2, "Annual day", "2031-02-04", "10:00", "12:00", "approved"),
+        (2, 1, "Guest lecture", "2031-02-03", "11:00", "12:00", "rejected"),
+        (2, 3, "Lab session", "2030-01-07", "14:00", "16:00", "approved"),
+    ])
+    conn.commit()
+
+
+def test_fresh_database_gets_every_migration_in_order(connect):
+    conn = connect()
+    assert migrations.migrate(conn) == [number for number, _, _ in migrations.MIGRATIONS]
+    recorded = conn.execute("SELECT version, name FROM schema_version ORDER BY version").fetchall()
+    assert recorded == [(number, name) for number, name, _ in migrations.MIGRATIONS]
+    assert migrations.current_version(conn.cursor()) == migrations.LATEST
+    assert conn.execute("PRAGMA integrity_check").fetchone() == ("ok",)
+
+
+def test_numbers_are_unique_and_increasing():
+    numbers = [number for number, _, _ in migrations.MIGRATIONS]
+    assert numbers == list(range(1, len(numbers) + 1))
+
+
+def test_current_database_is_left_alone(connect):
+    conn = connect()
+    migrations.migrate(conn)
+    before = schema(conn)
+    assert migrations.migrate(conn) == []
+    assert schema(conn) == before
+
+
+@pytest.mark.parametrize("stop", range(1, len(migrations.MIGRATIONS)))
+def test_upgrading_from_any_version_matches_a_fresh_database(connect, stop):
+    fresh = connect("fresh.db")
+    migrations.migrate(fresh)
+
+    old = connect("old.db")
+    assert migrations.migrate(old, migrations.MIGRATIONS[:stop]) == list(range(1, stop + 1))
+    assert migrations.migrate(old) == list(range(stop + 1, migrations.LATEST + 1))
+    assert schema(old) == schema(fresh)
+
+
+def test_existing_bookings_are_carried_into_derived_tables(connect):
+    conn = connect()
+    # Bookings written before the summary, read model and search index existed
+    migrations.migrate(conn, [m for m in migrations.MIGRATIONS if m[0] <= 6])
+    seed(conn)
+    migrations.migrate(conn)
+
+    stats = sorted(conn.execute("SELECT * FROM booking_stats WHERE bookings OR minutes").fetchall())
+    analytics.rebuild(conn.cursor())
+    assert stats == sorted(conn.execute("SELECT * FROM booking_stats WHERE bookings OR minutes").fetchall())
+    assert len(stats) > 0
+
+    assert conn.execute("SELECT COUNT(*) FROM calendar_events").fetchone()[0] == 4
+    found = conn.execute("SELECT rowid FROM bookings_fts WHERE bookings_fts MATCH 'robotics'").fetchall()
+    assert found == [(1,)]
+    start_min, end_min = conn.execute("SELECT start_min, end_min FROM bookings WHERE id = 2").fetchone()
+    assert (start_min, end_min) == (600, 720)
+
+
+def test_expired_status_is_accepted_after_upgrade(connect):
+    conn = connect()
+    migrations.migrate(conn, [m for m in migrations.MIGRATIONS if m[0] <= 10])
+    seed(conn)
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("UPDATE bookings SET status = 'expired' WHERE id = 1")
+    conn.rollback()
+
+    migrations.migrate(conn)
+    conn.execute("UPDATE bookings SET status = 'expired' WHERE id = 1")
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("UPDATE bookings SET status = 'lost' WHERE id = 1")
+    assert conn.execute("PRAGMA integrity_check").fetchone() == ("ok",)
+
+
+def test_failed_migration_rolls_back(connect):
+    conn = connect()
+
+    def broken(cur):
+        cur.execute("CREATE TABLE half_done (id INTEGER)")
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        migrations.migrate(conn, migrations.MIGRATIONS[:2] + [(3, "broken", broken)])
+    assert migrations.current_version(conn.cursor()) == 0
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
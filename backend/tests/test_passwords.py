@@ -0,0 +1,55 @@
+import threading
+import time
+
+import pytest
+
+import passwords
+
+
+@pytest.fixture
+def hasher(tmp_path):
+    return passwords.PasswordHasher(rounds=4, lock_path=str(tmp_path / "bcrypt"), slots=1, max_queue=1)
+
+
+def hold(tmp_path, kind):
+    """Take the only run slot (or queue ticket), as another worker would."""
+    return passwords.HostSlots(str(tmp_path / "bcrypt") + "." + kind, 1).try_acquire()
+
+
+def test_hash_and_verify(hasher):
+    hashed = hasher.hash("secret1")
+    assert passwords.hash_cost(hashed) == 4
+    assert hasher.verify("secret1", hashed) and not hasher.verify("secret2", hashed)
+    assert not hasher.needs_rehash(hashed)
+
+
+def test_full_queue_fails_fast(hasher, tmp_path):
+    slot, ticket = hold(tmp_path, "run"), hold(tmp_path, "queue")
+    started = time.perf_counter()
+    with pytest.raises(passwords.HasherBusy):
+        hasher.hash("secret1")
+    assert time.perf_counter() - started < 0.5
+    assert hasher.stats()["rejected"] == 1
+    slot.close()
+    ticket.close()
+    assert hasher.hash("secret1")
+
+
+def test_queued_hash_waits_for_the_slot(hasher, tmp_path):
+    slot = hold(tmp_path, "run")
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(hasher.hash("secret1")))
+    waiter.start()
+    time.sleep(0.05)
+    assert results == [] and hasher.stats()["queue_depth"] == 1
+    slot.close()
+    waiter.join(5)
+    assert len(results) == 1 and hasher.stats()["queue_depth"] == 0
+
+
+def test_seeding_ignores_the_limit(hasher, tmp_path):
+    slot, ticket = hold(tmp_path, "run"), hold(tmp_path, "queue")
+    hashed = hasher.hash_many(["a" * 6, "b" * 6, "c" * 6])
+    assert len(hashed) == 3 and all(passwords.is_bcrypt_hash(h) for h in hashed)
+    slot.close()
+    ticket.close()
@@ -0,0 +1,92 @@
+import itertools
+
+import pytest
+
+import principal_cache
+
+_emails = (f"principal{i}@college.edu" for i in itertools.count())
+
+
+@pytest.fixture
+def signup(client):
+    """signup(role=...) -> auth headers of a new account"""
+    def signup(role="student"):
+        response = client.post("/api/auth/signup", json={"email": next(_emails), "password": "secret1",
+                                                         "role": role})
+        assert response.status_code == 201
+        return {"Authorization": "Bearer " + response.get_json()["token"]}
+    return signup
+
+
+@pytest.fixture
+def check_every_request(app_module, monkeypatch):
+    monkeypatch.setattr(app_module.principals, "check_interval", 0)
+    return app_module.principals
+
+
+def me(client, headers):
+    return client.get("/api/auth/me", headers=headers).get_json()["user"]
+
+
+def update_user(app_module, user_id, sql, *params):
+    conn = app_module.db_conn()
+    conn.execute(sql, (*params, user_id))
+    conn.commit()
+    conn.close()
+
+
+def test_role_change_is_seen(client, app_module, signup, check_every_request):
+    headers = signup()
+    user = me(client, headers)
+    assert user["role"] == "student"
+    update_user(app_module, user["id"], "UPDATE users SET role = ? WHERE id = ?", "hod")
+    assert me(client, headers)["role"] == "hod"
+
+
+def test_department_change_is_seen(client, app_module, signup, check_every_request):
+    headers = signup("teacher")
+    user = me(client, headers)
+    assert user["department_id"] == 1
+    update_user(app_module, user["id"], "UPDATE users SET department = ?, department_id = ? WHERE id = ?",
+                "Mechanical", 3)
+    assert me(client, headers)["department"] == "Mechanical"
+    assert me(client, headers)["department_id"] == 3
+
+
+def test_deleted_user_loses_access(client, app_module, signup, check_every_request):
+    headers = signup()
+    user = me(client, headers)
+    update_user(app_module, user["id"], "DELETE FROM users WHERE id = ?")
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+
+
+def test_signups_and_rehashes_keep_the_cache(client, app_module, signup, check_every_request):
+    headers = signup()
+    user = me(client, headers)
+    before = check_every_request.stats()
+    signup()
+    update_user(app_module, user["id"], "UPDATE users SET password = ? WHERE id = ?", "rehashed")
+    me(client, headers)
+    after = check_every_request.stats()
+    assert after["checks"] > before["checks"]
+    assert after["hits"] > before["hits"]
+    assert after["misses"] == before["misses"]
+
+
+def test_counter_is_read_once_per_interval():
+    reads = []
+    cache = principal_cache.PrincipalCache(check_interval=60)
+    for _ in range(5):
+        cache.check(lambda: reads.append(1) or 7)
+    assert reads == [1]
+    cache.put("token", ("row",), cache.generation())
+    assert cache.get("token") == ("row",)
+
+
+def test_row_read_before_a_change_is_not_cached():
+    cache = principal_cache.PrincipalCache(check_interval=0)
+    cache.check(lambda: 1)
+    generation = cache.generation()
+    cache.check(lambda: 2)  # the users changed while the row was read
+    cache.put("token", ("stale",), generation)
+    assert cache.get("token") is None
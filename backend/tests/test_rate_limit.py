@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+import rate_limit
+
+spawn = multiprocessing.get_context("spawn")
+
+
+def limiter(tmp_path, *rules, inflight=None):
+    return rate_limit.RateLimiter(str(tmp_path / "ratelimit"), rules, inflight_limits=inflight)
+
+
+def admit_and_die(path):
+    worker = rate_limit.RateLimiter(path, [], inflight_limits={"calendar": 1})
+    assert worker.admit("calendar")
+    os._exit(0)  # no release, no atexit: as if the worker was killed
+
+
+def test_parse_limit():
+    assert rate_limit.parse_limit("10/minute") == (10, 60.0)
+    assert rate_limit.parse_limit("5/seconds") == (5, 1.0)
+    assert rate_limit.parse_limit("off") is None and rate_limit.parse_limit("0/hour") is None
+    with pytest.raises(ValueError):
+        rate_limit.parse_limit("10/fortnight")
+
+
+def test_bucket_empties_and_refills(tmp_path):
+    limits = limiter(tmp_path, rate_limit.Rule("ip", "10/second"))
+    assert all(limits.check("/api/x", "10.0.0.1") is None for _ in range(10))
+    name, wait = limits.check("/api/x", "10.0.0.1")
+    assert name == "ip" and 0 < wait <= 0.1
+    assert limits.check("/api/x", "10.0.0.2") is None  # another client has its own bucket
+    time.sleep(wait + 0.02)
+    assert limits.check("/api/x", "10.0.0.1") is None
+    assert limits.stats()["limited"] == {"ip": 1}
+
+
+def test_workers_share_buckets(tmp_path):
+    rule = rate_limit.Rule("ip", "3/minute")
+    first, second = limiter(tmp_path, rule), limiter(tmp_path, rule)
+    assert first.check("/api/x", "10.0.0.1") is None
+    assert second.check("/api/x", "10.0.0.1") is None
+    assert first.check("/api/x", "10.0.0.1") is None
+    assert second.check("/api/x", "10.0.0.1")[0] == "ip"
+
+
+def test_scopes_and_routes(tmp_path):
+    limits = limiter(tmp_path, rate_limit.Rule("user", "1/minute", scope="user"),
+                     rate_limit.Rule("anon", "1/minute", scope="anonymous", routes={"/api/calendar/events"}))
+    assert limits.check("/api/calendar/events", "10.0.0.1", user_id=7) is None
+    assert limits.check("/api/calendar/events", "10.0.0.1", user_id=8) is None  # same IP, other user
+    assert limits.check("/api/calendar/events", "10.0.0.1", user_id=7)[0] == "user"
+    assert limits.check("/api/calendar/events", "10.0.0.1") is None
+    assert limits.check("/api/calendar/events", "10.0.0.1")[0] == "anon"
+    assert limits.check("/api/resources", "10.0.0.1") is None  # anon rule is calendar only
+
+
+def test_inflight_limit_sheds_and_releases(tmp_path):
+    limits = limiter(tmp_path, inflight={"calendar": 2})
+    assert limits.admit("calendar") and limits.admit("calendar")
+    assert not limits.admit("calendar")
+    limits.release("calendar")
+    assert limits.admit("calendar")
+    assert limits.stats()["shed"] == {"calendar": 1}
+
+
+def test_dead_worker_counts_are_dropped(tmp_path):
+    path = str(tmp_path / "ratelimit")
+    process = spawn.Process(target=admit_and_die, args=(path,))
+    process.start()
+    process.join()
+    limits = rate_limit.RateLimiter(path, [], inflight_limits={"calendar": 1})
+    assert limits.admit("calendar")
+
+
+def test_over_budget_client_gets_429(client, app_module, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, "limiter", limiter(tmp_path, rate_limit.Rule("ip", "2/minute")))
+    assert client.get("/api/resources").status_code == 200
+    assert client.get("/api/resources").status_code == 200
+    response = client.get("/api/resources")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "30"
+    assert client.get("/health").status_code == 200  # only /api is limited
+
+
+def test_busy_class_is_shed_with_503(client, app_module, monkeypatch, tmp_path):
+    limits = limiter(tmp_path, inflight={"calendar": 1})
+    monkeypatch.setattr(app_module, "limiter", limits)
+    assert limits.admit("calendar")  # another worker's calendar read
+    response = client.get("/api/calendar/events")
+    assert response.status_code == 503 and response.headers["Retry-After"] == "1"
+    limits.release("calendar")
+    response = client.get("/api/calendar/events")
+    assert response.status_code == 200
+    response.close()
+    # The admission was handed back when the response closed
+    assert limits.admit("calendar")
+
+
+def test_signed_out_calendar_reads_are_limited_by_ip(client, student, app_module, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, "limiter", limiter(
+        tmp_path, rate_limit.Rule("calendar", "5/minute", scope="user", routes={"/api/calendar/events"}),
+        rate_limit.Rule("calendar_anon", "1/minute", scope="anonymous", routes={"/api/calendar/events"})))
+    client.get("/api/calendar/events").close()
+    assert client.get("/api/calendar/events").status_code == 429
+    response = client.get("/api/calendar/events", headers=student)
+    assert response.status_code == 200
+    response.close()
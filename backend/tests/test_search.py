@@ -0,0 +1,123 @@
+import booking_search
+from conftest import booking_body
+
+
+def add(client, student, items):
+    body = client.post("/api/bookings/bulk", headers=student, json=items).get_json()
+    assert body["created"] == len(items), body
+    return [r["id"] for r in body["results"]]
+
+
+def word_for(day):
+    """A search term no other test's bookings contain."""
+    return "w" + day.replace("-", "")
+
+
+def search(client, hod, params):
+    response = client.get(f"/api/bookings/search?{params}", headers=hod)
+    assert response.status_code == 200, response.get_json()
+    return response
+
+
+def all_pages(client, hod, params, cursor=None):
+    results, truncated = [], set()
+    for _ in range(50):
+        response = search(client, hod, params + (f"&cursor={cursor}" if cursor else ""))
+        results.extend(response.get_json())
+        truncated.add(response.headers.get("X-Search-Truncated"))
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return results, truncated
+    raise AssertionError("cursor does not advance")
+
+
+def test_pages_match_a_single_page(client, student, hod, new_day):
+    day = new_day()
+    word = word_for(day)
+    # Title matches in different amounts, so scores differ; two identical ones tie
+    titles = [f"{word}", f"{word} {word}", f"Meeting {word}", f"{word} review {word} {word}",
+              f"Seminar on {word}", f"{word}", f"Other {word} talk"]
+    add(client, student, [booking_body(day, f"{8 + i:02d}:00", f"{9 + i:02d}:00", title=t)
+                          for i, t in enumerate(titles)])
+    whole = search(client, hod, f"q={word}&limit=50").get_json()
+    assert len(whole) == len(titles)
+    paged, truncated = all_pages(client, hod, f"q={word}&limit=2")
+    assert [r["id"] for r in paged] == [r["id"] for r in whole]
+    scores = [r["score"] for r in paged]
+    assert scores == sorted(scores, reverse=True)
+    assert truncated == {None}
+
+
+
+def test_bookings_added_between_pages_do_not_shift_them(client, student, hod, new_day):
+    day = new_day()
+    word = word_for(day)
+    titles = [f"{word}", f"Meeting {word}", f"Seminar on {word}", f"Other {word} talk", f"{word} review"]
+    add(client, student, [booking_body(day, f"{8 + i:02d}:00", f"{9 + i:02d}:00", title=t)
+                          for i, t in enumerate(titles)])
+    whole = [r["id"] for r in search(client, hod, f"q={word}&limit=50").get_json()]
+
+    first = search(client, hod, f"q={word}&limit=2")
+    # Ranks first, and changes every score by changing the term's document count
+    [added] = add(client, student, [booking_body(day, "15:00", "16:00", title=f"{word} {word} {word}")])
+    rest, _ = all_pages(client, hod, f"q={word}&limit=2", first.headers["X-Next-Cursor"])
+    paged = [r["id"] for r in first.get_json() + rest]
+    assert paged == whole
+    assert added not in paged
+    assert added == search(client, hod, f"q={word}&limit=1").get_json()[0]["id"]
+
+def test_title_matches_rank_above_purpose_matches(client, student, hod, new_day):
+    day = new_day()
+    word = word_for(day)
+    in_purpose = dict(booking_body(day, "09:00", "10:00", title="Plain title"), purpose=f"About {word}")
+    in_title = booking_body(day, "10:00", "11:00", title=f"About {word}")
+    purpose_id, title_id = add(client, student, [in_purpose, in_title])
+    results = search(client, hod, f"q={word}").get_json()
+    assert [r["id"] for r in results] == [title_id, purpose_id]
+
+
+def test_filters_prefixes_and_phrases(client, student, hod, new_day):
+    first, second = new_day(), new_day()
+    word = word_for(first)
+    ids = add(client, student, [
+        booking_body(first, "09:00", "10:00", title=f"{word} robotics workshop"),
+        booking_body(second, "09:00", "10:00", title=f"{word} workshop on robotics", resource="Lab"),
+    ])
+    client.patch(f"/api/bookings/{ids[1]}", headers=hod, json={"action": "approve"})
+
+    def found(params):
+        return sorted(r["id"] for r in search(client, hod, f"q={word}+{params}").get_json())
+
+    assert found("workshops") == ids  # stemmed
+    assert found("robot*") == ids
+    assert found("%22robotics+workshop%22") == ids[:1]
+    assert found(f"workshop&from={second}&to={second}") == ids[1:]
+    assert found("workshop&status=approved") == ids[1:]
+    assert found("workshop&status=pending,approved") == ids
+
+
+def test_truncated_results_are_flagged(client, student, hod, new_day, monkeypatch):
+    monkeypatch.setattr(booking_search, "RANK_WINDOW", 3)
+    older, newer = new_day(), new_day()
+    word = word_for(older)
+    add(client, student, [booking_body(older, f"{h:02d}:00", f"{h + 1:02d}:00", title=word) for h in (9, 10)])
+    add(client, student, [booking_body(newer, f"{h:02d}:00", f"{h + 1:02d}:00", title=word) for h in (9, 10, 11)])
+
+    results, truncated = all_pages(client, hod, f"q={word}&limit=2")
+    assert len(results) == 3  # the newest three bookings
+    assert {r["start"][:10] for r in results} == {newer}
+    assert truncated == {"1"}  # on every page
+
+    # Within the window nothing older matches
+    _, truncated = all_pages(client, hod, f"q={word}&from={newer}&to={newer}")
+    assert truncated == {None}
+    monkeypatch.setattr(booking_search, "RANK_WINDOW", 5)
+    _, truncated = all_pages(client, hod, f"q={word}")
+    assert truncated == {None}
+
+
+def test_access_and_bad_queries(client, student, hod):
+    assert client.get("/api/bookings/search?q=seminar", headers=student).status_code == 403
+    assert client.get("/api/bookings/search?q=%22%22", headers=hod).status_code == 400
+    assert client.get("/api/bookings/search?q=seminar&status=done", headers=hod).status_code == 400
+    assert client.get("/api/bookings/search?q=seminar&cursor=bm9wZQ", headers=hod).status_code == 400
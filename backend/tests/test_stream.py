@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+import booking_events
+import rate_limit
+
+
+@pytest.fixture(autouse=True)
+def short_streams(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "STREAM_MAX_SECONDS", 0.05)
+    monkeypatch.setattr(app_module, "STREAM_POLL_SECONDS", 0.01)
+
+
+@pytest.fixture
+def since(app_module):
+    """since() -> the newest event id, to replay from"""
+    def since():
+        conn = app_module.db_conn()
+        latest = booking_events.latest_id(conn.cursor())
+        conn.close()
+        return latest
+    return since
+
+
+def token(headers):
+    return headers["Authorization"][len("Bearer "):]
+
+
+def read_events(client, headers, last_id, query=""):
+    response = client.get(f"/api/stream?token={token(headers)}&last_event_id={last_id}{query}")
+    assert response.status_code == 200 and response.mimetype == "text/event-stream"
+    text = response.get_data(as_text=True)
+    response.close()
+    events = []
+    for block in text.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line and line[0] != ":")
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_stream_needs_a_valid_token(client):
+    assert client.get("/api/stream").status_code == 401
+    assert client.get("/api/stream?token=not-a-token").status_code == 401
+
+
+def test_own_changes_are_sent_in_full(client, student, book, new_day, since):
+    last_id = since()
+    booking_id = book(new_day(), "10:00", "11:00").get_json()["id"]
+    client.patch(f"/api/bookings/{booking_id}", headers=student, json={"action": "cancel"})
+    events = read_events(client, student, last_id)
+    assert [(kind, data["id"]) for kind, data in events] == [("created", booking_id), ("cancelled", booking_id)]
+    assert events[1][1]["title"] == "Test booking" and events[1][1]["bookingStatus"] == "cancelled"
+
+
+def test_others_bookings_only_as_the_calendar_shows_them(client, student, teacher, book, new_day, since):
+    last_id = since()
+    booking_id = book(new_day(), "10:00", "11:00", headers=teacher).get_json()["id"]
+    [(kind, data)] = read_events(client, student, last_id)
+    assert kind == "created" and data["title"] == "Test booking"
+
+    # Events carry the booking as it is now; once off the calendar, only its id and status
+    client.patch(f"/api/bookings/{booking_id}", headers=teacher, json={"action": "cancel"})
+    assert read_events(client, student, last_id) == [
+        ("created", {"id": booking_id, "bookingStatus": "cancelled"}),
+        ("cancelled", {"id": booking_id, "bookingStatus": "cancelled"}),
+    ]
+    # mine=1 leaves them out altogether
+    assert read_events(client, student, last_id, "&mine=1") == []
+
+
+def test_hod_stream_is_scoped_to_a_department(client, hod, book, new_day, since):
+    response = client.post("/api/auth/signup", json={"email": "stream-mech@college.edu", "password": "secret1",
+                                                     "role": "teacher", "department_id": 3})
+    mechanical = {"Authorization": "Bearer " + response.get_json()["token"]}
+    last_id = since()
+    booking_id = book(new_day(), "10:00", "11:00", headers=mechanical).get_json()["id"]
+    assert read_events(client, hod, last_id) == []
+    events = read_events(client, hod, last_id, "&department_id=3")
+    assert [(kind, data["id"], data["departmentId"]) for kind, data in events] == [("created", booking_id, 3)]
+
+
+def test_streams_are_capped(client, student, app_module, monkeypatch, tmp_path, since):
+    limits = rate_limit.RateLimiter(str(tmp_path / "ratelimit"), [], inflight_limits={"stream": 1})
+    monkeypatch.setattr(app_module, "limiter", limits)
+    assert limits.admit("stream")  # a stream open in another worker
+    response = client.get(f"/api/stream?token={token(student)}")
+    assert response.status_code == 503 and response.headers["Retry-After"] == "5"
+    limits.release("stream")
+    assert read_events(client, student, since()) == []
+    assert limits.admit("stream")  # released when the stream closed
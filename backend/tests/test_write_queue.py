@@ -0,0 +1,189 @@
+"""
+The write queue across processes: a leader elected by flock, other
+processes forwarding over the unix socket, per-operation savepoints,
+whole-batch aborts, takeover when the leader dies, and timeouts.
+Helper processes are spawned (not forked) so they start without the
+test process's threads.
+"""
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import pytest
+
+import db_pool
+import write_queue
+from conftest import booking_body
+
+spawn = multiprocessing.get_context("spawn")
+
+
+def add(tx, name):
+    tx.cur.execute("INSERT INTO items (name) VALUES (?)", (name,))
+    return tx.cur.lastrowid
+
+
+def fail(tx, name):
+    tx.cur.execute("INSERT INTO items (name) VALUES (?)", (name,))
+    raise ValueError(f"refused {name}")
+
+
+def slow(tx, name, seconds):
+    time.sleep(seconds)
+    return add(tx, name)
+
+
+def end_transaction(tx):
+    # Leaves the batch without its savepoint, so the batch cannot commit
+    tx.cur.execute("ROLLBACK")
+
+
+def make_queue(path, socket_path, on_abort=None):
+    queue = write_queue.WriteQueue(db_pool.ConnectionPool(path).acquire, socket_path, on_abort=on_abort)
+    for fn in (add, fail, slow, end_transaction):
+        queue.register(fn.__name__, fn)
+    return queue
+
+
+def submit_names(path, socket_path, names, out):
+    queue = make_queue(path, socket_path)
+    results = [queue.submit("add", name=name) for name in names]
+    out.put((results, queue.stats()))
+
+
+def lead(path, socket_path, ready):
+    queue = make_queue(path, socket_path)
+    queue.submit("add", name="leader")
+    ready.set()
+    time.sleep(60)
+
+
+@pytest.fixture
+def paths():
+    # Short directory: unix socket paths are limited to ~100 bytes
+    directory = tempfile.mkdtemp(prefix="wq-")
+    path = os.path.join(directory, "queue.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT UNIQUE)")
+    conn.close()
+    yield path, os.path.join(directory, "writer.sock")
+    shutil.rmtree(directory)
+
+
+@pytest.fixture
+def leader_process(paths):
+    """A separate process that has become the leader."""
+    ready = spawn.Event()
+    process = spawn.Process(target=lead, args=(*paths, ready), daemon=True)
+    process.start()
+    assert ready.wait(30)
+    yield process
+    process.kill()
+    process.join()
+
+
+def names(path):
+    conn = sqlite3.connect(path)
+    rows = sorted(row[0] for row in conn.execute("SELECT name FROM items"))
+    conn.close()
+    return rows
+
+
+def test_workers_share_one_writer(paths):
+    leader = make_queue(*paths)
+    leader.submit("add", name="first")
+    assert leader.stats()["leader"] == 1
+
+    out = spawn.Queue()
+    workers = [spawn.Process(target=submit_names, args=(*paths, [f"w{i}-{n}" for n in range(20)], out))
+               for i in range(2)]
+    for worker in workers:
+        worker.start()
+    reports = [out.get(timeout=30) for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    for results, stats in reports:
+        assert len(set(results)) == 20
+        assert stats["leader"] == 0
+        assert stats["forwarded"] == 20 and stats["direct"] == 0
+    assert leader.stats()["batched_ops"] == 41
+    assert len(names(paths[0])) == 41
+
+
+def test_failed_operation_rolls_back_alone(paths):
+    queue = make_queue(*paths)
+    batch = [write_queue._Pending("add", {"name": "a"}), write_queue._Pending("fail", {"name": "b"}),
+             write_queue._Pending("add", {"name": "c"})]
+    queue._run_batch(batch)
+    assert [p.error for p in batch] == [None, "refused b", None]
+    assert batch[0].result and batch[2].result
+    assert names(paths[0]) == ["a", "c"]
+
+
+def test_aborted_batch_fails_every_operation(paths):
+    aborted = []
+    queue = make_queue(*paths, on_abort=lambda: aborted.append(True))
+    committed = []
+    def add_with_callback(tx, name):
+        tx.after_commit(lambda: committed.append(name))
+        return add(tx, name)
+    queue.register("add", add_with_callback)
+    batch = [write_queue._Pending("add", {"name": "a"}), write_queue._Pending("end_transaction", {})]
+    queue._run_batch(batch)
+    assert aborted == [True]
+    assert all(p.error for p in batch) and batch[0].result is None
+    assert committed == []
+    assert names(paths[0]) == []
+    # The queue still works afterwards
+    queue._run_batch([write_queue._Pending("add", {"name": "b"})])
+    assert names(paths[0]) == ["b"]
+
+
+def test_next_write_takes_over_from_a_dead_leader(paths, leader_process):
+    queue = make_queue(*paths)
+    queue.submit("add", name="before")
+    assert queue.stats()["forwarded"] == 1 and queue.stats()["leader"] == 0
+
+    leader_process.kill()
+    leader_process.join()
+    queue.submit("add", name="after")
+    stats = queue.stats()
+    assert stats["leader"] == 1 and stats["direct"] == 0
+    assert names(paths[0]) == ["after", "before", "leader"]
+
+
+def test_timeout_is_reported_as_unknown(paths, monkeypatch):
+    monkeypatch.setattr(write_queue, "REPLY_TIMEOUT", 0.2)
+    queue = make_queue(*paths)
+    queue.submit("add", name="first")
+    with pytest.raises(write_queue.WriteUnknown):
+        queue.submit("slow", name="late", seconds=0.5)
+    # Not answered in time, but not rolled back either
+    deadline = time.monotonic() + 5
+    while "late" not in names(paths[0]) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert names(paths[0]) == ["first", "late"]
+
+
+def test_forwarded_timeout_is_reported_as_unknown(paths, leader_process, monkeypatch):
+    monkeypatch.setattr(write_queue, "REPLY_TIMEOUT", 0.2)
+    queue = make_queue(*paths)
+    with pytest.raises(write_queue.WriteUnknown):
+        queue.submit("slow", name="late", seconds=0.5)
+    # The connection was dropped; the next write gets a fresh one
+    monkeypatch.setattr(write_queue, "REPLY_TIMEOUT", 10)
+    queue.submit("add", name="next")
+    assert names(paths[0]) == ["late", "leader", "next"]
+
+
+def test_unknown_outcome_is_a_503(client, student, app_module, monkeypatch, new_day):
+    def no_answer(op, **args):
+        raise write_queue.WriteUnknown("write queue: timed out")
+    monkeypatch.setattr(app_module.writes, "submit", no_answer)
+    response = client.post("/api/bookings", headers=student, json=booking_body(new_day(), "10:00", "11:00"))
+    assert response.status_code == 503
+    assert "check" in response.get_json()["message"]
@@ -0,0 +1,376 @@
+"""
+Group-commit write queue.
+
+Every gunicorn worker writing to the one SQLite file takes the write lock
+for its own short transaction, so under load workers mostly wait on each
+other (and past busy_timeout, fail). Instead, booking (including bulk
+import and batch approval) and signup writes are funnelled to a single
+writer:
+
+- The first worker to take an flock on `<socket>.lock` becomes the
+  leader. It runs a writer thread and listens on a unix socket.
+- Other workers send each write there as a named operation plus its
+  arguments and wait for the reply.
+- The writer drains whatever has queued up (up to BATCH_MAX), runs each
+  operation in its own SAVEPOINT inside one BEGIN IMMEDIATE transaction
+  and commits once. An operation that raises is rolled back alone; the
+  others still commit. Every caller gets its own result.
+
+While one batch commits the next one queues, so batches grow with load
+instead of lock waits. If the leader dies, the next write that cannot
+connect tries to take over; failing that it runs the operation in a
+transaction of its own, the way every write used to be done.
+
+Operations are registered with `register(name, fn)` in every worker;
+fn(tx, **args) runs inside the transaction, uses tx.cur, may queue
+tx.after_commit(callback) and returns a JSON-serializable result.
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+
+import db_pool
+
+BATCH_MAX = int(os.environ.get("WRITE_BATCH_MAX", 64))
+# How long a worker waits for the writer's answer
+REPLY_TIMEOUT = float(os.environ.get("WRITE_QUEUE_TIMEOUT", 10))
+# While the socket is unusable (e.g. path too long), how long to write directly
+RETRY_SECONDS = 1.0
+
+_HEADER = struct.Struct("!I")
+
+
+class WriteFailed(Exception):
+    """The operation raised, or the batch it was in rolled back."""
+
+
+class WriteUnknown(WriteFailed):
+    """The operation was handed to the writer but no answer came back (timed
+    out, or the leader went away): it may still have committed."""
+
+
+class Transaction:
+    def __init__(self, cur):
+        self.cur = cur
+        self._callbacks = []
+
+    def after_commit(self, callback):
+        self._callbacks.append(callback)
+
+
+def _send(sock, obj):
+    data = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv(sock):
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    data = _recv_exact(sock, _HEADER.unpack(header)[0])
+    return None if data is None else json.loads(data)
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+class _Pending:
+    __slots__ = ("op", "args", "done", "result", "error")
+
+    def __init__(self, op, args):
+        self.op, self.args = op, args
+        self.done = threading.Event()
+        self.result = self.error = None
+
+
+class WriteQueue:
+    def __init__(self, connect, socket_path, enabled=True, on_abort=None):
+        """connect() -> sqlite3 connection whose close() releases it.
+
+        on_abort() is called when a whole batch rolls back, to drop any
+        state cached from rows that never committed.
+        """
+        self.connect = connect
+        self.socket_path = socket_path
+        self.enabled = enabled
+        self.on_abort = on_abort
+        self._ops = {}
+        self._lock = threading.Lock()
+        self._reset()
+        atexit.register(self._step_down)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._leader = False
+        self._lock_file = None
+        self._queue = None
+        self._server = None
+        self._writer = None
+        self._retry_at = 0.0
+        self._stats = {"batches": 0, "batched_ops": 0, "forwarded": 0, "direct": 0, "failed": 0,
+                       "lock_retries": 0}
+
+    def register(self, name, fn):
+        self._ops[name] = fn
+
+    # -- submitting --
+
+    def submit(self, op, **args):
+        """Run a registered operation and return its result.
+
+        Raises WriteFailed if it did not commit, WriteUnknown if no answer
+        came back within REPLY_TIMEOUT (it may commit later).
+        """
+        if op not in self._ops:
+            raise KeyError(op)
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()  # the parent's leadership does not survive a fork
+        if not self.enabled:
+            return self._direct(op, args)
+        if self._leader:
+            return self._enqueue(op, args)
+        if time.monotonic() >= self._retry_at:
+            try:
+                return self._forward(op, args)
+            except (ConnectionRefusedError, FileNotFoundError, BrokenPipeError, ConnectionResetError):
+                # Nothing was sent: there is no leader, so try to become it
+                self._disconnect()
+                if self._elect():
+                    return self._enqueue(op, args)
+                # Lost the election; the winner is about to start listening
+            except OSError as e:
+                # Not connectable for another reason (e.g. path too long)
+                self._disconnect()
+                logging.warning("Write queue unavailable (%s); writing directly", e)
+                self._retry_at = time.monotonic() + RETRY_SECONDS
+        return self._direct(op, args)
+
+    def _connection(self):
+        """This thread's connection to the leader, opened on first use."""
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(REPLY_TIMEOUT)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def _disconnect(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            self._local.sock = None
+            sock.close()
+
+    def _forward(self, op, args):
+        sock = self._connection()
+        try:
+            _send(sock, {"op": op, "args": args})
+        except (BrokenPipeError, ConnectionResetError):
+            # The leader we were connected to is gone and got nothing
+            self._disconnect()
+            sock = self._connection()
+            _send(sock, {"op": op, "args": args})
+        try:
+            reply = _recv(sock)
+        except OSError as e:
+            # Sent, but we cannot know whether it committed: never retry
+            self._disconnect()
+            raise WriteUnknown(f"write queue: {e}") from e
+        if reply is None:
+            self._disconnect()
+            raise WriteUnknown("write queue: writer went away")
+        self._count("forwarded")
+        if "error" in reply:
+            raise WriteFailed(reply["error"])
+        return reply["result"]
+
+    def _enqueue(self, op, args):
+        pending = _Pending(op, args)
+        self._queue.put(pending)
+        if not pending.done.wait(REPLY_TIMEOUT):
+            raise WriteUnknown("write queue: timed out")
+        if pending.error is not None:
+            raise WriteFailed(pending.error)
+        return pending.result
+
+    def _direct(self, op, args):
+        self._count("direct")
+        pending = _Pending(op, args)
+        self._run_batch([pending])
+        if pending.error is not None:
+            raise WriteFailed(pending.error)
+        return pending.result
+
+    # -- leading --
+
+    def _elect(self):
+        with self._lock:
+            if self._leader:
+                return True
+            lock_file = open(self.socket_path + ".lock", "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            self._lock_file = lock_file  # held until this process exits
+            self._queue = queue.Queue()
+            self._writer = threading.Thread(target=self._write_loop, name="write-queue", daemon=True)
+            self._writer.start()
+            try:
+                os.unlink(self.socket_path)  # left behind by a previous leader
+            except FileNotFoundError:
+                pass
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                server.bind(self.socket_path)
+                server.listen(128)
+            except OSError as e:
+                # Still the leader for this worker's writes; the others write directly
+                logging.warning("Write queue cannot listen on %s (%s)", self.socket_path, e)
+                server.close()
+            else:
+                self._server = server
+                threading.Thread(target=self._accept_loop, args=(server,), name="write-queue-accept",
+                                 daemon=True).start()
+            self._leader = True
+            logging.info("Worker %d is the write queue leader", os.getpid())
+            return True
+
+    def _step_down(self):
+        """At exit: stop taking writes, finish the queued ones, let go."""
+        if not self._leader or self._pid != os.getpid():
+            return
+        if self._server is not None:
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+            try:
+                self._server.shutdown(socket.SHUT_RDWR)  # wakes accept()
+            except OSError:
+                pass
+        self._queue.put(None)
+        self._writer.join(REPLY_TIMEOUT)
+        self._leader = False
+
+    def _accept_loop(self, server):
+        while True:
+            try:
+                client, _ = server.accept()
+            except OSError:
+                return  # stepped down
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client):
+        """Answer one worker's writes, in order, until it hangs up."""
+        with client:
+            try:
+                while True:
+                    message = _recv(client)
+                    if message is None:
+                        return
+                    pending = _Pending(message["op"], message.get("args") or {})
+                    if pending.op not in self._ops:
+                        _send(client, {"error": f"unknown operation {pending.op}"})
+                        continue
+                    self._queue.put(pending)
+                    pending.done.wait()
+                    if pending.error is not None:
+                        _send(client, {"error": pending.error})
+                    else:
+                        _send(client, {"result": pending.result})
+            except OSError:
+                pass  # the worker went away
+
+    def _write_loop(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < BATCH_MAX:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:  # _step_down(): run what is queued, then stop
+                stopping = True
+                batch = [pending for pending in batch if pending is not None]
+                if not batch:
+                    break
+            try:
+                self._run_batch(batch)
+            except Exception as e:  # never let the writer thread die
+                logging.error(f"Write queue batch failed: {e}")
+            finally:
+                for pending in batch:
+                    pending.done.set()
+            self._count("batches")
+            self._count("batched_ops", len(batch))
+
+    # -- executing --
+
+    def _run_batch(self, batch):
+        """Run the batch in one transaction, one savepoint per operation."""
+        conn = self.connect()
+        cur = conn.cursor()
+        committed = []
+        try:
+            self._count("lock_retries", db_pool.begin_immediate(cur))
+            for pending in batch:
+                tx = Transaction(cur)
+                cur.execute("SAVEPOINT write_op")
+                try:
+                    pending.result = self._ops[pending.op](tx, **pending.args)
+                except Exception as e:
+                    cur.execute("ROLLBACK TO write_op")
+                    pending.error = str(e)
+                    self._count("failed")
+                    logging.error(f"Write operation {pending.op} failed: {e}")
+                else:
+                    committed.append(tx)
+                cur.execute("RELEASE write_op")
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            if self.on_abort:
+                self.on_abort()
+            for pending in batch:
+                if pending.error is None:
+                    pending.error = str(e)
+                    pending.result = None
+            return
+        finally:
+            conn.close()
+        for tx in committed:
+            for callback in tx._callbacks:
+                callback()
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, leader=int(self._leader))
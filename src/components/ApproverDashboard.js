@@ -16,7 +16,8 @@ const ApproverDashboard = () => {
     pendingRequests, 
     loading, 
     loadCalendarEvents, 
-    loadPendingRequests
+    loadPendingRequests,
+    subscribeToUpdates
   } = useBooking();
   
   const [view] = useState('dayGridMonth');
@@ -28,6 +29,10 @@ const ApproverDashboard = () => {
     loadPendingRequests(user?.department_id);
   }, [loadCalendarEvents, loadPendingRequests, user?.department_id]);
 
+  useEffect(() => {
+    return subscribeToUpdates({ departmentId: user?.department_id });
+  }, [subscribeToUpdates, user?.department_id]);
+
   const handleLogout = () => {
     logout();
   };
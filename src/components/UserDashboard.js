@@ -18,6 +18,7 @@ const UserDashboard = () => {
     loading, 
     loadCalendarEvents, 
     loadMyBookings,
+    subscribeToUpdates,
     getEventType 
   } = useBooking();
   
@@ -38,6 +39,12 @@ const UserDashboard = () => {
     }
   }, [user, loadCalendarEvents, loadMyBookings]);
 
+  useEffect(() => {
+    if (user) {
+      return subscribeToUpdates({ userId: user.id });
+    }
+  }, [user, subscribeToUpdates]);
+
   const handleLogout = () => {
     logout();
   };
@@ -59,6 +59,51 @@ export const BookingProvider = ({ children }) => {
     }
   }, []);
 
+  // Apply live booking changes from /api/stream instead of re-fetching everything.
+  // The server scopes the stream to the signed-in user: an HOD gets departmentId's
+  // bookings (and the pending list is narrowed the same way loadPendingRequests does),
+  // anyone else their own (userId) plus what the calendar shows of others.
+  const subscribeToUpdates = React.useCallback(({ departmentId: pendingDepartmentId = null, userId = null } = {}) => {
+    const filters = pendingDepartmentId ? { department_id: pendingDepartmentId } : {};
+    return apiService.subscribeToBookingEvents(filters, (kind, event) => {
+      const { bookingStatus, departmentId, ...calendarEvent } = event;
+      const onCalendar = ['pending', 'approved', 'conducted'].includes(bookingStatus);
+
+      setCalendarEvents((prev) => {
+        const others = prev.filter((e) => e.id !== event.id);
+        return onCalendar ? [...others, calendarEvent] : others;
+      });
+
+      if (userId && event.requesterId === userId) {
+        setMyBookings((prev) => {
+          const others = prev.filter((b) => b.id !== event.id);
+          const { type, ...booking } = calendarEvent;
+          // Newest first, like /api/bookings/my
+          return [...others, booking].sort((a, b) => (a.start < b.start ? 1 : a.start > b.start ? -1 : 0));
+        });
+      }
+
+      setPendingRequests((prev) => {
+        const others = prev.filter((r) => r.id !== event.id);
+        if (bookingStatus !== 'pending' || (pendingDepartmentId && departmentId !== pendingDepartmentId)) {
+          return others;
+        }
+        return [{
+          id: event.id,
+          title: event.title,
+          resource: event.resource,
+          start: event.start,
+          end: event.end,
+          purpose: event.purpose,
+          status: bookingStatus,
+          requesterName: event.requester,
+          requesterId: event.requesterId,
+          createdAt: new Date().toISOString()
+        }, ...others];
+      });
+    });
+  }, []);
+
   // Submit booking request
   const submitBookingRequest = async (bookingData) => {
     try {
@@ -171,6 +216,7 @@ export const BookingProvider = ({ children }) => {
     loadCalendarEvents,
     loadMyBookings,
     loadPendingRequests,
+    subscribeToUpdates,
     submitBookingRequest,
     approveBooking,
     rejectBooking,
@@ -346,6 +346,55 @@ class ApiService {
   async getDepartments() {
     return this.apiCall('/departments');
   }
+
+  // Live updates (server-sent events); returns an unsubscribe function
+  subscribeToBookingEvents(filters = {}, onEvent) {
+    const params = new URLSearchParams();
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value !== null && value !== undefined) {
+        params.append(key, value);
+      }
+    });
+    // The server scopes the stream to this user (EventSource cannot send headers)
+    if (this.token) {
+      params.append('token', this.token);
+    }
+
+    let source = null;
+    let retryTimer = null;
+    let lastEventId = null;
+    let closed = false;
+
+    const connect = () => {
+      const query = new URLSearchParams(params);
+      if (lastEventId) {
+        query.set('last_event_id', lastEventId);
+      }
+      source = new EventSource(`${API_BASE_URL}/stream?${query.toString()}`);
+      ['created', 'approved', 'rejected', 'cancelled'].forEach((kind) => {
+        source.addEventListener(kind, (e) => {
+          lastEventId = e.lastEventId || lastEventId;
+          onEvent(kind, JSON.parse(e.data));
+        });
+      });
+      source.onerror = () => {
+        // EventSource retries dropped connections itself, but gives up on an
+        // HTTP error such as the 503 sent when too many streams are open
+        if (source.readyState === EventSource.CLOSED && !closed) {
+          retryTimer = setTimeout(connect, 5000 + Math.random() * 5000);
+        }
+      };
+    };
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) {
+        source.close();
+      }
+    };
+  }
 }
 
 // Create singleton instance
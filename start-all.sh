@@ -46,7 +46,7 @@ if [ ! -f "venv/.dependencies_installed" ]; then
 fi
 
 # Start backend in background
-python app.py > /tmp/backend.log 2>&1 &
+SEED_DEMO_DATA=1 python app.py > /tmp/backend.log 2>&1 &
 BACKEND_PID=$!
 
 # Wait a bit for backend to start
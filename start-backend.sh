@@ -21,5 +21,5 @@ fi
 
 # Start backend
 echo "Starting backend server on http://localhost:8000..."
-python app.py
+SEED_DEMO_DATA=1 python app.py
 